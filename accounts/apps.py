@@ -9,6 +9,7 @@ class AccountsConfig(AppConfig):
 
     def ready(self):
         from .models import Role  # Import inside to prevent circular imports
+        import accounts.signals  # noqa: F401  Role cache invalidation
 
         def create_roles(sender, **kwargs):
             """
@@ -1,6 +1,15 @@
 from django.shortcuts import redirect
 from functools import wraps
 
+
+def request_role_name(request):
+    """Role name of the requesting user, memoized on the request."""
+    if not hasattr(request, "role_name"):
+        user = request.user
+        request.role_name = user.role_name if user.is_authenticated else None
+    return request.role_name
+
+
 def role_required(*role_names):
     """
     Decorator to restrict access to views based on user roles.
@@ -9,7 +18,7 @@ def role_required(*role_names):
     def decorator(view_func):
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
-            if request.user.is_authenticated and request.user.role and request.user.role.name in role_names:
+            if request_role_name(request) in role_names:
                 return view_func(request, *args, **kwargs)
             return redirect("403")  # Redirect to '403' if unauthorized
         return _wrapped_view
@@ -1,5 +1,33 @@
 from django.shortcuts import redirect
 
+from .decorators import request_role_name
+
+
+class _PrefixTrie:
+    """Character trie over route prefixes; matching walks the path once."""
+
+    _END = object()
+
+    def __init__(self, routes):
+        self.root = {}
+        for value, prefix in routes.items():
+            node = self.root
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[self._END] = value
+
+    def match(self, path):
+        """Return the value of the first registered prefix of ``path``, or None."""
+        node = self.root
+        for char in path:
+            if self._END in node:
+                return node[self._END]
+            node = node.get(char)
+            if node is None:
+                return None
+        return node.get(self._END)
+
+
 class RoleBasedAccessMiddleware:
     """
     Middleware to restrict access to dashboards based on user roles.
@@ -12,12 +40,13 @@ class RoleBasedAccessMiddleware:
             "Customer": "/accounts/customer-dashboard/",
             "Logistics": "/accounts/logistics-dashboard/",
         }
+        self.route_trie = _PrefixTrie(self.role_based_routes)
 
     def __call__(self, request):
-        if request.user.is_authenticated and request.user.role:
-            for role, path in self.role_based_routes.items():
-                if request.path.startswith(path) and request.user.role.name != role:
-                    return redirect("403")
+        required_role = self.route_trie.match(request.path)
+        if required_role is not None:
+            role_name = request_role_name(request)
+            if role_name is not None and role_name != required_role:
+                return redirect("403")
 
         return self.get_response(request)
-
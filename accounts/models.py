@@ -1,5 +1,5 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 
 class Role(models.Model):
     ADMIN = "Admin"
@@ -16,6 +16,22 @@ class Role(models.Model):
 
     name = models.CharField(max_length=50, unique=True, choices=ROLE_CHOICES)
 
+    # In-process id -> name cache; cleared by accounts.signals when a Role changes
+    _names_by_id = {}
+
+    @classmethod
+    def name_for(cls, role_id):
+        """Resolve a role id to its name without a query once the cache is warm."""
+        if role_id is None:
+            return None
+        if role_id not in cls._names_by_id:
+            cls._names_by_id = dict(cls.objects.values_list("id", "name"))
+        return cls._names_by_id.get(role_id)
+
+    @classmethod
+    def clear_name_cache(cls):
+        cls._names_by_id = {}
+
     def __str__(self):
         return self.name
 
@@ -25,14 +41,26 @@ class VendorType(models.Model):
     def __str__(self):
         return self.name  # Fixed syntax error
 
+class CustomUserManager(UserManager):
+    """Loads the role with the user, so authentication and session lookups need no extra query."""
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("role")
+
+
 class CustomUser(AbstractUser):
     phone = models.CharField(max_length=15, unique=True, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
+    # ✅ Delivery location, used to route shipments to the nearest warehouse
+    latitude = models.FloatField(blank=True, null=True)
+    longitude = models.FloatField(blank=True, null=True)
     role = models.ForeignKey(Role, null=True, blank=True, on_delete=models.SET_NULL)
     vendor_type = models.ForeignKey(VendorType, null=True, blank=True, on_delete=models.SET_NULL)
 
     is_role_approved = models.BooleanField(default=False)
 
+    objects = CustomUserManager()
+
     def save(self, *args, **kwargs):
         """
         Automatically approve Customers, but require approval for Vendors & Logistics.
@@ -44,17 +72,22 @@ class CustomUser(AbstractUser):
                 self.is_role_approved = False
         super().save(*args, **kwargs)
 
+    @property
+    def role_name(self):
+        """Role name resolved from role_id through the Role cache (no FK dereference)."""
+        return Role.name_for(self.role_id)
+
     def is_admin(self):
-        return self.role and self.role.name == Role.ADMIN
+        return self.role_name == Role.ADMIN
 
     def is_vendor(self):
-        return self.role and self.role.name == Role.VENDOR
+        return self.role_name == Role.VENDOR
 
     def is_customer(self):
-        return self.role and self.role.name == Role.CUSTOMER
+        return self.role_name == Role.CUSTOMER
 
     def is_logistics(self):
-        return self.role and self.role.name == Role.LOGISTICS
+        return self.role_name == Role.LOGISTICS
 
     def __str__(self):
-        return f"{self.username} ({self.role.name if self.role else 'No Role'})"
+        return f"{self.username} ({self.role_name or 'No Role'})"
@@ -0,0 +1,10 @@
+# accounts/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Role
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def clear_role_name_cache(sender, **kwargs):
+    Role.clear_name_cache()
@@ -5,6 +5,7 @@ from django.contrib import messages
 from django.urls import reverse
 
 from .models import CustomUser, Role, VendorType
+from cart.storage import merge_session_cart
 from .decorators import role_required
 from .forms import (
     CustomUserEditForm,
@@ -14,6 +15,7 @@ from .forms import (
 )
 
 from orders.models import Order  # For customer_dashboard
+from utils.pagination import paginate_by_cursor
 
 # 🔹 Home Page View
 def home(request):
@@ -37,6 +39,7 @@ def signup(request):
 
             user.save()
             login(request, user)
+            merge_session_cart(request.session, user)  # ✅ Keep what they added before signing up
             messages.success(request, "Account created successfully!")
             return redirect_dashboard(user)
     else:
@@ -54,11 +57,12 @@ def user_login(request):
         user = authenticate(request, username=username, password=password)
 
         if user:
-            if not user.role:
+            if not user.role_id:
                 messages.error(request, "Your account does not have a role assigned. Please contact support.")
                 return redirect("login")
 
             login(request, user)
+            merge_session_cart(request.session, user)  # ✅ Keep what they added while browsing anonymously
             messages.success(request, f"Welcome {user.username}!")
             return redirect_dashboard(user)
         else:
@@ -80,15 +84,15 @@ def redirect_dashboard(user):
         "Customer": "customer_dashboard",
         "Logistics": "logistics_dashboard",
     }
-    return redirect(role_redirects.get(user.role.name, "customer_dashboard"))
+    return redirect(role_redirects.get(user.role_name, "customer_dashboard"))
 
 # 🔹 Admin Dashboard
 @login_required
 @role_required("Admin")
 def admin_dashboard(request):
-    users = CustomUser.objects.all()
+    page = paginate_by_cursor(CustomUser.objects.all(), ("-date_joined", "-id"), cursor=request.GET.get("cursor"))
     vendor_types = VendorType.objects.all()
-    return render(request, "accounts/admin_dashboard.html", {"users": users, "vendor_types": vendor_types})
+    return render(request, "accounts/admin_dashboard.html", {"users": page.items, "page": page, "vendor_types": vendor_types})
 
 # 🔹 Vendor Dashboard
 @login_required
@@ -100,7 +104,7 @@ def vendor_dashboard(request):
 @login_required
 @role_required("Customer")
 def customer_dashboard(request):
-    orders = Order.objects.filter(customer=request.user).prefetch_related("order_items__product")
+    orders = Order.objects.filter(customer=request.user).with_items()
     view_cart_url = reverse("cart:view_cart")
     return render(request, "accounts/customer_dashboard.html", {
         "orders": orders,
@@ -1,7 +1,33 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
 from accounts.models import CustomUser
 from products.models import Product
 
+class CartQuerySet(models.QuerySet):
+    """Cart queries with the product row joined in, so templates and totals never hit N+1."""
+
+    def with_products(self):
+        return self.select_related("product")
+
+    def for_customer_with_products(self, customer):
+        return self.filter(customer=customer).select_related("product")
+
+    def totals(self):
+        """Line count, unit count and price total of these rows in one aggregate query."""
+        return self.aggregate(
+            lines=Count("id"),
+            units=Coalesce(Sum("quantity"), 0),
+            total=Coalesce(
+                Sum(F("product__price") * F("quantity"), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal("0.00")),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
+
 class Cart(models.Model):
     """Shopping Cart for customers."""
     customer = models.ForeignKey(
@@ -12,6 +38,14 @@ class Cart(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # One row per product per customer; also stops add_to_cart's get_or_create racing into duplicates
+            models.UniqueConstraint(fields=["customer", "product"], name="unique_cart_customer_product"),
+        ]
+
     def __str__(self):
         return f"{self.customer.username} - {self.product.name} x {self.quantity}"
  
\ No newline at end of file
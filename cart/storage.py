@@ -0,0 +1,311 @@
+"""
+Cart storage backends.
+
+Anonymous visitors keep their cart in the session (with the signed-cookie
+session engine that is no database traffic at all); logged-in users keep it in
+``Cart`` rows. Both backends expose the same line API, read their lines once
+per request and derive totals from those lines, so viewing a cart is one
+SELECT and never a write. ``apply_ops`` applies a whole batch of client edits
+with at most one INSERT, one UPDATE and one DELETE, and ``merge_session_cart``
+folds a session cart into the user's rows in bulk when they log in.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Least
+
+from products.models import Product
+from utils.db import executemany_update
+from .models import Cart
+
+SESSION_KEY = "cart"
+MAX_OPS = 500
+MAX_QUANTITY = 10000  # per line, enforced on every write; keeps sums well inside PositiveIntegerField
+OPS = ("add", "update", "remove")
+
+
+class CartLine:
+    """One session cart line; quacks like a ``Cart`` row for templates (its id is the product id)."""
+
+    def __init__(self, product, quantity):
+        self.id = product.id
+        self.product = product
+        self.product_id = product.id
+        self.quantity = quantity
+
+
+class BaseCartStorage:
+    def __init__(self):
+        self._lines = None
+
+    def lines(self):
+        """The cart's lines with their products, loaded once per request."""
+        if self._lines is None:
+            self._lines = self._load()
+        return self._lines
+
+    def line(self, line_id):
+        return next((line for line in self.lines() if line.id == line_id), None)
+
+    def totals(self):
+        """Same shape as ``CartQuerySet.totals()``, computed from the loaded lines."""
+        lines = self.lines()
+        return {
+            "lines": len(lines),
+            "units": sum(line.quantity for line in lines),
+            "total": sum((line.product.price * line.quantity for line in lines), Decimal("0.00")),
+        }
+
+    def apply_ops(self, ops):
+        """
+        Apply validated ``(op, product_id, quantity)`` ops (see ``parse_cart_ops``)
+        in order, as one batch. Products that do not exist are rejected with
+        ValueError before anything is written.
+        """
+        current = self._quantities_for({product_id for _, product_id, _ in ops})
+        final = _fold_ops(current, ops)
+        added = {pid for pid, qty in final.items() if qty > 0 and pid not in current}
+        missing = added - set(Product.objects.filter(id__in=added).values_list("id", flat=True))
+        if missing:
+            raise ValueError(f"Unknown product(s): {', '.join(map(str, sorted(missing)))}")
+        self._write_quantities(current, final)
+        self._lines = None
+
+    def __iter__(self):
+        return iter(self.lines())
+
+    def __len__(self):
+        return len(self.lines())
+
+
+class SessionCartStorage(BaseCartStorage):
+    """``{product_id: quantity}`` in the session; lines are keyed by product id."""
+
+    def __init__(self, session):
+        super().__init__()
+        self.session = session
+
+    def _quantities(self):
+        return self.session.get(SESSION_KEY, {})
+
+    def _save(self, quantities):
+        self.session[SESSION_KEY] = quantities  # marks the session modified only on writes
+        self._lines = None
+
+    def _load(self):
+        quantities = self._quantities()
+        if not quantities:
+            return []
+        products = Product.objects.in_bulk([int(pid) for pid in quantities])
+        return [
+            CartLine(products[int(pid)], quantity)
+            for pid, quantity in quantities.items() if int(pid) in products
+        ]
+
+    def add(self, product_id, quantity=1):
+        quantities = dict(self._quantities())
+        quantities[str(product_id)] = min(quantities.get(str(product_id), 0) + quantity, MAX_QUANTITY)
+        self._save(quantities)
+
+    def set_quantity(self, line_id, quantity):
+        quantities = dict(self._quantities())
+        if quantity > 0:
+            quantities[str(line_id)] = quantity
+        else:
+            quantities.pop(str(line_id), None)
+        self._save(quantities)
+
+    def remove(self, line_id):
+        self.set_quantity(line_id, 0)
+
+    def clear(self):
+        if self._quantities():
+            self._save({})
+
+    def _quantities_for(self, product_ids):
+        quantities = self._quantities()
+        return {pid: quantities[str(pid)] for pid in product_ids if str(pid) in quantities}
+
+    def _write_quantities(self, current, final):
+        quantities = dict(self._quantities())
+        for product_id, quantity in final.items():
+            if quantity > 0:
+                quantities[str(product_id)] = quantity
+            else:
+                quantities.pop(str(product_id), None)
+        self._save(quantities)
+
+
+class DatabaseCartStorage(BaseCartStorage):
+    """``Cart`` rows of a logged-in user; lines are the rows themselves."""
+
+    def __init__(self, user):
+        super().__init__()
+        self.user = user
+
+    def _rows(self):
+        return Cart.objects.filter(customer=self.user)
+
+    def _load(self):
+        return list(Cart.objects.for_customer_with_products(self.user))
+
+    def add(self, product_id, quantity=1):
+        """One UPDATE for a product already in the cart, one INSERT otherwise. Lines stop at MAX_QUANTITY."""
+        self._lines = None
+        added = Least(F("quantity") + quantity, MAX_QUANTITY)
+        if self._rows().filter(product_id=product_id).update(quantity=added):
+            return
+        try:
+            with transaction.atomic():
+                Cart.objects.create(customer=self.user, product_id=product_id, quantity=min(quantity, MAX_QUANTITY))
+        except IntegrityError:  # a concurrent request inserted it first
+            self._rows().filter(product_id=product_id).update(quantity=added)
+
+    def set_quantity(self, line_id, quantity):
+        self._lines = None
+        if quantity > 0:
+            self._rows().filter(id=line_id).update(quantity=quantity)
+        else:
+            self._rows().filter(id=line_id).delete()
+
+    def remove(self, line_id):
+        self.set_quantity(line_id, 0)
+
+    def clear(self):
+        self._lines = None
+        self._rows().delete()
+
+    def apply_ops(self, ops):
+        with transaction.atomic():
+            super().apply_ops(ops)
+
+    def _quantities_for(self, product_ids):
+        self._locked = {
+            row.product_id: row
+            for row in self._rows().filter(product_id__in=product_ids).select_for_update()
+        }
+        return {product_id: row.quantity for product_id, row in self._locked.items()}
+
+    def _write_quantities(self, current, final):
+        """One bulk INSERT, one executemany UPDATE and one DELETE at most."""
+        rows = self._locked
+        changed, removed, created = [], [], []
+        for product_id, quantity in final.items():
+            row = rows.get(product_id)
+            if row is None:
+                if quantity > 0:
+                    created.append(Cart(customer=self.user, product_id=product_id, quantity=quantity))
+            elif quantity <= 0:
+                removed.append(row.id)
+            elif quantity != row.quantity:
+                row.quantity = quantity
+                changed.append(row)
+        Cart.objects.bulk_create(created)
+        executemany_update(Cart, changed, ["quantity"])
+        if removed:
+            Cart.objects.filter(id__in=removed).delete()
+
+
+def _fold_ops(current, ops):
+    """Final ``{product_id: quantity}`` after applying ``ops`` to ``current`` in order."""
+    final = dict(current)
+    for op, product_id, quantity in ops:
+        if op == "add":
+            final[product_id] = min(final.get(product_id, 0) + quantity, MAX_QUANTITY)
+        elif op == "update":
+            final[product_id] = quantity
+        else:
+            final[product_id] = 0
+    return final
+
+
+def parse_quantity(value, minimum=1):
+    """A form's quantity field as an int from ``minimum`` to MAX_QUANTITY; raises ValueError otherwise."""
+    text = str(value).strip()
+    if not (text.isascii() and text.isdigit()) or not minimum <= int(text) <= MAX_QUANTITY:
+        raise ValueError(f"Quantity must be a whole number from {minimum} to {MAX_QUANTITY}.")
+    return int(text)
+
+
+def parse_cart_ops(payload):
+    """
+    Validate ``{"ops": [{"op": "add"|"update"|"remove", "product": id, "quantity": n}]}``
+    into ``[(op, product_id, quantity)]``. Raises ValueError naming the first bad op.
+    """
+    ops = payload.get("ops") if isinstance(payload, dict) else None
+    if not isinstance(ops, list):
+        raise ValueError("Expected an object with an \"ops\" list.")
+    if len(ops) > MAX_OPS:
+        raise ValueError(f"At most {MAX_OPS} ops per request.")
+
+    parsed = []
+    for index, raw in enumerate(ops):
+        if not isinstance(raw, dict) or raw.get("op") not in OPS:
+            raise ValueError(f"ops[{index}]: op must be one of {', '.join(OPS)}.")
+        product_id, quantity = raw.get("product"), raw.get("quantity", 1 if raw["op"] == "add" else 0)
+        if not isinstance(product_id, int) or isinstance(product_id, bool) or product_id <= 0:
+            raise ValueError(f"ops[{index}]: product must be a positive integer id.")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or not 0 <= quantity <= MAX_QUANTITY:
+            raise ValueError(f"ops[{index}]: quantity must be an integer from 0 to {MAX_QUANTITY}.")
+        if raw["op"] == "add" and quantity == 0:
+            raise ValueError(f"ops[{index}]: add needs a quantity of at least 1.")
+        if raw["op"] == "update" and "quantity" not in raw:
+            raise ValueError(f"ops[{index}]: update needs a quantity.")
+        parsed.append((raw["op"], product_id, quantity))
+    return parsed
+
+
+def cart_state(cart):
+    """JSON-ready lines and totals of ``cart``."""
+    totals = cart.totals()
+    return {
+        "lines": [
+            {
+                "id": line.id,
+                "product": line.product_id,
+                "name": line.product.name,
+                "price": str(line.product.price),
+                "quantity": line.quantity,
+                "line_total": str(line.product.price * line.quantity),
+            }
+            for line in cart.lines()
+        ],
+        "totals": {"lines": totals["lines"], "units": totals["units"], "total": str(totals["total"])},
+    }
+
+
+def cart_storage(request):
+    """The request's cart backend (memoized on the request)."""
+    if not hasattr(request, "_cart_storage"):
+        if request.user.is_authenticated:
+            request._cart_storage = DatabaseCartStorage(request.user)
+        else:
+            request._cart_storage = SessionCartStorage(request.session)
+    return request._cart_storage
+
+
+def merge_session_cart(session, user):
+    """
+    Fold the session cart into ``user``'s Cart rows: one SELECT of the rows it
+    overlaps, one executemany UPDATE adding the quantities and one bulk INSERT
+    for the rest. The session cart is emptied afterwards.
+    """
+    quantities = {int(pid): quantity for pid, quantity in session.get(SESSION_KEY, {}).items() if quantity > 0}
+    if not quantities:
+        return 0
+
+    with transaction.atomic():
+        existing = {row.product_id: row for row in Cart.objects.filter(customer=user, product_id__in=quantities)}
+        for product_id, row in existing.items():
+            row.quantity = min(row.quantity + quantities[product_id], MAX_QUANTITY)
+        executemany_update(Cart, existing.values(), ["quantity"])
+
+        live = set(Product.objects.filter(id__in=quantities.keys() - existing.keys()).values_list("id", flat=True))
+        Cart.objects.bulk_create([
+            Cart(customer=user, product_id=product_id, quantity=min(quantities[product_id], MAX_QUANTITY))
+            for product_id in live
+        ])
+
+    session.pop(SESSION_KEY, None)
+    return len(existing) + len(live)
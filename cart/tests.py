@@ -1,3 +1,141 @@
-from django.test import TestCase
+import json
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser, Role
+from products.models import Category, Product
+from .models import Cart
+from .storage import MAX_QUANTITY, SESSION_KEY
+
+# Stand-ins for the site templates that read what the real pages read per line
+PAGE_TEMPLATES = {
+    "cart/cart.html": "{% for item in cart_items %}{{ item.product.name }} {{ item.product.price }} x {{ item.quantity }}\n{% endfor %}{{ total_price }}",
+    "orders/checkout.html": "{% for item in cart_items %}{{ item.product.name }} {{ item.product.price }} x {{ item.quantity }}\n{% endfor %}",
+}
+
+
+@override_settings(TEMPLATES=[{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {"loaders": [("django.template.loaders.locmem.Loader", PAGE_TEMPLATES)]},
+}])
+class CartQueryCountTests(TestCase):
+    """Cart pages cost the same number of queries for 1 line as for 40."""
+
+    @classmethod
+    def setUpTestData(cls):
+        vendor = CustomUser.objects.create_user("vendor", password="x", role=Role.objects.get_or_create(name=Role.VENDOR)[0])
+        cls.customer = CustomUser.objects.create_user("customer", password="x", role=Role.objects.get_or_create(name=Role.CUSTOMER)[0])
+        category = Category.objects.create(name="Lamps")
+        cls.products = Product.objects.bulk_create([
+            Product(name=f"Lamp {n}", category=category, vendor=vendor, price=10 + n, current_stock=100, approval_status="Approved")
+            for n in range(41)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+        self.client.get(reverse("cart:view_cart"))  # the first request of a session costs extra queries
+
+    def fill_cart(self, products):
+        Cart.objects.bulk_create([Cart(customer=self.customer, product=product, quantity=2) for product in products])
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        return len(queries)
+
+    def test_view_cart(self):
+        self.fill_cart(self.products[:1])
+        expected = self.count_queries(lambda: self.client.get(reverse("cart:view_cart")))
+        self.fill_cart(self.products[1:])
+        with self.assertNumQueries(expected):
+            response = self.client.get(reverse("cart:view_cart"))
+        self.assertContains(response, "Lamp 40 50.00 x 2")
+
+    def test_checkout_page(self):
+        self.fill_cart(self.products[:1])
+        expected = self.count_queries(lambda: self.client.get(reverse("cart:checkout")))
+        self.fill_cart(self.products[1:])
+        with self.assertNumQueries(expected):
+            self.client.get(reverse("cart:checkout"))
+
+    def test_checkout_places_order(self):
+        self.fill_cart(self.products[:1])
+        expected = self.count_queries(lambda: self.client.post(reverse("cart:checkout")))
+        self.fill_cart(self.products[1:])
+        with self.assertNumQueries(expected):
+            response = self.client.post(reverse("cart:checkout"))
+        self.assertRedirects(response, reverse("orders:order_list"), fetch_redirect_response=False)
+        self.assertFalse(Cart.objects.filter(customer=self.customer).exists())
+        self.assertEqual(Product.objects.get(id=self.products[40].id).current_stock, 98)
+
+    def test_sync_cart(self):
+        def sync(products):
+            ops = [{"op": "add", "product": product.id, "quantity": 1} for product in products]
+            return self.client.post(reverse("cart:sync_cart"), json.dumps({"ops": ops}), content_type="application/json")
+
+        expected = self.count_queries(lambda: sync(self.products[:1]))
+        with self.assertNumQueries(expected):
+            response = sync(self.products[1:])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Cart.objects.filter(customer=self.customer).count(), 41)
+
+
+class AddToCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = CustomUser.objects.create_user("vendor", password="x", role=Role.objects.get_or_create(name=Role.VENDOR)[0])
+        cls.customer = CustomUser.objects.create_user("customer", password="x", role=Role.objects.get_or_create(name=Role.CUSTOMER)[0])
+        cls.product = Product.objects.create(
+            name="Lamp", category=Category.objects.create(name="Lamps"), vendor=vendor, price=10, approval_status="Approved"
+        )
+
+    def setUp(self):
+        self.client.force_login(self.customer)
+
+    def test_adding_twice_adds_up(self):
+        url = reverse("cart:add_to_cart", args=[self.product.id])
+        self.client.post(url, {"quantity": "2"})
+        self.client.post(url, {"quantity": "3"})
+        self.assertEqual(Cart.objects.get(customer=self.customer).quantity, 5)
+
+    def test_rejects_quantities_that_are_not_positive_integers(self):
+        url = reverse("cart:add_to_cart", args=[self.product.id])
+        for quantity in ["-1", "0", "abc", "1.5", ""]:
+            response = self.client.post(url, {"quantity": quantity})
+            self.assertRedirects(response, reverse("cart:view_cart"), fetch_redirect_response=False)
+        self.assertFalse(Cart.objects.exists())
+
+    def test_repeated_adds_stop_at_the_line_limit(self):
+        url = reverse("cart:add_to_cart", args=[self.product.id])
+        for _ in range(3):
+            self.client.post(url, {"quantity": str(MAX_QUANTITY - 1)})
+        self.assertEqual(Cart.objects.get(customer=self.customer).quantity, MAX_QUANTITY)
+
+    def test_session_cart_stops_at_the_line_limit(self):
+        self.client.logout()
+        url = reverse("cart:add_to_cart", args=[self.product.id])
+        for _ in range(3):
+            self.client.post(url, {"quantity": str(MAX_QUANTITY - 1)})
+        self.assertEqual(self.client.session[SESSION_KEY], {str(self.product.id): MAX_QUANTITY})
+
+    def test_sync_adds_stop_at_the_line_limit(self):
+        ops = [{"op": "add", "product": self.product.id, "quantity": MAX_QUANTITY}] * 3
+        self.client.post(reverse("cart:sync_cart"), json.dumps({"ops": ops}), content_type="application/json")
+        self.assertEqual(Cart.objects.get(customer=self.customer).quantity, MAX_QUANTITY)
+
+
+@skipUnless(connection.vendor == "sqlite", "the query plans checked are SQLite's")
+class IndexUsageTests(TestCase):
+    """EXPLAIN QUERY PLAN shows each hot lookup searching through its index."""
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertRegex(queryset.explain(), rf"SEARCH \S+ USING (COVERING )?INDEX {index}\b")
+
+    def test_cart_line_lookup(self):
+        # SQLite backs the unique constraint with its own automatic index
+        queryset = Cart.objects.filter(customer_id=1, product_id=1)
+        self.assertUsesIndex(queryset, r"(unique_cart_customer_product|sqlite_autoindex_cart_cart_\d+)")
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import view_cart, add_to_cart, remove_from_cart, clear_cart, checkout, update_cart
+from .views import view_cart, add_to_cart, remove_from_cart, clear_cart, checkout, update_cart, sync_cart
 
 app_name = 'cart'  # Register the namespace
 
@@ -10,4 +10,5 @@ urlpatterns = [
     path("clear/", clear_cart, name="clear_cart"),  # ✅ Clear all cart items
     path("checkout/", checkout, name="checkout"),  # ✅ Proceed to checkout  
     path("update/<int:item_id>/", update_cart, name="update_cart"),  # ✅ Update cart item
+    path("sync/", sync_cart, name="sync_cart"),  # ✅ Batch add/update/remove as JSON
 ]
@@ -1,7 +1,14 @@
 # cart/views.py
+import json
+
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Cart
+from .storage import cart_state, cart_storage, parse_cart_ops, parse_quantity
 from products.models import Product
+from inventory.services import reserve_stock, cart_quantities, InsufficientStock
+from orders.tasks import order_placed
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.urls import reverse
@@ -22,45 +29,56 @@ from django.apps import apps
 #     messages.success(request, f"{product.name} added to cart!")
 #     return redirect(reverse("cart:view_cart"))
 def add_to_cart(request, product_id):
-    product = get_object_or_404(Product, id=product_id)
-    quantity = int(request.POST.get("quantity", 1))  # Allow users to set quantity
-
-    cart_item, created = Cart.objects.get_or_create(
-        customer=request.user, product=product
-    )
-    if not created:
-        cart_item.quantity += quantity  # ✅ Update dynamically
-        cart_item.save()
+    """Add a product to the cart (session cart for anonymous visitors, Cart rows once logged in)."""
+    product = get_object_or_404(Product.objects.only("id", "name"), id=product_id)
+    try:
+        quantity = parse_quantity(request.POST.get("quantity", 1))  # Allow users to set quantity
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(reverse("cart:view_cart"))
+
+    cart_storage(request).add(product.id, quantity)  # ✅ One upsert (or a session write), no read-modify-save
     
     messages.success(request, f"{product.name} added to cart!")
     return redirect(reverse("cart:view_cart"))
 
 
-@login_required
 def view_cart(request):
-    """Display the user's shopping cart."""
-    cart_items = request.user.cart_items.all()  # Fetch cart items
-    total_price = sum(item.product.price * item.quantity for item in cart_items)  # ✅ Ensure correct calculation
+    """Display the shopping cart. One SELECT for lines and totals, no writes."""
+    cart = cart_storage(request)
+    total_price = cart.totals()["total"]  # ✅ Derived from the loaded lines
 
     # Determine Dashboard URL based on user role
-    if request.user.is_vendor():
+    if request.user.is_authenticated and request.user.is_vendor():
         dashboard_url = "vendor_dashboard"
-    elif request.user.is_customer():
+    elif request.user.is_authenticated and request.user.is_customer():
         dashboard_url = "customer_dashboard"
     else:
         dashboard_url = "home"
 
     return render(request, "cart/cart.html", {
-        "cart_items": cart_items,
+        "cart_items": cart.lines(),
         "total_price": total_price,  # ✅ Pass total price to template
         "dashboard_url": dashboard_url,
         "clear_cart_url": reverse("cart:clear_cart"),  # ✅ Use namespace for clear_cart
     })
 
-@login_required
+@require_POST
+def sync_cart(request):
+    """
+    Apply a batch of cart ops from a JSON body in one transaction and return the
+    new cart state: {"ops": [{"op": "add"|"update"|"remove", "product": id, "quantity": n}]}.
+    """
+    try:
+        ops = parse_cart_ops(json.loads(request.body or b"null"))
+        cart = cart_storage(request)
+        cart.apply_ops(ops)
+    except ValueError as e:  # also covers malformed JSON
+        return JsonResponse({"error": str(e)}, status=400)
+    return JsonResponse(cart_state(cart))
+
 def remove_from_cart(request, item_id):  # ✅ Changed parameter name to match URL pattern
-    cart_item = get_object_or_404(Cart, id=item_id)
-    cart_item.delete()
+    cart_storage(request).remove(item_id)  # ✅ Only ever the requester's own cart
     return redirect("cart:view_cart")  # ✅ Ensure correct namespace
 from django.db import transaction
 
@@ -72,66 +90,56 @@ def checkout(request):
 
     Cart = apps.get_model("cart", "Cart")
     Order = apps.get_model("orders", "Order")
-    OrderItem = apps.get_model("orders", "OrderItem")
 
-    cart_items = Cart.objects.filter(customer=request.user)
+    cart_items = Cart.objects.for_customer_with_products(request.user)
 
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, "Your cart is empty!")
         return redirect("cart:view_cart")  # ✅ Redirect if cart is empty
- 
-    # ✅ Print cart item details for debugging
-    print(f"🛒 Cart Items for {request.user.username}:")
-    for item in cart_items:
-        print(f"   - {item.quantity} x {item.product.name} = ${item.product.price * item.quantity}")
 
-    total_price = sum(item.product.price * item.quantity for item in cart_items)  # ✅ Ensure correct total price calculation
-    print(f"💰 Calculated Total Price: ${total_price}")  # ✅ Debugging total
+    total_price = cart_items.totals()["total"]  # ✅ Computed in the database
 
     if request.method == "POST":
-        with transaction.atomic():
-            order = Order.objects.create(
-                customer=request.user,
-                total_price=total_price,  # ✅ Save correct total price
-                status="Pending"
-            )
-            print(f"✅ Order Created: {order.id} - Total: ${order.total_price}")
+        try:
+            with transaction.atomic():
+                reserve_stock(cart_quantities(cart_items))  # ✅ Debit all lines in one UPDATE
+
+                order = Order.objects.create_from_cart(request.user, cart_items, total_price)  # ✅ Order, items & vendor index
+                order_placed(order)  # ✅ Vendor emails & invoice run in the task worker
 
-            order_items = [
-                OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
-                for item in cart_items
-            ]
-            OrderItem.objects.bulk_create(order_items)
+                cart_items.delete()  # ✅ Clear cart after order placement
 
-            cart_items.delete()  # ✅ Clear cart after order placement
+        except InsufficientStock as e:
+            messages.error(request, str(e))
+            return redirect("cart:view_cart")
 
-            messages.success(request, "Order placed successfully!")
-            return redirect("orders:order_list")  
+        messages.success(request, "Order placed successfully!")
+        return redirect("orders:order_list")
 
     return render(request, "orders/checkout.html", {"cart_items": cart_items})
 
 
 
-@login_required
 def clear_cart(request):
     """Removes all items from the user's cart."""
-    Cart.objects.filter(customer=request.user).delete()
+    cart_storage(request).clear()
     return redirect("cart:view_cart")  # ✅ Use namespace for view_cart
 
-@login_required
 def update_cart(request, item_id):
     """Update the quantity of a cart item."""
-    cart_item = get_object_or_404(Cart, id=item_id, customer=request.user)
+    cart = cart_storage(request)
+    cart_item = cart.line(item_id)
+    if cart_item is None:
+        raise Http404("No such cart item.")
     if request.method == "POST":
-        quantity = int(request.POST.get("quantity", 1))
+        try:
+            quantity = parse_quantity(request.POST.get("quantity", 1), minimum=0)  # 0 removes the line
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect("cart:view_cart")
+        cart.set_quantity(item_id, quantity)
         if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
             messages.success(request, f"Updated quantity for {cart_item.product.name}.")
         else:
-            cart_item.delete()
             messages.success(request, f"Removed {cart_item.product.name} from cart.")
     return redirect("cart:view_cart")
-
-
-
@@ -3,10 +3,3 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
-
-    def ready(self):
-        import inventory.signals  # 👈 Import your signals here
-
-def ready(self):
-    import inventory.signals
-
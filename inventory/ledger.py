@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from products.models import Product
+from utils.db import executemany_update
+from .models import Inventory, StockMovement, StockSnapshot
+
+# Movements younger than this are left out of snapshots, so a transaction that
+# allocated a lower id but commits late is never skipped by the watermark.
+SNAPSHOT_SETTLE_TIME = timedelta(seconds=60)
+
+
+def _latest_snapshots(product_ids=None):
+    """``{product_id: (stock, total_added, last_movement_id)}`` of each product's newest snapshot."""
+    newest = StockSnapshot.objects.filter(product_id=OuterRef("product_id")).order_by("-last_movement_id")
+    snapshots = StockSnapshot.objects.filter(id=Subquery(newest.values("id")[:1]))
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+    return {
+        product_id: (stock, total_added, last_id)
+        for product_id, stock, total_added, last_id in snapshots.values_list(
+            "product_id", "stock", "total_added", "last_movement_id"
+        )
+    }
+
+
+def _tail_sums(movements):
+    """``{product_id: (delta_sum, added_sum)}`` aggregated in one GROUP BY query."""
+    rows = movements.values("product_id").annotate(
+        delta_sum=Sum("delta"),
+        added_sum=Coalesce(
+            Sum("delta", filter=Q(delta__gt=0, reason__in=StockMovement.ADDED_REASONS)), 0
+        ),
+    )
+    return {row["product_id"]: (row["delta_sum"], row["added_sum"]) for row in rows}
+
+
+def _unsnapshotted_movements():
+    """Movements newer than their own product's newest snapshot (the per-product tail)."""
+    newest = StockSnapshot.objects.filter(product_id=OuterRef("product_id")).order_by("-last_movement_id")
+    return StockMovement.objects.filter(
+        id__gt=Coalesce(Subquery(newest.values("last_movement_id")[:1]), 0)
+    )
+
+
+def derive_stock(product_id):
+    """
+    ``(stock, total_added)`` for one product from the ledger: its newest snapshot
+    plus the movements after it. Cost is proportional to the tail, not history.
+    """
+    stock, total_added, last_id = _latest_snapshots([product_id]).get(product_id, (0, 0, 0))
+    delta_sum, added_sum = _tail_sums(
+        StockMovement.objects.filter(product_id=product_id, id__gt=last_id)
+    ).get(product_id, (0, 0))
+    return stock + delta_sum, total_added + added_sum
+
+
+def derive_all_stock(product_ids=None):
+    """
+    ``{product_id: (stock, total_added)}`` for every product with ledger history
+    (or just ``product_ids``), in two queries.
+    """
+    snapshots = _latest_snapshots(product_ids)
+    derived = {pid: (stock, total) for pid, (stock, total, _) in snapshots.items()}
+    tail = _unsnapshotted_movements()
+    if product_ids is not None:
+        tail = tail.filter(product_id__in=product_ids)
+    for product_id, (delta_sum, added_sum) in _tail_sums(tail).items():
+        stock, total = derived.get(product_id, (0, 0))
+        derived[product_id] = (stock + delta_sum, total + added_sum)
+    return derived
+
+
+def take_snapshots(prune=False):
+    """
+    Compact the ledger: write one snapshot per product that moved since its last
+    snapshot, up to a settled watermark. Returns the number of snapshots written.
+    With ``prune`` the superseded snapshots are deleted (movements never are).
+    """
+    cutoff = (
+        StockMovement.objects.filter(created_at__lte=timezone.now() - SNAPSHOT_SETTLE_TIME)
+        .aggregate(last=Max("id"))["last"]
+    )
+    if cutoff is None:
+        return 0
+
+    with transaction.atomic():
+        moved = _tail_sums(_unsnapshotted_movements().filter(id__lte=cutoff))
+        if not moved:
+            return 0
+
+        snapshots = _latest_snapshots(moved.keys())
+        new = []
+        for product_id, (delta_sum, added_sum) in moved.items():
+            stock, total_added, _ = snapshots.get(product_id, (0, 0, 0))
+            new.append(StockSnapshot(
+                product_id=product_id,
+                stock=stock + delta_sum,
+                total_added=total_added + added_sum,
+                last_movement_id=cutoff,
+            ))
+        StockSnapshot.objects.bulk_create(new, batch_size=1000)
+
+        if prune:
+            StockSnapshot.objects.filter(product_id__in=moved.keys(), last_movement_id__lt=cutoff).delete()
+    return len(new)
+
+
+def seed_snapshots():
+    """
+    Opening balances for products with no snapshot yet: back out their recorded
+    movements from the current counters and snapshot the result before the first
+    movement, so the ledger derives exactly today's counters.
+    """
+    tracked = StockSnapshot.objects.values("product_id")
+    recorded = _tail_sums(StockMovement.objects.exclude(product_id__in=tracked))
+    rows = (
+        Product.objects.exclude(id__in=tracked)
+        .values_list("id", "current_stock", "total_stock_added")
+        .iterator(chunk_size=2000)
+    )
+    batch, created = [], 0
+    for product_id, stock, total_added in rows:
+        delta_sum, added_sum = recorded.get(product_id, (0, 0))
+        batch.append(StockSnapshot(
+            product_id=product_id,
+            stock=stock - delta_sum,
+            total_added=total_added - added_sum,
+            last_movement_id=0,
+        ))
+        if len(batch) >= 1000:
+            StockSnapshot.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    StockSnapshot.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def rebuild_counters(dry_run=False):
+    """
+    Overwrite ``Product``/``Inventory`` stock counters with the values derived from
+    the ledger. Returns ``[(product_id, counter, derived)]`` for every mismatch.
+
+    Mismatches are first found without locks, then their product rows are locked
+    and derived again, so stock moved while the rebuild runs is neither
+    overwritten nor reported.
+    """
+    derived = derive_all_stock()
+    counters = Product.objects.values_list("id", "current_stock", "total_stock_added").iterator(chunk_size=2000)
+    suspects = [
+        product_id for product_id, stock, total_added in counters
+        if derived.get(product_id, (stock, total_added)) != (stock, total_added)
+    ]
+    if not suspects:
+        return []
+
+    with transaction.atomic():
+        locked = Product.objects.filter(id__in=suspects).select_for_update().order_by("id")
+        counters = {product_id: (stock, total_added) for product_id, stock, total_added in
+                    locked.values_list("id", "current_stock", "total_stock_added")}
+        derived = derive_all_stock(list(counters))
+        mismatches = [
+            (product_id, counter, derived[product_id])
+            for product_id, counter in counters.items()
+            if product_id in derived and derived[product_id] != counter
+        ]
+        if dry_run or not mismatches:
+            return mismatches
+
+        now = timezone.now()
+        changed = [
+            Product(id=product_id, current_stock=stock, total_stock_added=total_added, updated_at=now)
+            for product_id, _, (stock, total_added) in mismatches
+        ]
+        executemany_update(Product, changed, ["current_stock", "total_stock_added", "updated_at"])
+        inventories = list(
+            Inventory.objects.filter(product_id__in=[product.id for product in changed]).only("id", "product_id")
+        )
+        for inventory in inventories:
+            inventory.quantity, inventory.total_stock_added = derived[inventory.product_id]
+        executemany_update(Inventory, inventories, ["quantity", "total_stock_added"])
+    return mismatches
@@ -0,0 +1,85 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Role
+from inventory.models import Inventory, StockMovement
+from inventory.services import apply_stock_delta, bulk_apply_stock_deltas
+from products.models import Category, Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _legacy_inventory_save(inventory):
+    """The pre-service write path: re-read, save, re-read Product, two full-row Product saves."""
+    old = Inventory.objects.get(pk=inventory.pk)
+    added = inventory.quantity - old.quantity
+    if added > 0:
+        inventory.total_stock_added += added
+    Inventory.objects.filter(pk=inventory.pk).update(
+        quantity=inventory.quantity, total_stock_added=inventory.total_stock_added
+    )
+    product = Product.objects.get(id=inventory.product_id)
+    product.save()  # the old cascade set a nonexistent `stock` attribute, then saved every column
+    product = inventory.product
+    product.current_stock = inventory.quantity
+    product.save()  # and the post_save signal saved every column again
+
+
+class Command(BaseCommand):
+    help = "Compare queries and time per stock change: legacy cascade vs. inventory.services."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options["products"]
+        try:
+            with transaction.atomic():
+                products = self._seed(count)
+                rows = [
+                    ("legacy Inventory.save cascade", lambda: self._run_legacy(products)),
+                    ("Inventory.save", lambda: self._run_inventory_save(products)),
+                    ("apply_stock_delta", lambda: [apply_stock_delta(p.id, 1, StockMovement.RESTOCK) for p in products]),
+                    ("bulk_apply_stock_deltas", lambda: bulk_apply_stock_deltas({p.id: 1 for p in products}, StockMovement.RESTOCK)),
+                ]
+                self.stdout.write(f"{'path':32} {'queries':>9} {'per change':>11} {'seconds':>9}")
+                for label, run in rows:
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        run()
+                        elapsed = time.perf_counter() - started
+                    self.stdout.write(
+                        f"{label:32} {len(queries):>9} {len(queries) / count:>11.2f} {elapsed:>9.3f}"
+                    )
+                raise _Rollback
+        except _Rollback:
+            pass  # benchmark data is never committed
+
+    def _seed(self, count):
+        User = get_user_model()
+        vendor = User.objects.create(
+            username="bench-stock-vendor", role=Role.objects.filter(name=Role.VENDOR).first()
+        )
+        category, _ = Category.objects.get_or_create(name="bench-stock")
+        products = Product.objects.bulk_create([
+            Product(name=f"bench {i}", category=category, vendor=vendor, price=1, current_stock=10)
+            for i in range(count)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=p, quantity=10, total_stock_added=10) for p in products])
+        return products
+
+    def _run_legacy(self, products):
+        for inventory in Inventory.objects.filter(product__in=products).select_related("product"):
+            inventory.quantity += 1
+            _legacy_inventory_save(inventory)
+
+    def _run_inventory_save(self, products):
+        for inventory in Inventory.objects.filter(product__in=products):
+            inventory.quantity += 1
+            inventory.save()
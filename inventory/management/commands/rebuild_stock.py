@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild Product/Inventory stock counters from the StockMovement ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report counters that disagree with the ledger.")
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_counters(dry_run=options["dry_run"])
+        for product_id, counter, derived in mismatches:
+            self.stdout.write(f"product {product_id}: counters {counter} -> ledger {derived}")
+        verb = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(mismatches)} products out of sync."))
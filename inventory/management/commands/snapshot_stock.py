@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.ledger import seed_snapshots, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Compact the stock ledger into per-product snapshots (run periodically, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="First write opening snapshots for products with no ledger history.")
+        parser.add_argument("--prune", action="store_true", help="Delete snapshots superseded by the new ones.")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.stdout.write(f"Seeded {seed_snapshots()} opening snapshots.")
+        written = take_snapshots(prune=options["prune"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} snapshots."))
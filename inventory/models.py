@@ -1,8 +1,22 @@
-from django.db import models
-from django.apps import apps
-from django.utils import timezone
+from django.db import models, transaction
 
-class Inventory(models.Model):
+
+class InventoryBase(models.Model):
+    """
+    Stock counters for one product. Subclasses add the ``product`` link.
+    """
+    quantity = models.PositiveIntegerField(default=0)  # ✅ Current available stock
+    total_stock_added = models.PositiveIntegerField(default=0)  # ✅ Cumulative stock added
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity} in stock"
+
+
+class Inventory(InventoryBase):
     """
     Inventory Model for Tracking Stock
     """
@@ -11,29 +25,105 @@ class Inventory(models.Model):
         on_delete=models.CASCADE,
         related_name="inventory"  # ✅ Use unique related_name to avoid reverse accessor clashes
     )
-    quantity = models.PositiveIntegerField(default=0)  # ✅ Current available stock
-    total_stock_added = models.PositiveIntegerField(default=0)  # ✅ Cumulative stock added
-    last_updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded quantity so save() can compute the change without re-reading the row
+        instance._loaded_quantity = instance.__dict__.get("quantity")
+        return instance
 
     def save(self, *args, **kwargs):
         """
-        Override save to calculate total_stock_added and sync stock to Product model
+        Apply the change in ``quantity`` since it was loaded as a stock delta
+        (``apply_stock_delta``), so Product, this row and the ledger move together
+        and concurrent checkouts are not overwritten. The counters themselves are
+        never written as absolute values.
         """
-        if self.pk:
-            old = Inventory.objects.get(pk=self.pk)
-            added = self.quantity - old.quantity
-            if added > 0:
-                self.total_stock_added += added
+        from .services import apply_stock_delta
+
+        quantity = self.quantity
+        if self._state.adding:
+            delta = quantity
+            self.quantity = self.total_stock_added = 0  # inserted empty; the delta fills both counters
         else:
-            self.total_stock_added = self.quantity
+            loaded = getattr(self, "_loaded_quantity", None)
+            if loaded is None:
+                loaded = type(self).objects.filter(pk=self.pk).values_list("quantity", flat=True).first() or 0
+            delta = self.quantity - loaded
+            if not kwargs.get("update_fields"):
+                kwargs["update_fields"] = [f.name for f in self._meta.concrete_fields if not f.primary_key]
+            kwargs["update_fields"] = [f for f in kwargs["update_fields"] if f not in ("quantity", "total_stock_added")]
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if delta:
+                apply_stock_delta(
+                    self.product_id, delta, StockMovement.RESTOCK if delta > 0 else StockMovement.ADJUSTMENT
+                )
+        self.quantity = self._loaded_quantity = quantity
+        self.total_stock_added += max(delta, 0)
 
+
+class StockMovement(models.Model):
+    """
+    Append-only ledger of every stock change. Rows are only ever inserted;
+    counters on Product/Inventory can be rebuilt from here.
+    """
+    RESTOCK = "Restock"
+    SALE = "Sale"
+    RETURN = "Return"
+    ADJUSTMENT = "Adjustment"
+    IMPORT = "Import"
+
+    REASON_CHOICES = [
+        (RESTOCK, "Restock"),        # Vendor added stock
+        (SALE, "Sale"),              # Reserved by a checkout
+        (RETURN, "Return"),          # Returned / refunded goods back on the shelf
+        (ADJUSTMENT, "Adjustment"),  # Manual correction downwards
+        (IMPORT, "Import"),          # Bulk catalog import
+    ]
+    # Positive movements with these reasons count towards total_stock_added
+    ADDED_REASONS = (RESTOCK, IMPORT)
+
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="stock_movements"
+    )
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "id"], name="stockmovement_product_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only.")
         super().save(*args, **kwargs)
 
-        # ✅ Sync to Product model
-        product_model = apps.get_model("products", "Product")
-        product = product_model.objects.get(id=self.product.id)
-        product.stock = self.quantity
-        product.save()
+    def __str__(self):
+        return f"{self.product_id}: {self.delta:+d} ({self.reason})"
+
+
+class StockSnapshot(models.Model):
+    """
+    Compacted ledger state: a product's counters as of ``last_movement_id``.
+    Current stock = latest snapshot + sum of the movements after it.
+    """
+    product = models.ForeignKey(
+        "products.Product", on_delete=models.CASCADE, related_name="stock_snapshots"
+    )
+    stock = models.IntegerField()
+    total_added = models.IntegerField()
+    last_movement_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "-last_movement_id"], name="stocksnapshot_product_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.product.name} - {self.quantity} in stock"
+        return f"{self.product_id}: {self.stock} @ movement {self.last_movement_id}"
@@ -0,0 +1,154 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+
+
+class StockShortfall:
+    """One product that could not cover the requested quantity."""
+
+    def __init__(self, product_id, name, requested, available):
+        self.product_id = product_id
+        self.name = name
+        self.requested = requested
+        self.available = available
+
+    def __repr__(self):
+        return f"StockShortfall({self.product_id}, requested={self.requested}, available={self.available})"
+
+
+class InsufficientStock(ValueError):
+    """Raised when a reservation cannot be covered; carries every shortfall."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls
+        if shortfalls:
+            super().__init__("Not enough stock for " + ", ".join(s.name for s in shortfalls))
+        else:
+            super().__init__("Not enough stock available.")
+
+
+def _per_row(values, key="id", default=None):
+    """CASE <key> WHEN ... THEN value END, used for per-row values in one UPDATE."""
+    return Case(
+        *[When(**{key: product_id}, then=Value(value)) for product_id, value in values.items()],
+        default=Value(default) if default is not None else None,
+        output_field=IntegerField(),
+    )
+
+
+def _shortfalls(requested):
+    """One SELECT describing every product that cannot cover ``{product_id: quantity}``."""
+    Product = apps.get_model("products", "Product")
+    rows = Product.objects.filter(id__in=requested.keys()).values_list("id", "name", "current_stock")
+    found = {pid: (name, stock) for pid, name, stock in rows}
+    shortfalls = []
+    for product_id, qty in requested.items():
+        name, stock = found.get(product_id, (f"product #{product_id}", 0))
+        if stock < qty:
+            shortfalls.append(StockShortfall(product_id, name, qty, stock))
+    return shortfalls
+
+
+def _sync_inventory(product_ids, added, now):
+    """Mirror Product.current_stock onto Inventory.quantity (and count additions) in one UPDATE."""
+    Inventory = apps.get_model("inventory", "Inventory")
+    Product = apps.get_model("products", "Product")
+    changes = {
+        "quantity": Subquery(Product.objects.filter(id=OuterRef("product_id")).values("current_stock")[:1]),
+        "last_updated": now,
+    }
+    if added:
+        changes["total_stock_added"] = F("total_stock_added") + _per_row(added, key="product_id", default=0)
+    Inventory.objects.filter(product_id__in=product_ids).update(**changes)
+
+
+def bulk_apply_stock_deltas(deltas, reason):
+    """
+    Apply ``{product_id: delta}`` to the Product and Inventory stock counters.
+
+    One UPDATE moves ``Product.current_stock`` (guarded by ``current_stock >= -delta``
+    for debits) and ``total_stock_added``; a second mirrors the result onto
+    ``Inventory``; a single INSERT appends the ``StockMovement`` rows. All or
+    nothing: if any product cannot cover its debit nothing is written and
+    ``InsufficientStock`` lists each shortfall.
+
+    ``reason`` is a ``StockMovement`` reason; only positive deltas with an
+    ``ADDED_REASONS`` reason count towards ``total_stock_added``.
+    """
+    Product = apps.get_model("products", "Product")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    now = timezone.now()
+    debits = {pid: -delta for pid, delta in deltas.items() if delta < 0}
+    added = {pid: delta for pid, delta in deltas.items() if delta > 0} if reason in StockMovement.ADDED_REASONS else {}
+
+    products = Product.objects.filter(id__in=deltas.keys())
+    if debits:
+        products = products.filter(current_stock__gte=_per_row(debits, default=0))
+    changes = {"current_stock": F("current_stock") + _per_row(deltas), "updated_at": now}
+    if added:
+        changes["total_stock_added"] = F("total_stock_added") + _per_row(added, default=0)
+
+    with transaction.atomic():
+        if products.update(**changes) == len(deltas):
+            _sync_inventory(deltas.keys(), added, now)
+            record_movements(deltas, reason)
+            return
+        transaction.set_rollback(True)
+
+    raise InsufficientStock(_shortfalls(debits))
+
+
+def apply_stock_delta(product_id, delta, reason):
+    """Single-product form of ``bulk_apply_stock_deltas``."""
+    bulk_apply_stock_deltas({product_id: delta}, reason)
+
+
+def record_movements(deltas, reason):
+    """Append ``{product_id: delta}`` to the stock ledger in one INSERT."""
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, delta=delta, reason=reason)
+        for product_id, delta in deltas.items() if delta
+    ])
+
+
+def reserve_stock(quantities):
+    """
+    Debit ``{product_id: quantity}`` for an order in a single conditional UPDATE
+    (``WHERE current_stock >= qty``), plus one UPDATE to mirror Inventory and
+    one ledger INSERT.
+
+    Either every line is debited or none is; ``InsufficientStock`` lists each
+    shortfall. Costs a constant number of statements regardless of line count.
+    """
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    bulk_apply_stock_deltas({pid: -qty for pid, qty in quantities.items() if qty > 0}, StockMovement.SALE)
+
+
+def restock_orders(order_ids):
+    """
+    Put every item of the given orders back on the shelf: one grouped SELECT,
+    then ``bulk_apply_stock_deltas`` with the RETURN reason. Returns the units restocked.
+    """
+    OrderItem = apps.get_model("orders", "OrderItem")
+    StockMovement = apps.get_model("inventory", "StockMovement")
+    units = dict(
+        OrderItem.objects.filter(order_id__in=list(order_ids)).order_by()
+        .values_list("product_id").annotate(units=Sum("quantity"))
+    )
+    bulk_apply_stock_deltas(units, StockMovement.RETURN)
+    return sum(units.values())
+
+
+def cart_quantities(cart_items):
+    """Collapse cart rows into ``{product_id: quantity}``."""
+    quantities = {}
+    for item in cart_items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
@@ -1,3 +1,49 @@
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser, Role
+from products.models import Category, Product
+from vendors.models import Inventory as VendorInventory
+from .ledger import rebuild_counters
+from .models import Inventory, StockMovement
+from .services import reserve_stock
+
+
+class InventorySaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("vendor", password="x", role=Role.objects.get_or_create(name=Role.VENDOR)[0])
+        cls.category = Category.objects.create(name="Lamps")
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name="Lamp", category=self.category, vendor=self.vendor, price=10, approval_status="Approved"
+        )
+        Inventory.objects.create(product=self.product, quantity=10)
+
+    def counters(self):
+        product = Product.objects.get(id=self.product.id)
+        inventory = Inventory.objects.get(product=self.product)
+        return product.current_stock, product.total_stock_added, inventory.quantity, inventory.total_stock_added
+
+    def test_creating_adds_the_quantity(self):
+        self.assertEqual(self.counters(), (10, 10, 10, 10))
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_edit_keeps_a_concurrent_sale(self):
+        inventory = Inventory.objects.get(product=self.product)
+        reserve_stock({self.product.id: 3})  # a checkout after the edit form was loaded
+        inventory.quantity += 5
+        inventory.save()
+        self.assertEqual(self.counters(), (12, 15, 12, 15))
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_lowering_is_an_adjustment(self):
+        inventory = Inventory.objects.get(product=self.product)
+        inventory.quantity = 4
+        inventory.save()
+        self.assertEqual(self.counters(), (4, 10, 4, 10))
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.ADJUSTMENT).get().delta, -6)
+
+    def test_vendor_inventory_does_not_move_stock(self):
+        VendorInventory.objects.create(product=self.product, quantity=99)
+        self.assertEqual(self.counters(), (10, 10, 10, 10))
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import Warehouse, Shipment, Fleet
+from .models import Warehouse, Shipment, Fleet, DeliveryRoute, RouteStop
 
 @admin.register(Warehouse)
 class WarehouseAdmin(admin.ModelAdmin):
-    list_display = ["name", "location", "capacity"]
+    list_display = ["name", "location", "latitude", "longitude", "capacity", "occupancy"]
     search_fields = ["name", "location"]
 
 @admin.register(Shipment)
@@ -14,5 +14,16 @@ class ShipmentAdmin(admin.ModelAdmin):
 
 @admin.register(Fleet)
 class FleetAdmin(admin.ModelAdmin):
-    list_display = ["vehicle_name", "license_plate", "capacity", "assigned_driver"]
+    list_display = ["vehicle_name", "license_plate", "capacity", "assigned_driver", "warehouse"]
     search_fields = ["vehicle_name", "license_plate"]
+
+class RouteStopInline(admin.TabularInline):
+    model = RouteStop
+    raw_id_fields = ["shipment"]
+    extra = 0
+
+@admin.register(DeliveryRoute)
+class DeliveryRouteAdmin(admin.ModelAdmin):
+    list_display = ["id", "date", "warehouse", "vehicle", "status", "stop_count", "distance_km"]
+    list_filter = ["status", "date"]
+    inlines = [RouteStopInline]
@@ -5,3 +5,6 @@ class LogisticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'logistics'
 
+
+    def ready(self):
+        import logistics.signals  # noqa: F401  warehouse occupancy and routing index
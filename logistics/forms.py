@@ -5,7 +5,7 @@ from .models import Warehouse, Shipment, Fleet
 class WarehouseForm(forms.ModelForm):
     class Meta:
         model = Warehouse
-        fields = ["name", "location", "capacity"]
+        fields = ["name", "location", "latitude", "longitude", "capacity"]
 
 # 🔹 Shipment Form 
 class ShipmentForm(forms.ModelForm):
@@ -20,5 +20,5 @@ from .models import Fleet
 class FleetForm(forms.ModelForm):
     class Meta:
         model = Fleet
-        fields = ['vehicle_name', 'license_plate', 'capacity', 'assigned_driver']
+        fields = ['vehicle_name', 'license_plate', 'capacity', 'assigned_driver', 'warehouse']
 
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from logistics.services import BATCH_SIZE, backfill_tracking_numbers
+
+
+class Command(BaseCommand):
+    help = "Give shipments created before tracking numbers existed a number, one sequence block per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        updated = backfill_tracking_numbers(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Numbered {updated} shipment(s)."))
@@ -0,0 +1,124 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Role
+from logistics.models import Fleet, Shipment, Warehouse
+from logistics.planning import (
+    nearest_neighbour_tour, pack, plan_routes, project, sweep, tour_length, two_opt,
+)
+from orders.models import Order
+
+
+class _Rollback(Exception):
+    pass
+
+
+def synthetic(shipments, warehouses, seed):
+    """Warehouses scattered over a region, each with a cluster of customer stops around it (degrees)."""
+    rng = random.Random(seed)
+    depots = [(rng.uniform(12.0, 28.0), rng.uniform(72.0, 88.0)) for _ in range(warehouses)]
+    stops = [[] for _ in depots]
+    for key in range(shipments):
+        home = rng.randrange(warehouses)
+        lat, lon = depots[home]
+        stops[home].append((key, lat + rng.gauss(0, 0.15), lon + rng.gauss(0, 0.15)))  # ~15 km spread
+    return depots, stops
+
+
+class Command(BaseCommand):
+    help = "Time route planning (sweep packing, nearest neighbour, 2-opt) on synthetic shipments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shipments", type=int, default=50000)
+        parser.add_argument("--warehouses", type=int, default=20)
+        parser.add_argument("--capacity", type=int, default=150, help="Shipments per vehicle.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument(
+            "--db", action="store_true",
+            help="Also seed the rows and time plan_routes end to end (rolled back afterwards).",
+        )
+
+    def handle(self, *args, **options):
+        depots, stops = synthetic(options["shipments"], options["warehouses"], options["seed"])
+        capacity = options["capacity"]
+        timings = dict.fromkeys(["sweep + pack", "nearest neighbour", "2-opt"], 0.0)
+        routes = 0
+        nn_km = opt_km = 0.0
+        for depot, mine in zip(depots, stops):
+            if not mine:
+                continue
+            started = time.perf_counter()
+            points = project(depot, [(lat, lon) for _, lat, lon in mine])
+            vehicles = [(v, capacity) for v in range(-(-len(mine) // capacity))]
+            loads, _ = pack(sweep(points), vehicles)
+            timings["sweep + pack"] += time.perf_counter() - started
+            for _, members in loads:
+                route = [(0.0, 0.0)] + [points[index] for index in members]
+                started = time.perf_counter()
+                tour = nearest_neighbour_tour(route)
+                timings["nearest neighbour"] += time.perf_counter() - started
+                nn_km += tour_length(route, tour)
+                started = time.perf_counter()
+                two_opt(route, tour)
+                timings["2-opt"] += time.perf_counter() - started
+                opt_km += tour_length(route, tour)
+                routes += 1
+
+        self.stdout.write(
+            f"{options['shipments']} shipments, {options['warehouses']} warehouses, {routes} routes of <= {capacity}"
+        )
+        for label, seconds in timings.items():
+            self.stdout.write(f"{label:20} {seconds:>8.3f} s")
+        self.stdout.write(f"{'total':20} {sum(timings.values()):>8.3f} s")
+        self.stdout.write(
+            f"distance: nearest neighbour {nn_km:,.0f} km, after 2-opt {opt_km:,.0f} km "
+            f"({(1 - opt_km / nn_km) * 100 if nn_km else 0:.1f}% shorter)"
+        )
+        if options["db"]:
+            self._bench_db(depots, stops, capacity)
+
+    def _bench_db(self, depots, stops, capacity):
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                warehouse_ids = self._seed(depots, stops, capacity)
+                seeded = time.perf_counter() - started
+                started = time.perf_counter()
+                result = plan_routes(warehouse_ids=warehouse_ids)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"plan_routes: {len(result.routes)} routes, {len(result.unplanned)} unplanned, "
+                    f"{elapsed:.3f} s (seeding took {seeded:.1f} s)"
+                )
+                raise _Rollback
+        except _Rollback:
+            pass  # benchmark data is never committed
+
+    def _seed(self, depots, stops, capacity):
+        User = get_user_model()
+        role = Role.objects.filter(name=Role.CUSTOMER).first()
+        warehouses = Warehouse.objects.bulk_create([
+            Warehouse(name=f"bench {i}", location="bench", capacity=10 ** 6, latitude=lat, longitude=lon)
+            for i, (lat, lon) in enumerate(depots)
+        ])
+        customers = User.objects.bulk_create([
+            User(username=f"bench-route-{key}", role=role, latitude=lat, longitude=lon)
+            for mine in stops for key, lat, lon in mine
+        ], batch_size=5000)
+        orders = Order.objects.bulk_create(
+            [Order(customer=customer, total_price=1, status="Shipped") for customer in customers], batch_size=5000
+        )
+        homes = [warehouse for warehouse, mine in zip(warehouses, stops) for _ in mine]
+        Shipment.objects.bulk_create(
+            [Shipment(order=order, warehouse=home) for order, home in zip(orders, homes)], batch_size=5000
+        )
+        Fleet.objects.bulk_create([
+            Fleet(vehicle_name=f"bench {i}-{v}", license_plate=f"BENCH-{i}-{v}", capacity=capacity, warehouse=warehouse)
+            for i, (warehouse, mine) in enumerate(zip(warehouses, stops))
+            for v in range(-(-len(mine) // capacity))
+        ])
+        return [warehouse.id for warehouse in warehouses]
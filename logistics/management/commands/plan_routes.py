@@ -0,0 +1,34 @@
+from collections import Counter
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from logistics.planning import plan_routes
+
+
+class Command(BaseCommand):
+    help = "Load the pending shipments onto the available vehicles of each warehouse and save the day's routes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Delivery day (YYYY-MM-DD, default today).")
+        parser.add_argument("--warehouse", type=int, nargs="+", help="Only plan these warehouse ids.")
+
+    def handle(self, *args, **options):
+        day = None
+        if options["date"]:
+            try:
+                day = datetime.strptime(options["date"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"Expected a YYYY-MM-DD date, got {options['date']!r}.")
+
+        result = plan_routes(day, warehouse_ids=options["warehouse"])
+        for route in result.routes:
+            self.stdout.write(
+                f"Route #{route.id}: warehouse {route.warehouse_id}, vehicle {route.vehicle_id}, "
+                f"{route.stop_count} stop(s), {route.distance_km:.1f} km"
+            )
+        for reason, count in Counter(result.unplanned.values()).most_common():
+            self.stdout.write(self.style.WARNING(f"{count} shipment(s) not planned: {reason}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Planned {len(result.routes)} route(s) with {sum(route.stop_count for route in result.routes)} stop(s)."
+        ))
@@ -1,18 +1,106 @@
-from django.db import models
-from django.apps import apps  # ✅ Avoid circular import
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Value, When
+from django.db.models.functions import Greatest
 from accounts.models import CustomUser
+from inventory.services import restock_orders
+from utils.db import bulk_transition
 
 # 🔹 Warehouse Model
+class WarehouseQuerySet(models.QuerySet):
+    def with_space(self):
+        return self.filter(occupancy__lt=F("capacity"))
+
+    def reserve_slot(self, warehouse_id):
+        """Take one free slot in the warehouse if it has one: the check and the increment are one UPDATE."""
+        return bool(self.filter(id=warehouse_id, occupancy__lt=F("capacity")).update(occupancy=F("occupancy") + 1))
+
+    def adjust_occupancy(self, deltas):
+        """Add ``{warehouse_id: delta}`` to the occupancy counters in one UPDATE (never below zero)."""
+        deltas = {warehouse_id: delta for warehouse_id, delta in deltas.items() if warehouse_id and delta}
+        if not deltas:
+            return
+        per_row = Case(
+            *[When(id=warehouse_id, then=Value(delta)) for warehouse_id, delta in deltas.items()],
+            default=Value(0),
+            output_field=models.IntegerField(),
+        )
+        Warehouse.objects.filter(id__in=deltas).update(occupancy=Greatest(F("occupancy") + per_row, Value(0)))
+
+
 class Warehouse(models.Model):
     name = models.CharField(max_length=255)
     location = models.CharField(max_length=255)
     capacity = models.IntegerField()
 
+    # ✅ Coordinates for nearest-warehouse routing (logistics.routing)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    # ✅ Open shipments held here right now; kept current by logistics.signals
+    occupancy = models.PositiveIntegerField(default=0)
+
+    objects = WarehouseQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name} ({self.location})"
 
+    @property
+    def spare_capacity(self):
+        return max(self.capacity - self.occupancy, 0)
+
+
+# 🔹 Tracking-number sequence (logistics.services hands the numbers out)
+class TrackingSequenceQuerySet(models.QuerySet):
+    def allocate(self, count, name="shipment"):
+        """
+        Reserve ``count`` consecutive values of sequence ``name`` with one
+        UPDATE and return the first. The row stays locked until the caller's
+        transaction ends, and a rollback returns the block.
+        """
+        with transaction.atomic():
+            if not self.filter(name=name).update(next_value=F("next_value") + count):
+                self.get_or_create(name=name)
+                self.filter(name=name).update(next_value=F("next_value") + count)
+            return self.filter(name=name).values_list("next_value", flat=True).get() - count
+
+
+class TrackingSequence(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    objects = TrackingSequenceQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name}: next {self.next_value}"
+
 
 # 🔹 Shipment Model
+class ShipmentQuerySet(models.QuerySet):
+    def transition(self, ids, to_status):
+        """
+        Move the given shipments of this queryset to ``to_status`` in one
+        conditional UPDATE; shipments that leave their warehouse free its slot,
+        returns that reach the vendor restock their order's items, and cached
+        tracking answers are dropped after commit.
+        """
+        with transaction.atomic():
+            result = bulk_transition(self, ids, to_status, self.model.TRANSITIONS)
+            if to_status == "Returned to Vendor" and result.moved:
+                # Returned goods are back with the vendor: only now do they go back in stock
+                order_ids = Shipment.objects.filter(id__in=result.moved).values_list("order_id", flat=True)
+                restock_orders(list(order_ids))
+            if to_status in self.model.RELEASED_STATUSES and result.moved:
+                held = (
+                    Shipment.objects.filter(id__in=result.moved, warehouse__isnull=False).order_by()
+                    .values_list("warehouse_id").annotate(count=Count("id"))
+                )
+                Warehouse.objects.adjust_occupancy({warehouse_id: -count for warehouse_id, count in held})
+            if result.moved:
+                from .tracking import invalidate_shipments  # logistics.tracking imports this module
+
+                transaction.on_commit(lambda: invalidate_shipments(result.moved))
+        return result
+
+
 class Shipment(models.Model):
     STATUS_CHOICES = [
         ("Pending", "Pending"),
@@ -22,6 +110,16 @@ class Shipment(models.Model):
         ("Returning", "Returning"),
         ("Returned to Vendor", "Returned to Vendor"),
     ]
+
+    # Allowed moves: status -> statuses it may go to next
+    TRANSITIONS = {
+        "Pending": {"Shipped"},
+        "Shipped": {"Delivered"},
+        "Return Initiated": {"Returning"},
+        "Returning": {"Returned to Vendor"},
+    }
+    # A shipment holds a slot in its warehouse until it reaches one of these
+    RELEASED_STATUSES = ("Delivered", "Returned to Vendor")
     
     order = models.OneToOneField(
         "orders.Order",
@@ -40,13 +138,33 @@ class Shipment(models.Model):
     tracking_number = models.CharField(max_length=50, unique=True, blank=True, null=True)
     is_return = models.BooleanField(default=False)  # ✅ Added to support return shipments
 
+    objects = ShipmentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "is_return"], name="shipment_return_status_idx"),
+            # Partial index for the return queue, which is a small slice of all shipments
+            models.Index(fields=["status"], name="shipment_open_returns_idx", condition=Q(is_return=True)),
+        ]
+
     def __str__(self):
         return f"Shipment {self.id} - {self.status}{' (Return)' if self.is_return else ''}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which warehouse slot the row held, so logistics.signals can move occupancy on save
+        if "warehouse_id" in instance.__dict__ and "status" in instance.__dict__:
+            instance._loaded_held_warehouse_id = instance.held_warehouse_id()
+        return instance
+
+    def held_warehouse_id(self):
+        """The warehouse this shipment occupies a slot in, if any."""
+        return self.warehouse_id if self.status not in self.RELEASED_STATUSES else None
+
     def get_order(self):
-        """Fetch the Order object dynamically to avoid circular import issues."""
-        Order = apps.get_model("orders", "Order")  # ✅ Correct way to avoid import issues
-        return Order.objects.get(id=self.order_id)
+        """The shipment's order (cached on the instance by the FK; loaded with select_related it costs nothing)."""
+        return self.order
 
 
 # 🔹 Fleet Model 
@@ -62,6 +180,60 @@ class Fleet(models.Model):
         blank=True,
         limit_choices_to={"role__name": "Logistics"}  # ✅ Only allow logistics users
     )
+    # ✅ Home depot for route planning; vehicles without one are a shared pool
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="fleet",
+    )
 
     def __str__(self):
         return f"{self.vehicle_name} ({self.license_plate})"
+
+
+# 🔹 Delivery Routes (planned by logistics.planning)
+class DeliveryRoute(models.Model):
+    STATUS_CHOICES = [
+        ("Planned", "Planned"),
+        ("Dispatched", "Dispatched"),
+        ("Completed", "Completed"),
+    ]
+    # Shipments on a route in one of these are not planned again
+    OPEN_STATUSES = ("Planned", "Dispatched")
+
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, related_name="routes")
+    vehicle = models.ForeignKey(Fleet, on_delete=models.CASCADE, related_name="routes")
+    date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Planned")
+    distance_km = models.FloatField(default=0)  # planned round trip from the warehouse
+    stop_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # One route per vehicle and day; also stops two planners from booking the same vehicle
+            models.UniqueConstraint(fields=["vehicle", "date"], name="unique_route_vehicle_date"),
+        ]
+        indexes = [
+            models.Index(fields=["date", "warehouse"], name="route_date_warehouse_idx"),
+        ]
+
+    def __str__(self):
+        return f"Route {self.id} - {self.vehicle_id} on {self.date} ({self.status})"
+
+
+class RouteStop(models.Model):
+    route = models.ForeignKey(DeliveryRoute, on_delete=models.CASCADE, related_name="stops")
+    shipment = models.ForeignKey(Shipment, on_delete=models.CASCADE, related_name="route_stops")
+    sequence = models.PositiveIntegerField()  # 1-based visiting order
+
+    class Meta:
+        ordering = ["route", "sequence"]
+        constraints = [
+            models.UniqueConstraint(fields=["route", "sequence"], name="unique_route_stop_sequence"),
+        ]
+
+    def __str__(self):
+        return f"Stop {self.sequence} of route {self.route_id}: shipment {self.shipment_id}"
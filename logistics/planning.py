@@ -0,0 +1,320 @@
+"""
+Delivery route planning.
+
+``plan_routes(day)`` takes every pending forward shipment that is not already
+on an open route and groups the shipments by warehouse. Each warehouse's
+shipments are loaded onto its own vehicles first, then onto vehicles from
+the shared pool (no home warehouse). Every loaded vehicle becomes one
+``DeliveryRoute`` for that day.
+
+1. Packing (sweep): stops are sorted by bearing from the warehouse, starting
+   just after the widest empty wedge. Each vehicle, largest first, takes the
+   next ``capacity`` stops, so routes cover compact sectors that do not
+   overlap.
+2. Ordering: each route starts as a nearest-neighbour tour out of the
+   warehouse. 2-opt (neighbour lists, don't-look bits) then removes crossings.
+   A uniform grid answers the nearest-point queries for both steps, so a
+   route of m stops costs roughly O(m) plus the reversals.
+
+Coordinates are projected onto a flat plane around each warehouse, in km,
+which is accurate at delivery distances. Capacity counts shipments.
+Shipments without customer coordinates, or that fit on no vehicle, stay
+pending for the next run. The algorithms work on plain tuples;
+``manage.py bench_route_planning`` times them on synthetic data.
+"""
+import heapq
+import math
+from collections import defaultdict, deque, namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DeliveryRoute, Fleet, RouteStop, Shipment, Warehouse
+from .routing import EARTH_RADIUS_KM
+
+NEIGHBOURS = 8  # candidate partners per stop for 2-opt
+EPSILON = 1e-9
+
+RoutePlan = namedtuple("RoutePlan", ["vehicle_id", "stops", "distance_km"])
+PlanResult = namedtuple("PlanResult", ["routes", "unplanned"])
+
+
+# 🔹 Geometry
+def project(depot, coordinates):
+    """``(latitude, longitude)`` pairs as ``(x, y)`` km east/north of ``depot``."""
+    lat0, lon0 = depot
+    scale = math.pi / 180 * EARTH_RADIUS_KM
+    east = scale * math.cos(math.radians(lat0))
+    return [((lon - lon0) * east, (lat - lat0) * scale) for lat, lon in coordinates]
+
+
+def tour_length(points, tour):
+    return sum(
+        math.hypot(points[a][0] - points[b][0], points[a][1] - points[b][1])
+        for a, b in zip(tour, tour[1:] + tour[:1])
+    )
+
+
+class _Grid:
+    """Uniform bucket grid over a point set, about two points per cell."""
+
+    def __init__(self, points):
+        self.points = points
+        xs, ys = [x for x, _ in points], [y for _, y in points]
+        self.min_x, self.min_y = min(xs), min(ys)
+        area = (max(xs) - self.min_x) * (max(ys) - self.min_y)
+        self.size = math.sqrt(2 * area / len(points)) or 1.0
+        self.cells = {}
+        for index, (x, y) in enumerate(points):
+            self.cells.setdefault(self._cell(x, y), []).append(index)
+        self.span = max(max(cx, cy) for cx, cy in self.cells)
+
+    def _cell(self, x, y):
+        return int((x - self.min_x) // self.size), int((y - self.min_y) // self.size)
+
+    def remove(self, index):
+        key = self._cell(*self.points[index])
+        cell = self.cells[key]
+        cell.remove(index)
+        if not cell:
+            del self.cells[key]
+
+    def nearest(self, index, k):
+        """Up to ``k`` ``(distance, index)`` pairs closest to point ``index`` (itself excluded), nearest first."""
+        x, y = self.points[index]
+        cx, cy = self._cell(x, y)
+        found = []  # max-heap of the best k so far, as (-distance, index)
+        for radius in range(self.span + 1):
+            if radius == 0:
+                ring = [(cx, cy)]
+            else:
+                ring = [(cx + d, cy + s) for d in range(-radius, radius + 1) for s in (-radius, radius)]
+                ring += [(cx + s, cy + d) for d in range(1 - radius, radius) for s in (-radius, radius)]
+            for key in ring:
+                for other in self.cells.get(key, ()):
+                    if other != index:
+                        ox, oy = self.points[other]
+                        entry = (-math.hypot(ox - x, oy - y), other)
+                        if len(found) < k:
+                            heapq.heappush(found, entry)
+                        elif entry > found[0]:
+                            heapq.heapreplace(found, entry)
+            # anything not seen yet is in a farther ring, at least radius * size away
+            if len(found) == k and -found[0][0] <= radius * self.size:
+                break
+        return sorted((-distance, other) for distance, other in found)
+
+
+# 🔹 Packing
+def sweep(points):
+    """Indices of ``points`` by bearing from the origin, starting after the widest empty wedge."""
+    bearings = sorted((math.atan2(y, x), index) for index, (x, y) in enumerate(points))
+    if len(bearings) < 2:
+        return [index for _, index in bearings]
+    gaps = [
+        (bearings[(k + 1) % len(bearings)][0] - bearing) % (2 * math.pi)
+        for k, (bearing, _) in enumerate(bearings)
+    ]
+    start = (max(range(len(gaps)), key=gaps.__getitem__) + 1) % len(bearings)
+    return [index for _, index in bearings[start:] + bearings[:start]]
+
+
+def pack(order, vehicles):
+    """
+    Fill ``vehicles`` (``(vehicle_id, capacity)``, in loading order) with
+    consecutive runs of ``order``. Returns ``([(vehicle_id, [indices])], leftover)``.
+    """
+    loads, position = [], 0
+    for vehicle_id, capacity in vehicles:
+        if position >= len(order):
+            break
+        if capacity > 0:
+            loads.append((vehicle_id, order[position:position + capacity]))
+            position += capacity
+    return loads, order[position:]
+
+
+# 🔹 Ordering
+def nearest_neighbour_tour(points):
+    """A closed tour from point 0 (the warehouse) that always drives to the closest unvisited stop."""
+    grid = _Grid(points)
+    grid.remove(0)
+    tour = [0]
+    for _ in range(len(points) - 1):
+        nearest = grid.nearest(tour[-1], 1)[0][1]
+        grid.remove(nearest)
+        tour.append(nearest)
+    return tour
+
+
+def two_opt(points, tour, neighbours=NEIGHBOURS):
+    """
+    Improve a closed tour in place with 2-opt moves until none of the
+    ``neighbours`` nearest candidates of any stop shortens it. Point 0 stays
+    first.
+    """
+    n = len(tour)
+    if n < 4:
+        return tour
+    grid = _Grid(points)
+    near = [[other for _, other in grid.nearest(index, neighbours)] for index in range(n)]
+    position = [0] * n
+    for place, index in enumerate(tour):
+        position[index] = place
+
+    def dist(a, b):
+        return math.hypot(points[a][0] - points[b][0], points[a][1] - points[b][1])
+
+    queue, queued = deque(tour), [True] * n
+    while queue:
+        a = queue.popleft()
+        queued[a] = False
+        improved = False
+        for step in (1, -1):
+            a_next = tour[(position[a] + step) % n]
+            d_a = dist(a, a_next)
+            for c in near[a]:
+                gain = d_a - dist(a, c)
+                if gain <= EPSILON:
+                    break  # candidates are sorted, so no later one can help
+                c_next = tour[(position[c] + step) % n]
+                if c == a_next or c_next == a:
+                    continue
+                if gain + dist(c, c_next) - dist(a_next, c_next) <= EPSILON:
+                    continue
+                # Replace (a, a_next), (c, c_next) with (a, c), (a_next, c_next):
+                # reverse the path between the two edges (never position 0)
+                i, j = (position[a], position[c]) if step == 1 else (position[a_next], position[c_next])
+                i, j = min(i, j), max(i, j)
+                tour[i + 1:j + 1] = tour[i + 1:j + 1][::-1]
+                for place in range(i + 1, j + 1):
+                    position[tour[place]] = place
+                for index in (a, a_next, c, c_next):
+                    if not queued[index]:
+                        queued[index] = True
+                        queue.append(index)
+                improved = True
+                break
+            if improved:
+                break
+    return tour
+
+
+def order_stops(points):
+    """Visiting order (indices into ``points``) and round-trip km for stops around a warehouse at the origin."""
+    if not points:
+        return [], 0.0
+    points = [(0.0, 0.0)] + list(points)
+    tour = two_opt(points, nearest_neighbour_tour(points))
+    return [index - 1 for index in tour[1:]], tour_length(points, tour)
+
+
+def plan_warehouse(depot, stops, vehicles):
+    """
+    Routes for one warehouse. ``depot`` is ``(latitude, longitude)``, ``stops``
+    are ``(key, latitude, longitude)`` and ``vehicles`` are ``(vehicle_id,
+    capacity)`` in loading order. Returns ``([RoutePlan], [keys left over])``.
+    """
+    points = project(depot, [(lat, lon) for _, lat, lon in stops])
+    loads, leftover = pack(sweep(points), vehicles)
+    routes = []
+    for vehicle_id, members in loads:
+        order, distance = order_stops([points[index] for index in members])
+        routes.append(RoutePlan(vehicle_id, [stops[members[k]][0] for k in order], distance))
+    return routes, [stops[index][0] for index in leftover]
+
+
+# 🔹 Planning against the database
+def plannable_shipments():
+    """Pending forward shipments with a warehouse that are not on an open route."""
+    return Shipment.objects.filter(status="Pending", is_return=False, warehouse__isnull=False).exclude(
+        route_stops__route__status__in=DeliveryRoute.OPEN_STATUSES
+    )
+
+
+def plan_routes(day=None, warehouse_ids=None):
+    """
+    Plan and save the routes of ``day`` (default today) for the given
+    warehouses (default all). Vehicles that already have a route that day are
+    left alone. Returns ``PlanResult(routes=[DeliveryRoute], unplanned={shipment_id: reason})``.
+
+    The candidate vehicles are locked before anything is read, so concurrent
+    runs plan one after the other and each sees the routes the other saved.
+    """
+    day = day or timezone.localdate()
+    shipments = plannable_shipments()
+    if warehouse_ids is not None:
+        shipments = shipments.filter(warehouse_id__in=warehouse_ids)
+
+    with transaction.atomic():
+        list(Fleet.objects.select_for_update().filter(capacity__gt=0).order_by("id").values_list("id", flat=True))
+        stops, unplanned = defaultdict(list), {}
+        rows = shipments.values_list("id", "warehouse_id", "order__customer__latitude", "order__customer__longitude")
+        for shipment_id, warehouse_id, lat, lon in rows.iterator(chunk_size=5000):
+            if lat is None or lon is None:
+                unplanned[shipment_id] = "customer has no coordinates"
+            else:
+                stops[warehouse_id].append((shipment_id, lat, lon))
+        if not stops:
+            return PlanResult([], unplanned)
+
+        located = Warehouse.objects.filter(id__in=stops, latitude__isnull=False, longitude__isnull=False)
+        depots = {warehouse_id: (lat, lon) for warehouse_id, lat, lon in located.values_list("id", "latitude", "longitude")}
+        own, pool = defaultdict(list), []
+        available = (
+            Fleet.objects.filter(capacity__gt=0)
+            .exclude(id__in=DeliveryRoute.objects.filter(date=day).values("vehicle_id"))
+            .order_by("-capacity", "id")
+        )
+        for vehicle_id, home_id, capacity in available.values_list("id", "warehouse_id", "capacity"):
+            (own[home_id] if home_id else pool).append((vehicle_id, capacity))
+
+        planned = []
+        # Busiest warehouses draw on the shared pool first
+        for warehouse_id in sorted(stops, key=lambda w: -len(stops[w])):
+            mine = stops[warehouse_id]
+            fleet = own[warehouse_id]
+            short = len(mine) - sum(capacity for _, capacity in fleet)
+            while short > 0 and pool:
+                fleet.append(pool.pop(0))
+                short -= fleet[-1][1]
+            fleet.sort(key=lambda vehicle: -vehicle[1])
+            # A warehouse without coordinates starts its routes from the middle of its stops
+            depot = depots.get(warehouse_id) or (
+                sum(lat for _, lat, _ in mine) / len(mine), sum(lon for _, _, lon in mine) / len(mine)
+            )
+            routes, leftover = plan_warehouse(depot, mine, fleet)
+            planned += [(warehouse_id, route) for route in routes]
+            unplanned.update(dict.fromkeys(leftover, "no vehicle capacity left"))
+
+        created = DeliveryRoute.objects.bulk_create([
+            DeliveryRoute(
+                warehouse_id=warehouse_id,
+                vehicle_id=route.vehicle_id,
+                date=day,
+                distance_km=round(route.distance_km, 2),
+                stop_count=len(route.stops),
+            )
+            for warehouse_id, route in planned
+        ])
+        if any(record.pk is None for record in created):  # backends that return no ids from bulk_create (MySQL)
+            saved = {
+                record.vehicle_id: record
+                for record in DeliveryRoute.objects.filter(date=day, vehicle_id__in=[r.vehicle_id for r in created])
+            }
+            created = [saved[record.vehicle_id] for record in created]
+        RouteStop.objects.bulk_create([
+            RouteStop(route=record, shipment_id=shipment_id, sequence=sequence)
+            for record, (_, route) in zip(created, planned)
+            for sequence, shipment_id in enumerate(route.stops, start=1)
+        ], batch_size=5000)
+    return PlanResult(created, unplanned)
+
+
+def dispatch_route(route):
+    """Send a planned route out: its shipments move to Shipped in one UPDATE. Returns the TransitionResult."""
+    with transaction.atomic():
+        if not DeliveryRoute.objects.filter(id=route.id, status="Planned").update(status="Dispatched"):
+            return None
+        route.status = "Dispatched"
+        return Shipment.objects.transition(list(route.stops.values_list("shipment_id", flat=True)), "Shipped")
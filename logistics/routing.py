@@ -0,0 +1,197 @@
+"""
+Nearest-warehouse routing.
+
+Warehouses with coordinates are indexed in a KD-tree over points on the unit
+sphere (straight-line distance there orders warehouses exactly like
+great-circle distance). The tree yields warehouses nearest-first in
+O(log n) each; ``WarehouseRouter.reserve_nearest`` checks them a few at a
+time against the live occupancy counters and takes a slot in the first that
+has one free, with a conditional UPDATE.
+
+Each process builds the index on first use and rebuilds it when a warehouse
+is saved or deleted: ``logistics.signals`` bumps a version counter in the
+cache, so every process notices on its next lookup.
+"""
+import heapq
+import math
+import threading
+import time
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Warehouse
+
+EARTH_RADIUS_KM = 6371.0
+CANDIDATES_PER_QUERY = 8  # nearest warehouses checked per occupancy query
+VERSION_KEY = "logistics:warehouse-index:v"
+
+
+def to_unit_vector(latitude, longitude):
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def chord_to_km(chord):
+    return 2 * math.asin(min(chord / 2, 1.0)) * EARTH_RADIUS_KM
+
+
+class KDTree:
+    """Static 3-d tree of ``(x, y, z, key)`` points; ``nearest`` walks it best-first."""
+
+    def __init__(self, points):
+        self._nodes = []  # (point, left, right, box_low, box_high)
+        self._root = self._build(list(points), 0)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _build(self, points, depth):
+        if not points:
+            return -1
+        axis = depth % 3
+        points.sort(key=lambda point: point[axis])
+        middle = len(points) // 2
+        low = tuple(min(point[i] for point in points) for i in range(3))
+        high = tuple(max(point[i] for point in points) for i in range(3))
+        index = len(self._nodes)
+        self._nodes.append(None)
+        left = self._build(points[:middle], depth + 1)
+        right = self._build(points[middle + 1:], depth + 1)
+        self._nodes[index] = (points[middle], left, right, low, high)
+        return index
+
+    @staticmethod
+    def _box_distance(low, high, query):
+        return sum(max(lo - q, 0.0, q - hi) ** 2 for lo, hi, q in zip(low, high, query))
+
+    def nearest(self, query):
+        """Yield ``(key, squared distance)`` for every point, nearest first."""
+        if self._root < 0:
+            return
+        node = self._nodes[self._root]
+        heap = [(self._box_distance(node[3], node[4], query), 0, self._root)]  # (distance, is_point, index)
+        while heap:
+            distance, is_point, index = heapq.heappop(heap)
+            if is_point:
+                yield self._nodes[index][0][3], distance
+                continue
+            point, left, right, _, _ = self._nodes[index]
+            heapq.heappush(heap, (sum((p - q) ** 2 for p, q in zip(point[:3], query)), 1, index))
+            for child in (left, right):
+                if child >= 0:
+                    low, high = self._nodes[child][3], self._nodes[child][4]
+                    heapq.heappush(heap, (self._box_distance(low, high, query), 0, child))
+
+
+class WarehouseRouter:
+    def __init__(self, rows):
+        """``rows``: ``(warehouse_id, latitude, longitude)`` of every warehouse with coordinates."""
+        self.tree = KDTree((*to_unit_vector(lat, lon), warehouse_id) for warehouse_id, lat, lon in rows)
+
+    def nearest(self, latitude, longitude):
+        """Yield ``(warehouse_id, km)`` nearest first, ignoring capacity."""
+        for warehouse_id, squared in self.tree.nearest(to_unit_vector(latitude, longitude)):
+            yield warehouse_id, chord_to_km(math.sqrt(squared))
+
+    def reserve_nearest(self, latitude, longitude):
+        """Take a slot in the nearest warehouse that has one free; returns its id, or None when all are full."""
+        candidates = self.nearest(latitude, longitude)
+        while True:
+            batch = [warehouse_id for warehouse_id, _ in islice(candidates, CANDIDATES_PER_QUERY)]
+            if not batch:
+                return None
+            # One read skips the full ones; the conditional UPDATE decides, so concurrent callers never overfill
+            with_space = set(Warehouse.objects.with_space().filter(id__in=batch).values_list("id", flat=True))
+            for warehouse_id in batch:
+                if warehouse_id in with_space and Warehouse.objects.reserve_slot(warehouse_id):
+                    return warehouse_id
+
+
+# 🔹 Per-process router, rebuilt when the shared version moves
+_router = None
+_router_version = None
+_router_lock = threading.Lock()
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def get_router():
+    global _router, _router_version
+    version = _current_version()
+    with _router_lock:
+        if _router is None or version != _router_version:
+            rows = Warehouse.objects.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+                "id", "latitude", "longitude"
+            )
+            _router, _router_version = WarehouseRouter(rows), version
+        return _router
+
+
+def invalidate_router():
+    """Warehouses changed: every process rebuilds its index on the next lookup."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns() // 1000, timeout=None)
+
+
+def reserve_warehouse(latitude=None, longitude=None):
+    """
+    Take a free slot in the warehouse nearest to the given point; without
+    coordinates (or nothing indexed with space) in the one with the most spare
+    capacity. Returns its id, or None when every warehouse is full.
+
+    The slot is taken right away, in the same UPDATE that checks capacity. The
+    shipment that fills it must be saved with ``_reserved_warehouse_id`` set
+    (see ``logistics.tasks.create_return_shipment``) so it is not counted twice.
+    """
+    if latitude is not None and longitude is not None:
+        warehouse_id = get_router().reserve_nearest(latitude, longitude)
+        if warehouse_id is not None:
+            return warehouse_id
+    roomiest = Warehouse.objects.with_space().order_by(F("occupancy") - F("capacity"), "id").values_list("id", flat=True)
+    for warehouse_id in roomiest.iterator():
+        if Warehouse.objects.reserve_slot(warehouse_id):
+            return warehouse_id
+    return None
+
+
+def reserve_warehouse_for_customer(user):
+    return reserve_warehouse(user.latitude, user.longitude)
+
+
+def assign_warehouses(points):
+    """
+    Nearest warehouses with space for a batch: ``{key: (latitude, longitude) or None}``
+    to ``{key: warehouse_id or None}``. The warehouses with space are locked and
+    read once and their free slots counted down in memory, so neither this
+    batch nor a concurrent one overfills a warehouse. Call inside the
+    transaction that then adds the occupancy.
+    """
+    spare = {
+        warehouse_id: capacity - occupancy
+        for warehouse_id, capacity, occupancy in Warehouse.objects.with_space().select_for_update()
+        .values_list("id", "capacity", "occupancy")
+    }
+    free = sum(spare.values())
+    router = get_router() if spare else None
+    assigned = {}
+    for key, point in points.items():
+        warehouse_id = None
+        if free > 0 and point is not None and None not in point:
+            warehouse_id = next((w for w, _ in router.nearest(*point) if spare.get(w, 0) > 0), None)
+        if warehouse_id is None and free > 0:
+            warehouse_id = max(spare, key=lambda w: (spare[w], -w))
+        if warehouse_id is not None:
+            spare[warehouse_id] -= 1
+            free -= 1
+        assigned[key] = warehouse_id
+    return assigned
@@ -0,0 +1,71 @@
+"""
+Shipment creation in bulk.
+
+``create_shipments`` gives every order in a batch its shipment with one
+``bulk_create``. Tracking numbers come from one block of the
+``TrackingSequence`` (one UPDATE per batch), so no number is ever probed for
+uniqueness. Warehouses are assigned in memory (``assign_warehouses``), and
+occupancy moves with one UPDATE, because ``bulk_create`` skips the
+``logistics.signals`` handlers. Single saves get their number from the
+``pre_save`` signal instead.
+"""
+from collections import Counter
+
+from django.db import transaction
+
+from orders.models import Order
+from utils.db import executemany_update
+from .models import Shipment, Warehouse
+from .routing import assign_warehouses
+from .tracking import invalidate, new_tracking_numbers
+
+BATCH_SIZE = 1000
+
+
+# 🔹 Shipments
+def create_shipments(order_ids):
+    """
+    Create the missing shipments of ``order_ids`` in one transaction and
+    return them. Orders that already have one are left alone. Each order ships
+    from its current warehouse, or else from the nearest one with space.
+    """
+    with transaction.atomic():
+        rows = list(
+            Order.objects.select_for_update(of=("self",))
+            .filter(id__in=list(order_ids), shipment__isnull=True)
+            .order_by("id")
+            .values_list("id", "current_warehouse_id", "customer__latitude", "customer__longitude")
+        )
+        if not rows:
+            return []
+        assigned = assign_warehouses({
+            order_id: (lat, lon) for order_id, current, lat, lon in rows if current is None
+        })
+        numbers = new_tracking_numbers(len(rows))
+        shipments = Shipment.objects.bulk_create([
+            Shipment(order_id=order_id, warehouse_id=current or assigned[order_id], tracking_number=number)
+            for (order_id, current, _, _), number in zip(rows, numbers)
+        ], batch_size=BATCH_SIZE)
+        Warehouse.objects.adjust_occupancy(Counter(shipment.warehouse_id for shipment in shipments))
+        transaction.on_commit(lambda: invalidate(numbers))  # a number may have been looked up as unknown
+    return shipments
+
+
+def backfill_tracking_numbers(batch_size=BATCH_SIZE):
+    """Number the shipments created before tracking numbers were issued, a block per batch. Returns how many."""
+    updated = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Shipment.objects.select_for_update().filter(tracking_number__isnull=True)
+                .order_by("id").values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return updated
+            shipments = [
+                Shipment(id=shipment_id, tracking_number=number)
+                for shipment_id, number in zip(ids, new_tracking_numbers(len(ids)))
+            ]
+            executemany_update(Shipment, shipments, ["tracking_number"])
+            transaction.on_commit(lambda numbers=[s.tracking_number for s in shipments]: invalidate(numbers))
+        updated += len(ids)
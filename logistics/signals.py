@@ -0,0 +1,61 @@
+# logistics/signals.py
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Shipment, Warehouse
+from .routing import invalidate_router
+from .tracking import invalidate, new_tracking_numbers
+
+
+# 🔹 Tracking numbers for shipments saved one at a time (create_shipments numbers its own batch)
+@receiver(pre_save, sender=Shipment)
+def assign_tracking_number(sender, instance, **kwargs):
+    if instance._state.adding and not instance.tracking_number:
+        instance.tracking_number = new_tracking_numbers(1)[0]
+
+
+# 🔹 Cached tracking answers go stale with any saved or deleted shipment
+@receiver(post_save, sender=Shipment)
+@receiver(post_delete, sender=Shipment)
+def invalidate_tracking(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate([instance.tracking_number]))
+
+
+# 🔹 Warehouse occupancy: a shipment holds a slot from arrival until it is released
+@receiver(pre_save, sender=Shipment)
+def load_held_warehouse(sender, instance, **kwargs):
+    """Only for instances not loaded from the database with their warehouse and status."""
+    if instance._state.adding:
+        instance._loaded_held_warehouse_id = None
+    elif not hasattr(instance, "_loaded_held_warehouse_id"):
+        row = Shipment.objects.filter(id=instance.id).values_list("warehouse_id", "status").first()
+        held = row and row[1] not in Shipment.RELEASED_STATUSES and row[0]
+        instance._loaded_held_warehouse_id = held or None
+
+
+@receiver(post_save, sender=Shipment)
+def move_occupancy(sender, instance, **kwargs):
+    """A slot taken in advance (``_reserved_warehouse_id``, see ``routing.reserve_warehouse``) is handed over, not counted again."""
+    old, new = instance._loaded_held_warehouse_id, instance.held_warehouse_id()
+    deltas = Counter()
+    if old != new:
+        deltas[old] -= 1
+        deltas[new] += 1
+    deltas[instance.__dict__.pop("_reserved_warehouse_id", None)] -= 1
+    Warehouse.objects.adjust_occupancy(deltas)
+    instance._loaded_held_warehouse_id = new
+
+
+@receiver(post_delete, sender=Shipment)
+def release_occupancy(sender, instance, **kwargs):
+    Warehouse.objects.adjust_occupancy({getattr(instance, "_loaded_held_warehouse_id", instance.held_warehouse_id()): -1})
+
+
+# 🔹 Rebuild the routing index when warehouses change (after commit, so rollbacks never leak in)
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Warehouse)
+def refresh_router(sender, **kwargs):
+    transaction.on_commit(invalidate_router)
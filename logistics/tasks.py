@@ -0,0 +1,35 @@
+from django.db import transaction
+
+from orders.tasks import task
+from .models import Shipment, Warehouse
+from .services import create_shipments
+
+
+# ✅ Forward shipment of a shipped order (one per order); kept for tasks queued before shipments were created in bulk
+@task("logistics.create_shipment")
+def create_shipment(order_id):
+    create_shipments([order_id])
+
+
+# ✅ Return leg: the order's shipment is turned into a return (or created as one)
+@task("logistics.create_return_shipment")
+def create_return_shipment(order_id, warehouse_id=None, reserved=False):
+    """``reserved``: the view already took a slot in ``warehouse_id`` (``reserve_warehouse``), which the shipment takes over."""
+    with transaction.atomic():
+        shipment = Shipment.objects.select_for_update().filter(order_id=order_id).first()
+        if shipment is not None and shipment.is_return:
+            # A retry, or returned another way: give back a reserved slot the shipment does not hold
+            if reserved and shipment.held_warehouse_id() != warehouse_id:
+                Warehouse.objects.adjust_occupancy({warehouse_id: -1})
+            return
+        if shipment is None:
+            shipment = Shipment(order_id=order_id, warehouse_id=warehouse_id, status="Return Initiated", is_return=True)
+            update_fields = None
+        else:
+            shipment.is_return = True
+            shipment.status = "Return Initiated"
+            shipment.warehouse_id = warehouse_id or shipment.warehouse_id
+            update_fields = ["is_return", "status", "warehouse"]
+        if reserved:
+            shipment._reserved_warehouse_id = warehouse_id
+        shipment.save(update_fields=update_fields)  # signals move the occupancy
@@ -1,3 +1,125 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import CustomUser, Role
+from orders.models import Order
+from .models import Fleet, RouteStop, Shipment, Warehouse
+from .planning import plan_routes
+from .services import create_shipments
+from .tracking import is_tracking_number
+
+
+class CreateShipmentsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = CustomUser.objects.create_user(
+            "customer", password="x", role=Role.objects.get_or_create(name=Role.CUSTOMER)[0], latitude=12.9, longitude=77.6
+        )
+        cls.near = Warehouse.objects.create(name="Near", location="Bengaluru", capacity=2, latitude=13.0, longitude=77.6)
+        cls.far = Warehouse.objects.create(name="Far", location="Delhi", capacity=10, latitude=28.6, longitude=77.2)
+
+    def make_orders(self, count, **fields):
+        return [order.id for order in Order.objects.bulk_create([
+            Order(customer=self.customer, status="Packaged", **fields) for _ in range(count)
+        ])]
+
+    def occupancy(self, warehouse):
+        return Warehouse.objects.get(id=warehouse.id).occupancy
+
+    def test_one_shipment_per_order_with_unique_tracking_numbers(self):
+        ids = self.make_orders(5)
+        shipments = create_shipments(ids)
+        self.assertEqual(sorted(s.order_id for s in shipments), ids)
+        numbers = [s.tracking_number for s in shipments]
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertTrue(all(is_tracking_number(number) for number in numbers))
+
+    def test_nearest_warehouse_until_it_is_full(self):
+        shipments = create_shipments(self.make_orders(3))
+        self.assertEqual(sorted(s.warehouse_id for s in shipments), sorted([self.near.id, self.near.id, self.far.id]))
+        self.assertEqual((self.occupancy(self.near), self.occupancy(self.far)), (2, 1))
+
+    def test_current_warehouse_is_kept(self):
+        shipments = create_shipments(self.make_orders(2, current_warehouse=self.far))
+        self.assertEqual({s.warehouse_id for s in shipments}, {self.far.id})
+        self.assertEqual((self.occupancy(self.near), self.occupancy(self.far)), (0, 2))
+
+    def test_orders_with_a_shipment_are_left_alone(self):
+        ids = self.make_orders(2)
+        create_shipments(ids[:1])
+        shipments = create_shipments(ids)
+        self.assertEqual([s.order_id for s in shipments], ids[1:])
+        self.assertEqual(create_shipments(ids), [])
+        self.assertEqual(Shipment.objects.count(), 2)
+        self.assertEqual(self.occupancy(self.near), 2)
+
+
+class ReturnShipmentStatusTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        role = Role.objects.get_or_create(name=Role.LOGISTICS)[0]
+        cls.logistics = CustomUser.objects.create_user("logistics", password="x", role=role)
+        cls.customer = CustomUser.objects.create_user("customer", password="x", role=Role.objects.get_or_create(name=Role.CUSTOMER)[0])
+
+    def test_return_moves_along_the_return_transitions(self):
+        order = Order.objects.create(customer=self.customer, status="Return Initiated")
+        shipment = Shipment.objects.create(order=order, status="Return Initiated", is_return=True)
+        self.client.force_login(self.logistics)
+        url = reverse("logistics:update_return_shipment_status", args=[shipment.id])
+        statuses = []
+        for _ in range(3):
+            self.assertRedirects(self.client.get(url), reverse("logistics:return_shipments"), fetch_redirect_response=False)
+            statuses.append(Shipment.objects.get(id=shipment.id).status)
+        self.assertEqual(statuses, ["Returning", "Returned to Vendor", "Returned to Vendor"])
+
+    def test_outgoing_shipments_are_not_found(self):
+        shipment = Shipment.objects.create(order=Order.objects.create(customer=self.customer))
+        self.client.force_login(self.logistics)
+        response = self.client.get(reverse("logistics:update_return_shipment_status", args=[shipment.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Shipment.objects.get(id=shipment.id).status, "Pending")
+
+
+class PlanRoutesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = CustomUser.objects.create_user(
+            "customer", password="x", role=Role.objects.get_or_create(name=Role.CUSTOMER)[0], latitude=18.52, longitude=73.85
+        )
+        warehouse = Warehouse.objects.create(name="Pune", location="Pune", capacity=50, latitude=18.5, longitude=73.8)
+        Fleet.objects.bulk_create([
+            Fleet(vehicle_name=f"Van {n}", license_plate=f"MH-{n}", capacity=3, warehouse=warehouse) for n in range(2)
+        ])
+        orders = Order.objects.bulk_create([Order(customer=customer, status="Packaged") for _ in range(5)])
+        Shipment.objects.bulk_create([Shipment(order=order, warehouse=warehouse) for order in orders])
+
+    def test_stops_point_at_their_routes_without_returned_ids(self):
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            result = plan_routes()
+        self.assertEqual(len(result.routes), 2)
+        self.assertTrue(all(route.pk for route in result.routes))
+        self.assertEqual(set(RouteStop.objects.values_list("route_id", flat=True)), {route.pk for route in result.routes})
+        self.assertEqual(RouteStop.objects.count(), 5)
+
+    def test_second_run_plans_nothing_again(self):
+        plan_routes()
+        self.assertEqual(plan_routes().routes, [])
+        self.assertEqual(RouteStop.objects.count(), 5)
+
+
+@skipUnless(connection.vendor == "sqlite", "the query plans checked are SQLite's")
+class IndexUsageTests(TestCase):
+    """EXPLAIN QUERY PLAN shows each hot lookup searching through its index."""
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertRegex(queryset.explain(), rf"SEARCH \S+ USING (COVERING )?INDEX {index}\b")
+
+    def test_outgoing_shipments_by_status(self):
+        self.assertUsesIndex(Shipment.objects.filter(is_return=False, status="Pending"), "shipment_return_status_idx")
 
-# Create your tests here.
+    def test_open_returns(self):
+        queryset = Shipment.objects.filter(is_return=True, status__in=["Return Initiated", "Returning"])
+        self.assertUsesIndex(queryset, "shipment_open_returns_idx")
@@ -0,0 +1,195 @@
+"""
+Tracking numbers and the public tracking lookup.
+
+Tracking numbers are "EC", then 10 digits, then a Luhn check digit. The
+digits are a value from the ``TrackingSequence`` put through a permutation
+keyed by ``SECRET_KEY`` (``_scramble``), so consecutive shipments get
+unrelated numbers and nobody can walk the sequence without the key. They
+are handed out a block per batch by ``new_tracking_numbers``.
+
+``tracking_status(number)`` returns a small JSON-ready dict with the
+shipment's status, warehouse and the order's status history. Answers are
+cached at two levels:
+
+- a per-process LRU with a short TTL, so a polling burst never leaves the
+  process;
+- the shared Django cache, for a longer time, so other processes and
+  restarts do not go back to the database.
+
+Unknown numbers are only remembered by the local LRU, so probing does not
+fill the shared cache. Malformed ones (``is_tracking_number``) are rejected
+before either cache.
+
+Anything that changes what a tracking page shows clears the shared entry
+and this process's copy after commit (``invalidate``): shipment saves and
+transitions, bulk shipment creation, and order status events. Other
+processes see the change within ``LOCAL_TTL``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+from orders.models import Order, OrderEvent
+from .models import Shipment, TrackingSequence
+
+TRACKING_PREFIX = "EC"
+TRACKING_DIGITS = 10
+HALF = 10 ** (TRACKING_DIGITS // 2)  # the permutation works on two halves of the digits
+ROUNDS = 4
+
+PREFIX = "tracking"
+LOCAL_SIZE = 10000  # entries kept per process
+LOCAL_TTL = 5  # seconds a process serves its own copy
+SHARED_TTL = 60 * 10
+UNKNOWN = "unknown"  # locally cached answer for a well-formed number with no shipment
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache whose entries also expire ``ttl`` seconds after being set."""
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize, self.ttl, self.clock = maxsize, ttl, clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 🔹 Tracking numbers: prefix + scrambled sequence value + Luhn check digit
+def _round(index, half):
+    digest = salted_hmac("logistics.tracking", f"{index}:{half}").digest()
+    return int.from_bytes(digest[:8], "big") % HALF
+
+
+def _scramble(value):
+    """Keyed bijection of ``[0, 10**TRACKING_DIGITS)`` onto itself (a Feistel network on the two halves)."""
+    left, right = divmod(value, HALF)
+    for index in range(ROUNDS):
+        left, right = right, (left + _round(index, right)) % HALF
+    return left * HALF + right
+
+
+def _check_digit(digits):
+    total = 0
+    for position, digit in enumerate(reversed(digits)):
+        value = int(digit) * (2 if position % 2 == 0 else 1)
+        total += value - 9 if value > 9 else value
+    return str(-total % 10)
+
+
+def format_tracking_number(value):
+    digits = f"{_scramble(value):0{TRACKING_DIGITS}d}"
+    return f"{TRACKING_PREFIX}{digits}{_check_digit(digits)}"
+
+
+def is_tracking_number(text):
+    """Well-formed with a matching check digit; rejects typos before any lookup."""
+    digits = text[len(TRACKING_PREFIX):]
+    return (
+        text.startswith(TRACKING_PREFIX)
+        and len(digits) == TRACKING_DIGITS + 1
+        and digits.isdigit()
+        and _check_digit(digits[:-1]) == digits[-1]
+    )
+
+
+def new_tracking_numbers(count):
+    """``count`` fresh tracking numbers from one block. Call inside the transaction that stores them."""
+    if count <= 0:
+        return []
+    first = TrackingSequence.objects.allocate(count)
+    return [format_tracking_number(value) for value in range(first, first + count)]
+
+
+# 🔹 Cached lookups
+_local = LRUCache(LOCAL_SIZE, LOCAL_TTL)
+_build_locks = [threading.Lock() for _ in range(64)]  # one build per number at a time in this process
+
+
+def _key(number):
+    return f"{PREFIX}:{number}"
+
+
+def build_status(number):
+    """The tracking answer straight from the database (two queries), or None for an unknown number."""
+    shipment = Shipment.objects.select_related("warehouse").filter(tracking_number=number).first()
+    if shipment is None:
+        return None
+    events = (
+        OrderEvent.objects.filter(order_id=shipment.order_id)
+        .order_by("created_at", "id")
+        .values_list("status", "created_at")
+    )
+    return {
+        "tracking_number": number,
+        "status": shipment.status,
+        "is_return": shipment.is_return,
+        "warehouse": shipment.warehouse.name if shipment.warehouse else None,
+        "events": [{"status": Order.STATUS_NAMES[code], "at": at.isoformat()} for code, at in events],
+    }
+
+
+def tracking_status(number):
+    """The cached tracking answer for ``number``, or None when it is malformed or unknown."""
+    if not is_tracking_number(number):
+        return None
+    key = _key(number)
+    value = _local.get(key)
+    if value is None:
+        with _build_locks[hash(key) % len(_build_locks)]:
+            value = _local.get(key)  # built by another thread while we waited
+            if value is None:
+                value = cache.get(key)
+                if value is None:
+                    value = build_status(number) or UNKNOWN
+                    if value != UNKNOWN:
+                        cache.set(key, value, timeout=SHARED_TTL)
+                _local.set(key, value)
+    return None if value == UNKNOWN else value
+
+
+# 🔹 Invalidation (call after commit)
+def invalidate(numbers):
+    keys = [_key(number) for number in numbers if number]
+    if keys:
+        cache.delete_many(keys)
+        _local.delete_many(keys)
+
+
+def invalidate_shipments(shipment_ids):
+    invalidate(Shipment.objects.filter(id__in=list(shipment_ids)).values_list("tracking_number", flat=True))
+
+
+def invalidate_orders(order_ids):
+    invalidate(Shipment.objects.filter(order_id__in=list(order_ids)).values_list("tracking_number", flat=True))
@@ -16,6 +16,7 @@ urlpatterns = [
     path("shipments/", views.shipment_list, name="shipment_list"),
     
     path("shipments/update/<int:shipment_id>/<str:status>/", views.update_shipment_status, name="update_shipment_status"),
+    path("shipments/bulk-update/", views.bulk_update_shipments, name="bulk_update_shipments"),
 
     # Return Shipments
     path("shipments/return/", views.return_shipments, name="return_shipments"),
@@ -30,5 +31,13 @@ urlpatterns = [
     # Fleet Management
     path('fleet/', views.fleet_list, name='fleet_list'),
     path('fleet/add/', views.add_vehicle, name='add_vehicle'), 
+
+    # Public Tracking
+    path("track/<str:tracking_number>/", views.track_shipment, name="track_shipment"),
+
+    # Delivery Routes
+    path("routes/", views.delivery_routes, name="delivery_routes"),
+    path("routes/<int:route_id>/", views.route_detail, name="route_detail"),
+    path("routes/<int:route_id>/dispatch/", views.dispatch_delivery_route, name="dispatch_delivery_route"),
     
 ]
@@ -1,10 +1,21 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Warehouse, Shipment, Fleet
+from django.db import transaction
+from django.http import Http404, JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET, require_POST
+from .models import Warehouse, Shipment, Fleet, DeliveryRoute
 from .forms import WarehouseForm, ShipmentForm, FleetForm
 from accounts.decorators import role_required
 from orders.models import Order  # ✅ Required to create shipment for order
+from orders.services import describe_rejections, parse_ids
+from orders.tasks import enqueue
+from .planning import dispatch_route, plan_routes
+from .routing import reserve_warehouse_for_customer
+from .tracking import LOCAL_TTL, tracking_status
+from utils.pagination import paginate_by_cursor
 
 
 # 🔹 Return Shipments View
@@ -14,27 +25,27 @@ from orders.models import Order  # ✅ Required to create shipment for order
 @login_required
 @role_required("Logistics")
 def return_shipments(request):
-    shipments = Shipment.objects.filter(is_return=True)
-    return render(request, "logistics/return_shipments.html", {"shipments": shipments})
+    page = paginate_by_cursor(Shipment.objects.filter(is_return=True), ("-id",), cursor=request.GET.get("cursor"))
+    return render(request, "logistics/return_shipments.html", {"shipments": page.items, "page": page})
 
 
 # ✅ Update Return Shipment Status
 @login_required
 @role_required("Logistics")
 def update_return_shipment_status(request, shipment_id):
-    shipment = get_object_or_404(Shipment, id=shipment_id, is_return=True)
+    returns = Shipment.objects.filter(is_return=True)
+    status = get_object_or_404(returns.values_list("status", flat=True), id=shipment_id)
 
-    # Progress status from Pending → Shipped → Delivered
-    if shipment.status != "Delivered":
-        if shipment.status == "Pending":
-            shipment.status = "Shipped"
-        elif shipment.status == "Shipped":
-            shipment.status = "Delivered"
-
-        shipment.save()
-        messages.success(request, f"Return shipment #{shipment.id} updated to {shipment.status}.")
+    # Move one step along Shipment.TRANSITIONS (Return Initiated → Returning → Returned to Vendor)
+    next_status = next(iter(Shipment.TRANSITIONS.get(status, ())), None)
+    if next_status is None:
+        messages.info(request, f"Return shipment #{shipment_id} is already {status}.")
     else:
-        messages.info(request, "Return shipment is already marked as Delivered.")
+        result = returns.transition([shipment_id], next_status)
+        if result.moved:
+            messages.success(request, f"Return shipment #{shipment_id} updated to {next_status}.")
+        else:
+            messages.warning(request, f"Return shipment #{shipment_id} was not updated: {describe_rejections(result)}.")
 
     return redirect("logistics:return_shipments")
 
@@ -88,49 +99,82 @@ def edit_warehouse(request, warehouse_id):
 @login_required
 @role_required("Logistics")
 def shipment_list(request):
-    shipments = Shipment.objects.all()
-    return render(request, "logistics/shipment_list.html", {"shipments": shipments})
+    page = paginate_by_cursor(Shipment.objects.all(), ("-id",), cursor=request.GET.get("cursor"))
+    return render(request, "logistics/shipment_list.html", {"shipments": page.items, "page": page})
 
 @login_required
 @role_required("Logistics")
 def update_shipment_status(request, shipment_id, status):
-    shipment = get_object_or_404(Shipment, id=shipment_id)
-    shipment.status = status
-    shipment.save()
-    messages.success(request, f"Shipment #{shipment.id} updated to {shipment.status}.")
+    result = Shipment.objects.transition([shipment_id], status)  # ✅ Conditional UPDATE, no load & save
+    reason = result.rejected.get(shipment_id)
+    if reason == "not found":
+        raise Http404("No Shipment matches the given query.")
+    if reason:
+        messages.warning(request, f"Shipment #{shipment_id} cannot move to {status}: it {reason}.")
+    else:
+        messages.success(request, f"Shipment #{shipment_id} updated to {status}.")
     return redirect("logistics:shipment_list") # ✅ Add namespace
 
 
+# ✅ Move many shipments at once (POST shipment_ids + status)
+@login_required
+@role_required("Logistics")
+@require_POST
+def bulk_update_shipments(request):
+    status = request.POST.get("status")
+    ids = parse_ids(request.POST.getlist("shipment_ids"))
+    if not any(status in targets for targets in Shipment.TRANSITIONS.values()):
+        messages.error(request, "Choose a valid status.")
+    elif not ids:
+        messages.warning(request, "Select at least one shipment.")
+    else:
+        result = Shipment.objects.transition(ids, status)
+        if result.moved:
+            messages.success(request, f"Moved {len(result.moved)} shipment(s) to {status}.")
+        if result.rejected:
+            messages.warning(request, f"Skipped {len(result.rejected)}: {describe_rejections(result)}")
+    return redirect("logistics:shipment_list")
+
+
 
 # 🔹 Handle Return Shipments
 @login_required
 @role_required("Logistics")
 def initiate_return_shipment(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-
-    if not order.is_returned:
-        Shipment.objects.create(
-            order=order,
-            warehouse=order.current_warehouse,
-            status="Return Initiated",
-            is_return=True
-        )
-        order.is_returned = True
-        order.status = "Return Initiated"
-        order.save()
+    with transaction.atomic():
+        # Locked, so two clicks cannot both see it unreturned and reserve two slots
+        order = get_object_or_404(Order.objects.with_customer().select_for_update(of=("self",)), id=order_id)
+        returning = not order.is_returned
+        if returning:
+            order.is_returned = True
+            order.status = "Return Initiated"
+            reserved = order.current_warehouse_id is None
+            if reserved:
+                order.current_warehouse_id = reserve_warehouse_for_customer(order.customer)
+                reserved = order.current_warehouse_id is not None
+            order.save()
+            # One shipment per order: the existing one becomes the return leg
+            enqueue(
+                "logistics.create_return_shipment",
+                key=f"return-shipment:{order.id}",
+                order_id=order.id,
+                warehouse_id=order.current_warehouse_id,
+                reserved=reserved,
+            )
+    if returning:
         messages.success(request, f"Return initiated for Order #{order.id}.")
     else:
         messages.info(request, f"Return already initiated for Order #{order.id}.")
 
-    return redirect("shipment_list")
+    return redirect("logistics:shipment_list")
 
 
 # 🔹 Fleet Management
 @login_required
 @role_required("Logistics")
 def fleet_list(request):
-    fleet = Fleet.objects.all()
-    return render(request, "logistics/fleet_list.html", {"fleet": fleet})
+    page = paginate_by_cursor(Fleet.objects.all(), ("id",), cursor=request.GET.get("cursor"))
+    return render(request, "logistics/fleet_list.html", {"fleet": page.items, "page": page})
 
 from django.shortcuts import render, redirect
 from .forms import FleetForm
@@ -147,3 +191,57 @@ def add_vehicle(request):
     else:
         form = FleetForm()
     return render(request, 'logistics/add_vehicle.html', {'form': form})
+
+
+# 🔹 Delivery Routes
+@login_required
+@role_required("Logistics")
+def delivery_routes(request):
+    """Today's routes; POST plans the pending shipments onto the free vehicles."""
+    if request.method == "POST":
+        result = plan_routes()
+        messages.success(request, f"Planned {len(result.routes)} route(s).")
+        if result.unplanned:
+            messages.warning(request, f"{len(result.unplanned)} shipment(s) could not be planned yet.")
+        return redirect("logistics:delivery_routes")
+    routes = (
+        DeliveryRoute.objects.filter(date=timezone.localdate())
+        .select_related("warehouse", "vehicle__assigned_driver")
+        .order_by("warehouse__name", "id")
+    )
+    return render(request, "logistics/delivery_routes.html", {"routes": routes})
+
+
+@login_required
+@role_required("Logistics")
+def route_detail(request, route_id):
+    route = get_object_or_404(DeliveryRoute.objects.select_related("warehouse", "vehicle"), id=route_id)
+    stops = route.stops.select_related("shipment__order__customer")
+    return render(request, "logistics/route_detail.html", {"route": route, "stops": stops})
+
+
+@login_required
+@role_required("Logistics")
+@require_POST
+def dispatch_delivery_route(request, route_id):
+    route = get_object_or_404(DeliveryRoute, id=route_id)
+    result = dispatch_route(route)
+    if result is None:
+        messages.warning(request, f"Route #{route.id} is already {route.status.lower()}.")
+    else:
+        messages.success(request, f"Route #{route.id} dispatched: {len(result.moved)} shipment(s) shipped.")
+        if result.rejected:
+            messages.warning(request, f"Skipped {len(result.rejected)}: {describe_rejections(result)}")
+    return redirect("logistics:route_detail", route_id=route.id)
+
+
+# 🔹 Public Tracking (no login; answers come from logistics.tracking's caches)
+@require_GET
+def track_shipment(request, tracking_number):
+    status = tracking_status(tracking_number.strip().upper())
+    if status is None:
+        response = JsonResponse({"error": "Unknown tracking number."}, status=404)
+    else:
+        response = JsonResponse(status)
+    patch_cache_control(response, public=True, max_age=LOCAL_TTL)
+    return response
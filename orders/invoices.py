@@ -0,0 +1,126 @@
+"""
+Invoice rendering, shared by the download view, the ``orders.generate_invoice``
+task and ``manage.py export_invoices``.
+
+Renderers are generators of bytes, so the view can stream them through a
+``StreamingHttpResponse``. They expect an order loaded with
+``Order.objects.with_customer().with_items()``, which means no queries while
+streaming. PDF output is written directly (one text page per 50 lines,
+built-in Helvetica), so it needs no extra dependency.
+"""
+
+FORMATS = {
+    "txt": "text/plain; charset=utf-8",
+    "pdf": "application/pdf",
+}
+
+PDF_LINES_PER_PAGE = 50
+PDF_FONT_SIZE = 11
+PDF_LEADING = 14  # points between lines
+PDF_PAGE = (595, 842)  # A4 in points
+PDF_MARGIN = 56
+
+
+def invoice_path(order_id, fmt="txt"):
+    """Where the generated invoice of an order lives in the default storage."""
+    return f"invoices/invoice_{order_id}.{fmt}"
+
+
+def invoice_filename(order, fmt="txt"):
+    return f"invoice_{order.id}.{fmt}"
+
+
+def invoice_lines(order):
+    """The invoice as lines of text."""
+    yield f"Invoice for Order {order.id}"
+    yield f"Date: {order.order_date:%Y-%m-%d}"
+    yield f"Customer: {order.customer.username}"
+    yield f"Total Price: ${order.total_price}"
+    yield "Items:"
+    for item in order.order_items.all():
+        yield f"- {item.product.name}: {item.quantity} x ${item.price}"
+
+
+def iter_text(order):
+    for line in invoice_lines(order):
+        yield (line + "\n").encode("utf-8")
+
+
+def _pdf_string(text):
+    """A PDF literal string in WinAnsi (Latin-1 subset); other characters become '?'."""
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def iter_pdf_lines(lines, title="Invoice"):
+    """
+    A minimal PDF of ``lines``, written object by object. Byte offsets for the
+    cross-reference table are counted as chunks are yielded, and the page tree
+    (object 2) is written last, once the number of pages is known.
+    """
+    offsets = {}
+    position = 0
+
+    def emit(chunk):
+        nonlocal position
+        data = chunk.encode("latin-1") if isinstance(chunk, str) else chunk
+        position += len(data)
+        return data
+
+    def obj(number, body):
+        offsets[number] = position
+        return emit(f"{number} 0 obj\n{body}\nendobj\n")
+
+    yield emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+    yield obj(3, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    yield obj(4, f"<< /Title {_pdf_string(title)} /Producer (E-Commerce) >>")
+
+    width, height = PDF_PAGE
+    kids = []
+    next_number = 5
+    page, pages = [], []
+    for line in lines:
+        page.append(line)
+        if len(page) == PDF_LINES_PER_PAGE:
+            pages.append(page)
+            page = []
+    if page or not pages:
+        pages.append(page)
+
+    for page in pages:
+        text = "\n".join(f"{_pdf_string(line)} Tj T*" for line in page)
+        content = (
+            f"BT /F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL {PDF_MARGIN} {height - PDF_MARGIN} Td\n{text}\nET"
+        ).encode("latin-1")
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        offsets[content_number] = position
+        yield emit(f"{content_number} 0 obj\n<< /Length {len(content)} >>\nstream\n".encode("latin-1") + content + b"\nendstream\nendobj\n")
+        yield obj(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>"
+        ))
+        kids.append(f"{page_number} 0 R")
+
+    yield obj(2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>")
+
+    xref = position
+    entries = "".join(f"{offsets[number]:010d} 00000 n \n" for number in range(1, next_number))
+    yield emit(
+        f"xref\n0 {next_number}\n0000000000 65535 f \n{entries}"
+        f"trailer\n<< /Size {next_number} /Root 1 0 R /Info 4 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    )
+
+
+def iter_pdf(order):
+    return iter_pdf_lines(invoice_lines(order), title=f"Invoice for Order {order.id}")
+
+
+def iter_invoice(order, fmt="txt"):
+    """The invoice of ``order`` in ``fmt`` (a key of FORMATS) as a stream of bytes."""
+    return iter_pdf(order) if fmt == "pdf" else iter_text(order)
+
+
+def render_invoice(order, fmt="txt"):
+    return b"".join(iter_invoice(order, fmt))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from orders.models import Order, OrderItem, VendorOrder
+
+
+class Command(BaseCommand):
+    help = "Populate the VendorOrder index (and Order.vendor) for orders placed before it existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pairs = (
+            OrderItem.objects.values_list("product__vendor_id", "order_id", "order__order_date")
+            .distinct()
+            .order_by("order_id")
+        )
+
+        created = 0
+        batch = []
+        vendors_by_order = {}
+        for vendor_id, order_id, order_date in pairs.iterator(chunk_size=batch_size):
+            batch.append(VendorOrder(vendor_id=vendor_id, order_id=order_id, order_date=order_date))
+            vendors_by_order.setdefault(order_id, set()).add(vendor_id)
+            if len(batch) >= batch_size:
+                created += self._flush(batch)
+                batch = []
+        created += self._flush(batch)
+
+        single_vendor = {}
+        for order_id, vendor_ids in vendors_by_order.items():
+            if len(vendor_ids) == 1:
+                single_vendor.setdefault(next(iter(vendor_ids)), []).append(order_id)
+        with transaction.atomic():
+            for vendor_id, order_ids in single_vendor.items():
+                for start in range(0, len(order_ids), batch_size):
+                    Order.objects.filter(
+                        id__in=order_ids[start:start + batch_size], vendor__isnull=True
+                    ).update(vendor_id=vendor_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {created} vendor/order pairs."))
+
+    def _flush(self, batch):
+        if not batch:
+            return 0
+        VendorOrder.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
@@ -0,0 +1,73 @@
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from orders.invoices import FORMATS, invoice_filename, render_invoice
+from orders.models import Order
+from utils.commands import parse_day
+
+
+def _init_worker():
+    django.setup()  # no-op after fork, needed where workers are spawned
+
+
+def render_chunk(order_ids, formats):
+    """``[(filename, bytes)]`` for a chunk of orders: two queries, then pure rendering."""
+    orders = Order.objects.with_customer().with_items().filter(id__in=order_ids).order_by("id")
+    return [(invoice_filename(order, fmt), render_invoice(order, fmt)) for order in orders for fmt in formats]
+
+
+class Command(BaseCommand):
+    help = "Render the invoices of every order placed in a date range into one zip file, on a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the zip file to write.")
+        parser.add_argument("--since", required=True, help="First order day (YYYY-MM-DD).")
+        parser.add_argument("--until", required=True, help="Last order day (YYYY-MM-DD).")
+        parser.add_argument("--format", choices=[*FORMATS, "both"], default="pdf")
+        parser.add_argument("--workers", type=int, default=4, help="Rendering processes; 0 renders in this process.")
+        parser.add_argument("--chunk-size", type=int, default=500, help="Orders per worker job.")
+
+    def handle(self, *args, **options):
+        formats = list(FORMATS) if options["format"] == "both" else [options["format"]]
+        order_ids = list(
+            Order.objects.filter(order_date__gte=parse_day(options["since"]), order_date__lte=parse_day(options["until"], end=True))
+            .order_by("id").values_list("id", flat=True)
+        )
+        size = options["chunk_size"]
+        chunks = [order_ids[start:start + size] for start in range(0, len(order_ids), size)]
+
+        written = 0
+        with zipfile.ZipFile(options["output"], "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for files in self._render(chunks, formats, options["workers"]):
+                for filename, data in files:
+                    archive.writestr(filename, data)
+                written += len(files)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} invoice file(s) for {len(order_ids)} order(s) to {options['output']}."
+        ))
+
+    def _render(self, chunks, formats, workers):
+        """Rendered chunks as they finish; at most two jobs per worker are in flight."""
+        if workers <= 0:
+            for chunk in chunks:
+                yield render_chunk(chunk, formats)
+            return
+
+        connections.close_all()  # forked workers must open their own connections
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            pending, queue = set(), iter(chunks)
+            while True:
+                for chunk in queue:
+                    pending.add(pool.submit(render_chunk, chunk, formats))
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Order, OrderEvent
+from orders.reports import DEFAULT_STAGES, format_duration, stage_latencies, stage_pairs
+from utils.commands import parse_day
+
+
+class Command(BaseCommand):
+    help = "Per-stage fulfilment latency percentiles from the order status history, in one streaming pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day of events to include (YYYY-MM-DD).")
+        parser.add_argument("--until", help="Last day of events to include (YYYY-MM-DD).")
+        parser.add_argument(
+            "--stages", nargs="+", default=list(DEFAULT_STAGES),
+            help="Statuses in fulfilment order; each consecutive pair and first -> last are reported.",
+        )
+        parser.add_argument("--percentiles", type=float, nargs="+", default=[50, 90, 95, 99])
+
+    def handle(self, *args, **options):
+        unknown = [stage for stage in options["stages"] if stage not in Order.STATUS_CODES]
+        if unknown:
+            raise CommandError(f"Unknown status(es): {', '.join(unknown)}")
+
+        events = OrderEvent.objects.all()
+        if options["since"]:
+            events = events.filter(created_at__gte=parse_day(options["since"]))
+        if options["until"]:
+            events = events.filter(created_at__lte=parse_day(options["until"], end=True))
+
+        percentiles = options["percentiles"]
+        histograms = stage_latencies(events, stage_pairs(options["stages"]))
+
+        header = f"{'stage':<36} {'orders':>8} " + " ".join(f"{'p' + format(p, 'g'):>8}" for p in percentiles)
+        self.stdout.write(header + f" {'mean':>8} {'max':>8}")
+        for (start, end), histogram in histograms.items():
+            cells = " ".join(f"{format_duration(histogram.percentile(p)):>8}" for p in percentiles)
+            self.stdout.write(
+                f"{start + ' -> ' + end:<36} {histogram.count:>8} {cells} "
+                f"{format_duration(histogram.mean):>8} {format_duration(histogram.max if histogram.count else None):>8}"
+            )
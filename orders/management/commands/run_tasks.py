@@ -0,0 +1,65 @@
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from orders.tasks import autodiscover_tasks, claim_tasks, purge_done, requeue_dead, run_task
+
+
+def _run_in_thread(queued):
+    try:
+        return run_task(queued)
+    finally:
+        connection.close()  # each pool thread has its own connection
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (checkout follow-ups, payments, shipments) until stopped."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Tasks run concurrently in this process.")
+        parser.add_argument("--lease", type=int, default=300, help="Seconds before a claimed task may be retried by another worker.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to sleep when nothing is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due instead of polling.")
+        parser.add_argument("--requeue-dead", action="store_true", help="First move every dead-lettered task back to the queue.")
+        parser.add_argument("--purge-done", type=int, metavar="DAYS", help="First delete tasks finished more than DAYS ago.")
+
+    def handle(self, *args, **options):
+        autodiscover_tasks()
+        if options["requeue_dead"]:
+            self.stdout.write(f"Requeued {requeue_dead()} dead tasks.")
+        if options["purge_done"] is not None:
+            self.stdout.write(f"Purged {purge_done(timedelta(days=options['purge_done']))} finished tasks.")
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        workers = options["workers"]
+        lease = timedelta(seconds=options["lease"])
+        done = failed = 0
+        running = set()
+
+        # Claim only for idle threads, so every claimed task starts right away and the lease covers just its run
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    if len(running) < workers:
+                        close_old_connections()
+                        claimed = claim_tasks(worker, workers - len(running), lease)
+                        running.update(pool.submit(_run_in_thread, queued) for queued in claimed)
+                    if not running:
+                        if options["once"]:
+                            break
+                        time.sleep(options["poll_interval"])
+                        continue
+                    finished, running = wait(running, timeout=options["poll_interval"], return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        ok = future.result()
+                        done += ok
+                        failed += not ok
+            except KeyboardInterrupt:
+                pass
+
+        self.stdout.write(self.style.SUCCESS(f"{done} tasks succeeded, {failed} failed (retried or dead-lettered)."))
@@ -1,6 +1,93 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from accounts.models import CustomUser
 from products.models import Product
+from utils.db import bulk_transition
+
+
+def _line_total(prefix=""):
+    """SUM(price * quantity) over order items, ``prefix`` being the path to them."""
+    return Coalesce(
+        Sum(F(f"{prefix}price") * F(f"{prefix}quantity"), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        Value(Decimal("0.00")),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    """Order queries that load the customer and line items up front."""
+
+    def with_customer(self):
+        return self.select_related("customer")
+
+    def with_items(self):
+        return self.prefetch_related(
+            models.Prefetch("order_items", queryset=OrderItem.objects.with_products())
+        )
+
+    def with_totals(self):
+        """Annotate item_lines, item_units and items_total for many orders in one query."""
+        return self.annotate(
+            item_lines=Count("order_items"),
+            item_units=Coalesce(Sum("order_items__quantity"), 0),
+            items_total=_line_total("order_items__"),
+        )
+
+    def transition(self, ids, to_status):
+        """
+        Move the given orders of this queryset to ``to_status`` in one conditional
+        UPDATE, and write their OrderEvent rows in one INSERT.
+        """
+        with transaction.atomic():
+            result = bulk_transition(self, ids, to_status, self.model.TRANSITIONS)
+            OrderEvent.objects.record(result.moved, to_status)
+            VendorOrder.objects.follow_orders(result.moved, to_status)
+        return result
+
+    def create_from_cart(self, customer, cart_items, total_price):
+        """
+        Create an order with its items and per-vendor index rows from cart rows
+        loaded with ``select_related("product")``. Fills ``Order.vendor`` when
+        every item comes from the same vendor. Call inside a transaction.
+        """
+        vendor_ids = {item.product.vendor_id for item in cart_items}
+        order = self.create(
+            customer=customer,
+            vendor_id=next(iter(vendor_ids)) if len(vendor_ids) == 1 else None,
+            total_price=total_price,
+            status="Pending",
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
+            for item in cart_items
+        ])
+        VendorOrder.objects.bulk_create([
+            VendorOrder(vendor_id=vendor_id, order=order, order_date=order.order_date)
+            for vendor_id in vendor_ids
+        ])
+        return order
+
+
+class OrderItemQuerySet(models.QuerySet):
+    """OrderItem queries with the product (and optionally the order) joined in."""
+
+    def with_products(self):
+        return self.select_related("product")
+
+    def with_orders(self):
+        return self.select_related("order", "order__customer", "product")
+
+    def totals(self):
+        """Line count, unit count and price total of these rows in one aggregate query."""
+        return self.aggregate(
+            lines=Count("id"),
+            units=Coalesce(Sum("quantity"), 0),
+            total=_line_total(),
+        )
 
 
 class Order(models.Model):
@@ -8,15 +95,45 @@ class Order(models.Model):
 
     STATUS_CHOICES = [
         ("Pending", "Pending"),              # Order placed by customer
+        ("Paid", "Paid"),                    # Customer paid
         ("Accepted", "Accepted"),            # Vendor accepted
         ("Packaged", "Packaged"),            # Vendor packed
         ("Shipped", "Shipped"),              # Logistics team picked up
         ("In Transit", "In Transit"),        # Moving between warehouses
         ("Out for Delivery", "Out for Delivery"),  # Near customer
         ("Delivered", "Delivered"),          # Successfully delivered
+        ("Return Initiated", "Return Initiated"),  # Customer sent it back
         ("Cancelled", "Cancelled"),          # Order canceled
     ]
 
+    # Compact codes stored in OrderEvent.status; append new statuses, never renumber
+    STATUS_CODES = {
+        "Pending": 1,
+        "Paid": 2,
+        "Accepted": 3,
+        "Packaged": 4,
+        "Shipped": 5,
+        "In Transit": 6,
+        "Out for Delivery": 7,
+        "Delivered": 8,
+        "Return Initiated": 9,
+        "Cancelled": 10,
+    }
+    STATUS_NAMES = {code: status for status, code in STATUS_CODES.items()}
+
+    # Allowed moves: status -> statuses it may go to next (see OrderQuerySet.transition)
+    TRANSITIONS = {
+        "Pending": {"Paid", "Accepted", "Cancelled"},
+        "Paid": {"Accepted", "Cancelled"},
+        "Accepted": {"Packaged", "Cancelled"},
+        "Packaged": {"Shipped"},
+        "Shipped": {"In Transit", "Out for Delivery"},
+        "In Transit": {"Out for Delivery"},
+        "Out for Delivery": {"Delivered"},
+        "Delivered": {"Return Initiated", "In Transit"},  # returns travel back in transit
+        "Return Initiated": {"In Transit"},
+    }
+
     customer = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name="orders"
     )
@@ -56,15 +173,30 @@ class Order(models.Model):
     order_date = models.DateTimeField(auto_now_add=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "-order_date"], name="order_customer_date_idx"),
+            models.Index(fields=["vendor", "status"], name="order_vendor_status_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded status so orders.signals can log changes as OrderEvents
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
     def update_status(self, new_status):
-        """Updates order status."""
+        """Updates order status (the change is logged as an OrderEvent)."""
         self.status = new_status
-        self.save()
+        self.save(update_fields=["status"])
 
     def calculate_total_price(self):
         """Calculates the total price of the order based on items."""
-        self.total_price = sum(item.price * item.quantity for item in self.order_items.all())
-        self.save()
+        self.total_price = self.order_items.totals()["total"]
+        self.save(update_fields=["total_price"])
 
     def __str__(self):
         return f"Order {self.id} - {self.customer.username} - {self.status}"
@@ -81,5 +213,152 @@ class OrderItem(models.Model):
     quantity = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    objects = OrderItemQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in Order {self.order.id}"
+
+
+class VendorOrderQuerySet(models.QuerySet):
+    """Vendor order index queries with the order and customer joined in."""
+
+    def for_vendor(self, vendor):
+        return self.filter(vendor=vendor).select_related("order", "order__customer")
+
+    def follow_orders(self, order_ids, order_status):
+        """Bring the vendor parts of orders moved as a whole up to ``order_status`` (never back)."""
+        if not order_ids:
+            return
+        if order_status == "Cancelled":
+            self.filter(order_id__in=order_ids).update(status="Cancelled")
+        elif order_status in VendorOrder.PROGRESS:
+            behind = VendorOrder.PROGRESS[:VendorOrder.PROGRESS.index(order_status)]
+            self.filter(order_id__in=order_ids, status__in=behind).update(status=order_status)
+
+
+class VendorOrder(models.Model):
+    """
+    Denormalized vendor -> order index, written once at checkout. Lets vendor
+    dashboards list their orders with one indexed range scan instead of
+    Product -> OrderItem -> Order subqueries.
+
+    ``status`` is the vendor's own part of the order: each vendor accepts,
+    packs, ships or cancels their part, and the shared ``Order.status``
+    follows once every vendor has got that far
+    (``orders.services.transition_vendor_orders``).
+    """
+    # Vendor-side progress, in order; a part may also be Cancelled
+    PROGRESS = ("Pending", "Accepted", "Packaged", "Shipped")
+    TRANSITIONS = {
+        "Pending": {"Accepted", "Cancelled"},
+        "Accepted": {"Packaged", "Cancelled"},
+        "Packaged": {"Shipped"},
+    }
+
+    vendor = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="vendor_order_links"
+    )
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="vendor_links"
+    )
+    order_date = models.DateTimeField()  # Copied from Order so the index covers the sort
+    status = models.CharField(max_length=20, default="Pending")
+
+    objects = VendorOrderQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vendor", "order"], name="unique_vendor_order"),
+        ]
+        indexes = [
+            models.Index(fields=["vendor", "-order_date", "-order"], name="vendororder_vendor_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Order {self.order_id} - vendor {self.vendor_id}"
+
+
+class OrderEventQuerySet(models.QuerySet):
+    def record(self, order_ids, status, at=None):
+        """One INSERT of a ``status`` event for every order in ``order_ids``; their tracking pages refresh after commit."""
+        from logistics.tracking import invalidate_orders  # logistics imports this module
+
+        order_ids = list(order_ids)
+        at = at or timezone.now()
+        code = Order.STATUS_CODES[status]
+        events = self.bulk_create([OrderEvent(order_id=order_id, status=code, created_at=at) for order_id in order_ids])
+        transaction.on_commit(lambda: invalidate_orders(order_ids))
+        return events
+
+
+class OrderEvent(models.Model):
+    """
+    One status change of an order. The status is a small-int code
+    (``Order.STATUS_CODES``), keeping rows narrow for the latency reports,
+    which scan them in (order, created_at) order.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="events", db_index=False)
+    status = models.PositiveSmallIntegerField(choices=[(code, status) for status, code in Order.STATUS_CODES.items()])
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = OrderEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["order", "created_at"], name="orderevent_order_time_idx"),
+        ]
+
+    @property
+    def status_name(self):
+        return Order.STATUS_NAMES[self.status]
+
+    def __str__(self):
+        return f"Order {self.order_id} -> {self.status_name} at {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class QueuedTask(models.Model):
+    """
+    Durable background job (see orders.tasks). Rows are written in the same
+    transaction as the change that needs the work, and ``dedupe_key`` makes
+    enqueueing idempotent; ``run_tasks`` workers claim due rows with a lease.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done")]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="queuedtask_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status}, attempt {self.attempts})"
+
+
+class DeadLetterTask(models.Model):
+    """A task that used up its attempts; kept for inspection and ``run_tasks --requeue-dead``."""
+    task_id = models.BigIntegerField()
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    dedupe_key = models.CharField(max_length=255)
+    attempts = models.PositiveSmallIntegerField()
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.task_id} dead after {self.attempts} attempts"
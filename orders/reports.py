@@ -0,0 +1,100 @@
+"""
+Fulfilment latency from the OrderEvent history.
+
+``stage_latencies`` streams the events once, ordered by order, keeping only the
+current order's first timestamp per status in memory. Every latency goes into
+a log-bucketed ``LatencyHistogram``, so memory stays constant however many
+millions of events are scanned, and percentiles are accurate to about 1%.
+"""
+import math
+from collections import Counter
+
+from .models import Order
+
+DEFAULT_STAGES = ("Pending", "Accepted", "Packaged", "Shipped", "Out for Delivery", "Delivered")
+GROWTH = 1.02  # bucket width: each bucket is 2% wider than the previous one
+_LOG_GROWTH = math.log(GROWTH)
+
+
+class LatencyHistogram:
+    """Counts of durations (seconds) in geometric buckets; sub-second values share bucket 0."""
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        bucket = 0 if seconds < 1 else int(math.log(seconds) / _LOG_GROWTH) + 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        """Approximate p-th percentile (0-100): the geometric middle of the bucket holding it."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return 0.0 if bucket == 0 else min(GROWTH ** (bucket - 0.5), self.max)
+        return self.max
+
+
+def stage_pairs(stages=DEFAULT_STAGES):
+    """Each consecutive stage plus first -> last (e.g. Pending -> Delivered)."""
+    pairs = list(zip(stages, stages[1:]))
+    if len(stages) > 2:
+        pairs.append((stages[0], stages[-1]))
+    return pairs
+
+
+def stage_latencies(events, pairs, chunk_size=20000):
+    """
+    ``{(from_status, to_status): LatencyHistogram}`` over ``events`` (an
+    OrderEvent queryset, e.g. filtered by date). A pair counts for an order when
+    it reached both statuses, measured between their first occurrences.
+    """
+    histograms = {pair: LatencyHistogram() for pair in pairs}
+    coded = [((Order.STATUS_CODES[a], Order.STATUS_CODES[b]), histograms[(a, b)]) for a, b in pairs]
+
+    def flush(first_seen):
+        for (start, end), histogram in coded:
+            if start in first_seen and end in first_seen and first_seen[end] >= first_seen[start]:
+                histogram.add((first_seen[end] - first_seen[start]).total_seconds())
+
+    rows = (
+        events.order_by("order_id", "created_at", "id")
+        .values_list("order_id", "status", "created_at")
+        .iterator(chunk_size=chunk_size)  # server-side cursor where the database supports it
+    )
+    current, first_seen = None, {}
+    for order_id, status, created_at in rows:
+        if order_id != current:
+            flush(first_seen)
+            current, first_seen = order_id, {}
+        first_seen.setdefault(status, created_at)
+    flush(first_seen)
+    return histograms
+
+
+def format_duration(seconds):
+    """``42s``, ``3m 20s``, ``5h 02m``, ``2d 07h``."""
+    if seconds is None:
+        return "-"
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d {seconds % 86400 // 3600:02d}h"
@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from logistics.services import create_shipments
+from utils.db import TransitionResult, bulk_transition
+from .models import Order, VendorOrder
+
+# Statuses each role may move orders to
+VENDOR_STATUSES = ("Accepted", "Packaged", "Shipped", "Cancelled")
+LOGISTICS_STATUSES = ("Shipped", "In Transit", "Out for Delivery")
+DELIVERY_STATUSES = ("Delivered",)
+
+# Order statuses in which vendors still work on their own parts
+VENDOR_OPEN_STATUSES = ("Pending", "Paid", "Accepted", "Packaged")
+
+
+def transition_orders(orders, ids, to_status):
+    """
+    Move the orders of ``orders`` (a queryset scoping what the caller may touch)
+    among ``ids`` to ``to_status`` and do what the move implies (a tracked
+    shipment per shipped order, created in bulk), all in one transaction.
+    Returns a ``TransitionResult``.
+    """
+    with transaction.atomic():
+        result = orders.transition(ids, to_status)
+        if to_status == "Shipped" and result.moved:
+            create_shipments(result.moved)
+    return result
+
+
+def transition_vendor_orders(vendor, ids, to_status):
+    """
+    Move ``vendor``'s own part (``VendorOrder``) of the orders among ``ids`` to
+    ``to_status``. An order itself only moves once every vendor on it has got
+    that far; parts that were cancelled do not hold it back, and the order is
+    cancelled only when every vendor has cancelled. Returns a
+    ``TransitionResult`` of the vendor's parts, by order id.
+    """
+    ids = {int(pk) for pk in ids}
+    with transaction.atomic():
+        # Locking the orders serializes vendors finishing their parts of the same order
+        rows = (
+            Order.objects.filter(id__in=ids, vendor_links__vendor=vendor).select_for_update()
+            .values_list("vendor_links__id", "id", "status")
+        )
+        links, closed = {}, {}
+        for link_id, order_id, order_status in rows:
+            if order_status in VENDOR_OPEN_STATUSES:
+                links[link_id] = order_id
+            else:
+                closed[order_id] = f"is {order_status}"  # shipped or cancelled as a whole
+        parts = bulk_transition(VendorOrder.objects.filter(vendor=vendor), links, to_status, VendorOrder.TRANSITIONS)
+        moved = sorted(links[pk] for pk in parts.moved)
+        _follow_vendor_parts(moved)
+
+    rejected = {pk: "not found" for pk in ids - set(links.values()) - closed.keys()}
+    rejected.update(closed)
+    rejected.update({links[pk]: reason for pk, reason in parts.rejected.items()})
+    return TransitionResult(moved, rejected)
+
+
+def _follow_vendor_parts(order_ids):
+    """Move each order up to the furthest status every vendor part of it has reached."""
+    progress = VendorOrder.PROGRESS
+    parts = defaultdict(list)
+    current = {}
+    rows = VendorOrder.objects.filter(order_id__in=order_ids).values_list("order_id", "status", "order__status")
+    for order_id, status, order_status in rows:
+        if status != "Cancelled":
+            parts[order_id].append(progress.index(status))
+        current[order_id] = order_status
+
+    cancelled = [pk for pk in current if pk not in parts]
+    if cancelled:
+        transition_orders(Order.objects, cancelled, "Cancelled")
+
+    # Paid counts as Pending here
+    rank = {"Paid": 0, **{status: index for index, status in enumerate(progress)}}
+    reached = {pk: min(ranks) for pk, ranks in parts.items() if current[pk] in VENDOR_OPEN_STATUSES}
+    for index, status in enumerate(progress[1:], 1):
+        due = [pk for pk, furthest in reached.items() if rank[current[pk]] < index <= furthest]
+        if due:
+            transition_orders(Order.objects, due, status)
+
+
+def describe_rejections(result, limit=20):
+    """``#12 (is Delivered), #15 (not found), ...`` for a flash message."""
+    shown = [f"#{pk} ({reason})" for pk, reason in sorted(result.rejected.items())[:limit]]
+    if len(result.rejected) > limit:
+        shown.append(f"and {len(result.rejected) - limit} more")
+    return ", ".join(shown)
+
+
+def parse_ids(values):
+    """Positive integer ids from a ``getlist()`` of form values; anything else is dropped."""
+    return {int(value) for value in values if str(value).isdigit() and int(value) > 0}
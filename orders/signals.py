@@ -0,0 +1,17 @@
+# orders/signals.py
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Order, OrderEvent
+
+
+# 🔹 Log every saved status change as an OrderEvent (bulk transitions write theirs directly)
+@receiver(post_save, sender=Order)
+def record_status_change(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and "status" not in update_fields:
+        return
+    if instance.status not in Order.STATUS_CODES:
+        return
+    if created or instance.status != getattr(instance, "_loaded_status", None):
+        OrderEvent.objects.record([instance.id], instance.status)
+        instance._loaded_status = instance.status
@@ -0,0 +1,213 @@
+"""
+DB-backed task queue for work that should not hold up a request.
+
+``enqueue`` writes a ``QueuedTask`` row inside the caller's transaction, so the
+job exists exactly when the change that needs it commits; its ``dedupe_key``
+makes enqueueing idempotent. ``manage.py run_tasks`` claims due rows with a
+lease (one conditional UPDATE per claim, only as many as it has idle threads,
+so no claimed task waits for a thread past its lease), runs them, retries
+failures with exponential backoff and moves tasks that used up their attempts
+to ``DeadLetterTask``. A worker that dies mid-task loses its lease and the task
+is claimed again, so handlers must be idempotent; ones with outside effects
+(email) keep each effect in its own task so a retry repeats only that one.
+
+Handlers are registered with ``@task("app.name")`` in each app's ``tasks``
+module, which the worker imports through ``autodiscover_tasks``.
+"""
+import json
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import DeadLetterTask, Order, QueuedTask, VendorOrder
+
+BACKOFF_BASE = 10  # seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 60 * 60
+DEFAULT_LEASE = timedelta(minutes=5)
+
+_registry = {}
+
+
+# 🔹 Registry
+def task(name, max_attempts=5):
+    """Register ``func(**payload)`` as the handler for tasks called ``name``."""
+    def decorator(func):
+        _registry[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def autodiscover_tasks():
+    autodiscover_modules("tasks")
+
+
+# 🔹 Producing
+def enqueue(name, key=None, delay=0, **payload):
+    """
+    Queue ``name(**payload)``. Tasks with the same ``key`` (default: name plus
+    payload) are only ever queued once, so retried requests cannot double up.
+    Call inside the transaction that makes the work necessary.
+    """
+    enqueue_many(name, [payload], keys=None if key is None else [key], delay=delay)
+
+
+def enqueue_many(name, payloads, keys=None, delay=0):
+    """``enqueue`` for a batch of payloads in one INSERT."""
+    payloads = list(payloads)
+    if keys is None:
+        keys = [f"{name}:{json.dumps(payload, sort_keys=True, default=str)}" for payload in payloads]
+    _, max_attempts = _registry.get(name, (None, 5))
+    run_after = timezone.now() + timedelta(seconds=delay)
+    QueuedTask.objects.bulk_create([
+        QueuedTask(name=name, payload=payload, dedupe_key=key[:255], max_attempts=max_attempts, run_after=run_after)
+        for payload, key in zip(payloads, keys)
+    ], ignore_conflicts=True)
+
+
+# 🔹 Consuming
+def _due(now):
+    """Queued and due, or running on a lease that has expired (the worker died)."""
+    return Q(status=QueuedTask.QUEUED, run_after__lte=now) | Q(status=QueuedTask.RUNNING, locked_until__lt=now)
+
+
+def claim_tasks(worker, limit, lease=DEFAULT_LEASE):
+    """Lease up to ``limit`` due tasks to ``worker``; concurrent workers never get the same row."""
+    now = timezone.now()
+    ids = list(QueuedTask.objects.filter(_due(now)).order_by("run_after").values_list("id", flat=True)[:limit])
+    if not ids:
+        return []
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    QueuedTask.objects.filter(_due(now), id__in=ids).update(
+        status=QueuedTask.RUNNING,
+        locked_by=token,
+        locked_until=now + lease,
+        attempts=F("attempts") + 1,
+    )
+    return list(QueuedTask.objects.filter(locked_by=token))
+
+
+def backoff(attempt):
+    """Seconds to wait before retry number ``attempt`` (exponential, capped, with jitter)."""
+    return min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX) * random.uniform(0.8, 1.2)
+
+
+def run_task(queued):
+    """Run one claimed task and record the outcome. Returns True on success."""
+    mine = QueuedTask.objects.filter(id=queued.id, locked_by=queued.locked_by)  # unless our lease was lost
+    try:
+        handler, _ = _registry[queued.name]
+    except KeyError:
+        handler = None
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for task {queued.name!r}")
+        handler(**queued.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if queued.attempts >= queued.max_attempts:
+            with transaction.atomic():
+                if mine.delete()[0]:
+                    DeadLetterTask.objects.create(
+                        task_id=queued.id,
+                        name=queued.name,
+                        payload=queued.payload,
+                        dedupe_key=queued.dedupe_key,
+                        attempts=queued.attempts,
+                        last_error=error,
+                        created_at=queued.created_at,
+                    )
+        else:
+            mine.update(
+                status=QueuedTask.QUEUED,
+                run_after=timezone.now() + timedelta(seconds=backoff(queued.attempts)),
+                locked_until=None,
+                last_error=error,
+            )
+        return False
+
+    mine.update(status=QueuedTask.DONE, finished_at=timezone.now(), locked_until=None, last_error="")
+    return True
+
+
+def requeue_dead(ids=None):
+    """Give dead-lettered tasks a fresh set of attempts. Returns how many were requeued."""
+    dead = DeadLetterTask.objects.all() if ids is None else DeadLetterTask.objects.filter(id__in=ids)
+    with transaction.atomic():
+        rows = list(dead.select_for_update())
+        QueuedTask.objects.bulk_create([
+            QueuedTask(
+                name=row.name,
+                payload=row.payload,
+                dedupe_key=row.dedupe_key,
+                max_attempts=_registry.get(row.name, (None, 5))[1],
+                run_after=timezone.now(),
+            )
+            for row in rows
+        ], ignore_conflicts=True)
+        DeadLetterTask.objects.filter(id__in=[row.id for row in rows]).delete()
+    return len(rows)
+
+
+def purge_done(older_than):
+    """Delete tasks finished before ``now - older_than``; their keys can then be enqueued again."""
+    return QueuedTask.objects.filter(status=QueuedTask.DONE, finished_at__lt=timezone.now() - older_than).delete()[0]
+
+
+# 🔹 Order tasks
+def order_placed(order):
+    """Post-checkout work for a new order: vendor notification and the invoice file."""
+    enqueue("orders.notify_vendors", order_id=order.id, event="placed")
+    enqueue("orders.generate_invoice", order_id=order.id)
+
+
+@task("orders.notify_vendors")
+def notify_vendors(order_id, event):
+    """
+    Email every vendor with items in the order: one ``orders.notify_vendor``
+    task each, so a failed send is retried for that vendor alone and the
+    others are not emailed twice.
+    """
+    vendor_ids = list(VendorOrder.objects.filter(order_id=order_id).values_list("vendor_id", flat=True))
+    enqueue_many(
+        "orders.notify_vendor",
+        [{"order_id": order_id, "event": event, "vendor_id": vendor_id} for vendor_id in vendor_ids],
+        keys=[f"notify-vendor:{order_id}:{event}:{vendor_id}" for vendor_id in vendor_ids],
+    )
+
+
+@task("orders.notify_vendor")
+def notify_vendor(order_id, event, vendor_id):
+    """Email one vendor about the order (at least once: a crash after sending repeats it)."""
+    link = VendorOrder.objects.select_related("order", "vendor").get(order_id=order_id, vendor_id=vendor_id)
+    order, vendor = link.order, link.vendor
+    if not vendor.email:
+        return
+    send_mail(
+        f"Order #{order.id} {event}",
+        f"Order #{order.id} is now {order.status}. Total: {order.total_price}",
+        settings.DEFAULT_FROM_EMAIL,
+        [vendor.email],
+        fail_silently=False,
+    )
+
+
+@task("orders.generate_invoice")
+def generate_invoice(order_id):
+    """Write ``invoices/invoice_<id>.txt`` to the default storage (overwriting any earlier copy)."""
+    from .invoices import invoice_path, render_invoice
+
+    order = Order.objects.with_customer().with_items().get(id=order_id)
+    path = invoice_path(order.id)
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    default_storage.save(path, ContentFile(render_invoice(order, "txt")))
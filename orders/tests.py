@@ -1,3 +1,225 @@
-from django.test import TestCase
+from unittest import skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser, Role
+from cart.models import Cart
+from logistics.models import Shipment, Warehouse
+from products.models import Category, Product
+from utils.db import bulk_transition
+from .models import Order, OrderEvent, OrderItem, VendorOrder
+from .services import transition_vendor_orders
+
+# Stand-ins for the site templates that read what the real pages read per order
+PAGE_TEMPLATES = {
+    "orders/order_list.html": "{% for order in orders %}#{{ order.id }} {{ order.status }} {{ order.total_price }}\n{% endfor %}",
+    "orders/bulk_transition.html": "{% for order in orders %}#{{ order.id }} {{ order.customer.username }}\n{% endfor %}",
+}
+
+
+def make_user(username, role):
+    return CustomUser.objects.create_user(username, password="x", role=Role.objects.get_or_create(name=role)[0])
+
+
+def make_orders(customer, vendors, count, **fields):
+    """``count`` Pending orders of ``customer``, each with a part for every vendor in ``vendors``."""
+    orders = Order.objects.bulk_create([Order(customer=customer, total_price=10, **fields) for _ in range(count)])
+    VendorOrder.objects.bulk_create([
+        VendorOrder(vendor=vendor, order=order, order_date=order.order_date) for order in orders for vendor in vendors
+    ])
+    return orders
+
+
+@override_settings(TEMPLATES=[{
+    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "OPTIONS": {"loaders": [("django.template.loaders.locmem.Loader", PAGE_TEMPLATES)]},
+}])
+class OrderQueryCountTests(TestCase):
+    """Order pages and actions cost the same number of queries for 1 row as for many."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = make_user("vendor", Role.VENDOR)
+        cls.customer = make_user("customer", Role.CUSTOMER)
+        cls.logistics = make_user("logistics", Role.LOGISTICS)
+        category = Category.objects.create(name="Lamps")
+        cls.products = Product.objects.bulk_create([
+            Product(name=f"Lamp {n}", category=category, vendor=cls.vendor, price=10, current_stock=100, approval_status="Approved")
+            for n in range(40)
+        ])
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connection) as queries:
+            request()
+        return len(queries)
+
+    def login(self, user):
+        self.client.force_login(user)
+        self.client.get(reverse("orders:order_list"))  # the first request of a session costs extra queries
+
+    def test_place_order(self):
+        self.login(self.customer)
+        Cart.objects.create(customer=self.customer, product=self.products[0], quantity=1)
+        expected = self.count_queries(lambda: self.client.post(reverse("orders:place_order")))
+        Cart.objects.bulk_create([Cart(customer=self.customer, product=product, quantity=1) for product in self.products])
+        with self.assertNumQueries(expected):
+            self.client.post(reverse("orders:place_order"))
+        self.assertEqual(OrderItem.objects.filter(order=Order.objects.latest("id")).count(), 40)
+
+    def test_order_list(self):
+        self.login(self.customer)
+        make_orders(self.customer, [self.vendor], 1)
+        expected = self.count_queries(lambda: self.client.get(reverse("orders:order_list")))
+        make_orders(self.customer, [self.vendor], 20)
+        with self.assertNumQueries(expected):
+            self.client.get(reverse("orders:order_list"))
+
+    def test_download_invoice(self):
+        self.login(self.customer)
+        small, large = make_orders(self.customer, [self.vendor], 2)
+        OrderItem.objects.create(order=small, product=self.products[0], quantity=1, price=10)
+        OrderItem.objects.bulk_create([OrderItem(order=large, product=p, quantity=1, price=10) for p in self.products])
+
+        def download(order):
+            response = self.client.get(reverse("orders:download_invoice", args=[order.id]))
+            return b"".join(response.streaming_content)
+
+        expected = self.count_queries(lambda: download(small))
+        with self.assertNumQueries(expected):
+            invoice = download(large)
+        self.assertIn(b"Lamp 39", invoice)
+
+    def test_vendor_bulk_update(self):
+        self.login(self.vendor)
+        ids = [order.id for order in make_orders(self.customer, [self.vendor], 21)]
+        url = reverse("orders:vendor_bulk_update")
+        expected = self.count_queries(lambda: self.client.post(url, {"order_ids": ids[:1], "status": "Accepted"}))
+        with self.assertNumQueries(expected):
+            self.client.post(url, {"order_ids": ids[1:], "status": "Accepted"})
+        self.assertEqual(Order.objects.filter(status="Accepted").count(), 21)
+
+        expected = self.count_queries(lambda: self.client.get(url))
+        make_orders(self.customer, [self.vendor], 20)
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+
+    def test_logistics_bulk_ship(self):
+        self.login(self.logistics)
+        ids = [order.id for order in make_orders(self.customer, [self.vendor], 22, status="Packaged", logistics_team=self.logistics)]
+        url = reverse("orders:logistics_bulk_update")
+        self.client.post(url, {"order_ids": ids[:1], "status": "Shipped"})  # the first shipment creates the tracking sequence
+        expected = self.count_queries(lambda: self.client.post(url, {"order_ids": ids[1:2], "status": "Shipped"}))
+        with self.assertNumQueries(expected):
+            self.client.post(url, {"order_ids": ids[2:], "status": "Shipped"})
+        self.assertEqual(Shipment.objects.filter(order_id__in=ids).count(), 22)
+
+
+class BulkTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer", Role.CUSTOMER)
+
+    def test_moves_only_allowed_rows(self):
+        pending, delivered = Order.objects.bulk_create([
+            Order(customer=self.customer, status="Pending"), Order(customer=self.customer, status="Delivered"),
+        ])
+        result = bulk_transition(Order.objects.all(), [pending.id, delivered.id, 999], "Accepted", Order.TRANSITIONS)
+        self.assertEqual(result.moved, [pending.id])
+        self.assertEqual(result.rejected, {delivered.id: "is Delivered", 999: "not found"})
+        self.assertEqual(Order.objects.get(id=pending.id).status, "Accepted")
+        self.assertEqual(Order.objects.get(id=delivered.id).status, "Delivered")
+
+    def test_scoping_queryset_hides_other_rows(self):
+        other = make_user("other", Role.CUSTOMER)
+        order = Order.objects.create(customer=other)
+        result = bulk_transition(Order.objects.filter(customer=self.customer), [order.id], "Accepted", Order.TRANSITIONS)
+        self.assertEqual(result.rejected, {order.id: "not found"})
+        self.assertEqual(Order.objects.get(id=order.id).status, "Pending")
+
+    def test_order_transition_records_events(self):
+        order = Order.objects.create(customer=self.customer)
+        Order.objects.transition([order.id], "Paid")
+        Order.objects.transition([order.id], "Paid")  # no longer allowed: no second event
+        self.assertEqual(OrderEvent.objects.filter(order=order, status=Order.STATUS_CODES["Paid"]).count(), 1)
+
+
+class VendorTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer", Role.CUSTOMER)
+        cls.first = make_user("first", Role.VENDOR)
+        cls.second = make_user("second", Role.VENDOR)
+
+    def setUp(self):
+        self.order = make_orders(self.customer, [self.first, self.second], 1)[0]
+
+    def statuses(self):
+        self.order.refresh_from_db()
+        parts = dict(self.order.vendor_links.values_list("vendor__username", "status"))
+        return self.order.status, parts
+
+    def test_order_moves_once_every_vendor_has(self):
+        transition_vendor_orders(self.first, [self.order.id], "Accepted")
+        self.assertEqual(self.statuses(), ("Pending", {"first": "Accepted", "second": "Pending"}))
+        transition_vendor_orders(self.second, [self.order.id], "Accepted")
+        self.assertEqual(self.statuses(), ("Accepted", {"first": "Accepted", "second": "Accepted"}))
+
+    def test_one_vendor_cannot_cancel_the_whole_order(self):
+        transition_vendor_orders(self.first, [self.order.id], "Cancelled")
+        self.assertEqual(self.statuses(), ("Pending", {"first": "Cancelled", "second": "Pending"}))
+        transition_vendor_orders(self.second, [self.order.id], "Cancelled")
+        self.assertEqual(self.statuses()[0], "Cancelled")
+
+    def test_cancelled_part_does_not_hold_the_order_back(self):
+        transition_vendor_orders(self.first, [self.order.id], "Accepted")
+        transition_vendor_orders(self.first, [self.order.id], "Packaged")
+        transition_vendor_orders(self.second, [self.order.id], "Cancelled")
+        self.assertEqual(self.statuses(), ("Packaged", {"first": "Packaged", "second": "Cancelled"}))
+
+    def test_other_vendors_orders_are_not_found(self):
+        result = transition_vendor_orders(make_user("third", Role.VENDOR), [self.order.id], "Accepted")
+        self.assertEqual(result.rejected, {self.order.id: "not found"})
+
+
+class ReturnOrderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer", Role.CUSTOMER)
+        cls.warehouse = Warehouse.objects.create(name="Near", location="Pune", capacity=5, latitude=18.5, longitude=73.8)
+
+    def setUp(self):
+        self.order = Order.objects.create(customer=self.customer, status="Delivered")
+        self.url = reverse("orders:return_order", args=[self.order.id])
+
+    def test_double_submit_reserves_one_slot(self):
+        self.client.force_login(self.customer)
+        self.client.post(self.url)
+        self.client.post(self.url)
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.current_warehouse_id), ("In Transit", self.warehouse.id))
+        self.assertEqual(Warehouse.objects.get(id=self.warehouse.id).occupancy, 1)
+
+    def test_only_the_customer_can_return_the_order(self):
+        self.client.force_login(make_user("other", Role.CUSTOMER))
+        self.assertEqual(self.client.post(self.url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.post(self.url).status_code, 302)
+        self.assertEqual(Order.objects.get(id=self.order.id).status, "Delivered")
+        self.assertEqual(Warehouse.objects.get(id=self.warehouse.id).occupancy, 0)
+
+
+@skipUnless(connection.vendor == "sqlite", "the query plans checked are SQLite's")
+class IndexUsageTests(TestCase):
+    """EXPLAIN QUERY PLAN shows each hot lookup searching through its index."""
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertRegex(queryset.explain(), rf"SEARCH \S+ USING (COVERING )?INDEX {index}\b")
+
+    def test_customer_orders_by_date(self):
+        self.assertUsesIndex(Order.objects.filter(customer_id=1).order_by("-order_date"), "order_customer_date_idx")
+
+    def test_vendor_orders_by_status(self):
+        self.assertUsesIndex(Order.objects.filter(vendor_id=1, status="Pending"), "order_vendor_status_idx")
@@ -17,9 +17,11 @@ urlpatterns = [
     # ✅ Vendor actions
     path("vendor/accept/<int:order_id>/", views.vendor_accept_order, name="vendor_accept_order"),
     path("vendor/pack/<int:order_id>/", views.vendor_pack_order, name="vendor_pack_order"),
+    path("vendor/bulk/", views.vendor_bulk_update_orders, name="vendor_bulk_update"),
 
     # ✅ Logistics actions
     path("logistics/ship/<int:order_id>/", views.logistics_ship_order, name="logistics_ship_order"),
+    path("logistics/bulk/", views.logistics_bulk_update_orders, name="logistics_bulk_update"),
 
     # ✅ Delivery actions
     path("delivery/deliver/<int:order_id>/", views.delivery_boy_deliver_order, name="delivery_boy_deliver_order"),
@@ -1,12 +1,23 @@
+from functools import partial
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.apps import apps  # For dynamic model import
 from django.db import transaction
-from django.http import HttpResponse
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
 
+from accounts.decorators import role_required
 from products.models import Product
-from .models import Order, OrderItem
+from inventory.services import reserve_stock, cart_quantities
+from utils.pagination import paginate_by_cursor
+from .invoices import FORMATS as INVOICE_FORMATS, invoice_filename, iter_invoice
+from .models import Order, OrderItem, VendorOrder
+from .services import (
+    LOGISTICS_STATUSES, VENDOR_OPEN_STATUSES, VENDOR_STATUSES, describe_rejections, parse_ids, transition_orders, transition_vendor_orders,
+)
+from .tasks import enqueue, order_placed
 from cart.models import Cart
 
 
@@ -15,36 +26,22 @@ from cart.models import Cart
 def place_order(request):
     """Converts cart items to an order with stock deduction."""
     Cart = apps.get_model("cart", "Cart")
-    cart_items = Cart.objects.filter(customer=request.user)
+    cart_items = Cart.objects.for_customer_with_products(request.user)
 
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, "Your cart is empty!")
         return redirect("cart:view_cart")
 
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
+    total_price = cart_items.totals()["total"]
 
     try:
         with transaction.atomic():
-            # Check and reduce stock
-            for item in cart_items:
-                product = item.product
-                if product.current_stock < item.quantity:
-                    raise ValueError(f"Not enough stock for {product.name}")
-                product.reduce_stock(item.quantity)
-
-            # Create Order
-            order = Order.objects.create(
-                customer=request.user,
-                total_price=total_price,
-                status="Pending"
-            )
-
-            # Create OrderItems
-            order_items = [
-                OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
-                for item in cart_items
-            ]
-            OrderItem.objects.bulk_create(order_items)
+            # Reserve stock for every line in one conditional UPDATE
+            reserve_stock(cart_quantities(cart_items))
+
+            # Create Order, OrderItems and the vendor index rows
+            order = Order.objects.create_from_cart(request.user, cart_items, total_price)
+            order_placed(order)  # vendor emails and the invoice run in the task worker
 
             cart_items.delete()  # Clear cart after successful order
 
@@ -59,8 +56,12 @@ def place_order(request):
 # ✅ CUSTOMER VIEWS ORDER LIST
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(customer=request.user).order_by("-order_date")
-    return render(request, "orders/order_list.html", {"orders": orders})
+    page = paginate_by_cursor(
+        Order.objects.filter(customer=request.user),
+        ("-order_date", "-id"),
+        cursor=request.GET.get("cursor"),
+    )
+    return render(request, "orders/order_list.html", {"orders": page.items, "page": page})
 
 
 # ✅ CUSTOMER VIEWS ORDER DETAILS
@@ -91,32 +92,21 @@ def update_order(request, order_id):
 # ✅ CHECKOUT VIEW
 @login_required
 def checkout(request):
-    cart_items = Cart.objects.filter(customer=request.user)
+    cart_items = Cart.objects.for_customer_with_products(request.user)
 
-    if not cart_items.exists():
+    if not cart_items:
         messages.warning(request, "Your cart is empty!")
         return redirect("cart:view_cart")
 
-    total_price = sum(item.product.price * item.quantity for item in cart_items)
+    total_price = cart_items.totals()["total"]
 
     if request.method == "POST":
         try:
             with transaction.atomic():
-                for item in cart_items:
-                    if item.product.current_stock < item.quantity:
-                        raise ValueError(f"Not enough stock for {item.product.name}")
-                    item.product.reduce_stock(item.quantity)
-
-                order = Order.objects.create(
-                    customer=request.user,
-                    total_price=total_price,
-                    status="Pending"
-                )
-
-                OrderItem.objects.bulk_create([
-                    OrderItem(order=order, product=item.product, quantity=item.quantity, price=item.product.price)
-                    for item in cart_items
-                ])
+                reserve_stock(cart_quantities(cart_items))
+
+                order = Order.objects.create_from_cart(request.user, cart_items, total_price)
+                order_placed(order)
 
                 cart_items.delete()
 
@@ -133,78 +123,132 @@ def checkout(request):
 # ✅ DOWNLOAD INVOICE
 @login_required
 def download_invoice(request, order_id):
-    order = get_object_or_404(Order, id=order_id, customer=request.user)
+    order = get_object_or_404(Order.objects.with_customer().with_items(), id=order_id, customer=request.user)
 
-    response = HttpResponse(content_type="text/plain")
-    response["Content-Disposition"] = f'attachment; filename="invoice_{order.id}.txt"'
-    response.write(f"Invoice for Order {order.id}\n")
-    response.write(f"Customer: {order.customer.username}\n")
-    response.write(f"Total Price: ${order.total_price}\n")
-    response.write("Items:\n")
-    for item in order.items.all():
-        response.write(f"- {item.product.name}: {item.quantity} x ${item.price}\n")
+    fmt = request.GET.get("format", "txt")
+    if fmt not in INVOICE_FORMATS:
+        raise Http404("Unknown invoice format.")
 
+    # Items are prefetched above, so streaming runs no further queries
+    response = StreamingHttpResponse(iter_invoice(order, fmt), content_type=INVOICE_FORMATS[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{invoice_filename(order, fmt)}"'
     return response
 
 
 # ✅ VENDOR ACCEPTS ORDER
 @login_required
 def vendor_accept_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id, vendor=request.user)
-
-    if order.status != "Pending":
-        messages.warning(request, "This order cannot be accepted.")
-        return redirect("vendors:order_list")
-
-    order.status = "Accepted"
-    order.save()
-    messages.success(request, f"Order {order.id} is now accepted.")
-    return redirect("vendors:order_list")
+    return _single_transition(
+        request, partial(transition_vendor_orders, request.user), order_id, "Accepted",
+        "This order cannot be accepted.", "vendors:vendor_order_list",
+    )
 
 
 # ✅ VENDOR MARKS ORDER AS PACKAGED
 @login_required
 def vendor_pack_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id, vendor=request.user)
-
-    if order.status != "Accepted":
-        messages.warning(request, "Order must be 'Accepted' before packaging.")
-        return redirect("vendors:order_list")
-
-    order.status = "Packaged"
-    order.save()
-    messages.success(request, f"Order {order.id} is now packaged.")
-    return redirect("vendors:order_list")
+    return _single_transition(
+        request, partial(transition_vendor_orders, request.user), order_id, "Packaged",
+        "Order must be 'Accepted' before packaging.", "vendors:vendor_order_list",
+    )
 
 
 # ✅ LOGISTICS TEAM SHIPS ORDER
 @login_required
 def logistics_ship_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id, logistics_team=request.user)
-
-    if order.status != "Packaged":
-        messages.warning(request, "Order must be 'Packaged' before shipping.")
-        return redirect("logistics:order_list")
-
-    order.status = "Shipped"
-    order.save()
-    messages.success(request, f"Order {order.id} is now shipped.")
-    return redirect("logistics:order_list")
+    return _single_transition(
+        request, partial(transition_orders, Order.objects.filter(logistics_team=request.user)), order_id, "Shipped",
+        "Order must be 'Packaged' before shipping.", "orders:logistics_bulk_update",
+    )
 
 
 # ✅ DELIVERY BOY MARKS AS DELIVERED
 @login_required
 def delivery_boy_deliver_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id, delivery_boy=request.user)
+    return _single_transition(
+        request, partial(transition_orders, Order.objects.filter(delivery_boy=request.user)), order_id, "Delivered",
+        "Order is not ready for final delivery.", "logistics:dashboard",
+    )
 
-    if order.status != "Out for Delivery":
-        messages.warning(request, "Order is not ready for final delivery.")
-        return redirect("delivery:order_list")
 
-    order.status = "Delivered"
-    order.save()
-    messages.success(request, f"Order {order.id} delivered successfully!")
-    return redirect("delivery:order_list")
+def _single_transition(request, move, order_id, status, refused, redirect_to):
+    """
+    One-order version of the bulk views: a conditional UPDATE instead of
+    load-check-save. ``move(ids, status)`` is ``transition_orders`` or
+    ``transition_vendor_orders`` bound to what the caller may touch.
+    """
+    result = move([order_id], status)
+    if result.rejected.get(order_id) == "not found":
+        raise Http404("No Order matches the given query.")
+    if result.moved:
+        messages.success(request, f"Order {order_id} is now {status.lower()}.")
+    else:
+        messages.warning(request, refused)
+    return redirect(redirect_to)
+
+
+# ✅ BULK STATUS CHANGES (vendor & logistics)
+@login_required
+@role_required("Vendor")
+def vendor_bulk_update_orders(request):
+    # Vendors move their own part of each order; listed by the part's status
+    sources = _sources(VendorOrder.TRANSITIONS, VENDOR_STATUSES)
+    orders = Order.objects.filter(
+        vendor_links__vendor=request.user, vendor_links__status__in=sources, status__in=VENDOR_OPEN_STATUSES
+    )
+    return _bulk_transition(
+        request, partial(transition_vendor_orders, request.user),
+        orders.annotate(part_status=F("vendor_links__status")), VENDOR_STATUSES, "orders:vendor_bulk_update",
+    )
+
+
+@login_required
+@role_required("Logistics")
+def logistics_bulk_update_orders(request):
+    orders = Order.objects.filter(logistics_team=request.user)
+    return _bulk_transition(
+        request, partial(transition_orders, orders),
+        orders.filter(status__in=_sources(Order.TRANSITIONS, LOGISTICS_STATUSES)),
+        LOGISTICS_STATUSES, "orders:logistics_bulk_update",
+    )
+
+
+def _sources(transitions, statuses):
+    """Statuses that can move to at least one of ``statuses``."""
+    return {source for source, targets in transitions.items() if targets & set(statuses)}
+
+
+def _bulk_transition(request, move, orders, statuses, url_name):
+    """
+    GET: ``orders`` (the caller's orders that can move to one of ``statuses``), with checkboxes.
+    POST ``order_ids`` + ``status``: ``move(ids, status)`` every eligible selected order at once.
+    """
+    if request.method == "POST":
+        status = request.POST.get("status")
+        ids = parse_ids(request.POST.getlist("order_ids"))
+        if status not in statuses:
+            messages.error(request, "Choose a valid status.")
+        elif not ids:
+            messages.warning(request, "Select at least one order.")
+        else:
+            result = move(ids, status)
+            if result.moved:
+                messages.success(request, f"Moved {len(result.moved)} order(s) to {status}.")
+            if result.rejected:
+                messages.warning(request, f"Skipped {len(result.rejected)}: {describe_rejections(result)}")
+        return redirect(url_name)
+
+    page = paginate_by_cursor(
+        orders.select_related("customer"),
+        ("-order_date", "-id"),
+        cursor=request.GET.get("cursor"),
+        per_page=100,
+    )
+    return render(request, "orders/bulk_transition.html", {
+        "orders": page.items,
+        "page": page,
+        "statuses": statuses,
+    })
 
 
 # # orders/views.py
@@ -231,27 +275,33 @@ def all_orders_view(request):
 # orders/views.py
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from logistics.models import Warehouse, Shipment
+from logistics.routing import reserve_warehouse_for_customer
 from .models import Order
 
+@login_required
 def return_order(request, order_id):
-    order = get_object_or_404(Order, id=order_id)
-
-    if order.status != "Delivered":
-        messages.error(request, "Only delivered orders can be returned.")
-        return redirect("order_detail", order_id=order.id)
-
-    # Reverse flow
-    order.status = "In Transit"
-    order.is_returned = True
-    order.current_warehouse = Warehouse.objects.first()  # Optional: Use closest/assigned warehouse
-    order.save()
-
-    Shipment.objects.create(
-        order=order,
-        warehouse=order.current_warehouse,
-        status="Pending"
-    )
+    # Reverse flow; the order row stays locked until the slot is reserved, so a double submit reserves one
+    with transaction.atomic():
+        order = get_object_or_404(
+            Order.objects.with_customer().select_for_update(of=("self",)), id=order_id, customer=request.user
+        )
+        if order.status != "Delivered":
+            messages.error(request, "Only delivered orders can be returned.")
+            return redirect("orders:order_details", order_id=order.id)
+
+        order.status = "In Transit"
+        order.is_returned = True
+        order.current_warehouse_id = reserve_warehouse_for_customer(order.customer)  # takes a slot in the nearest with one free
+        order.save(update_fields=["status", "is_returned", "current_warehouse"])
+
+        # The order's shipment becomes the return leg in the task worker and takes over the slot
+        enqueue(
+            "logistics.create_return_shipment",
+            key=f"return-shipment:{order.id}",
+            order_id=order.id,
+            warehouse_id=order.current_warehouse_id,
+            reserved=order.current_warehouse_id is not None,
+        )
 
     messages.success(request, f"Return initiated for Order #{order.id}.")
-    return redirect("order_detail", order_id=order.id)
+    return redirect("orders:order_details", order_id=order.id)
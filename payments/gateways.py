@@ -0,0 +1,123 @@
+"""
+Payment gateways behind one small interface.
+
+``get_gateway()`` returns the gateway named by ``settings.PAYMENT_GATEWAY``
+("manual" by default, or "fake", "stripe", or a dotted path to a
+``PaymentGateway`` subclass). SDKs are imported the first time a gateway
+actually talks to its provider, never at startup.
+"""
+import itertools
+import threading
+import uuid
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# reference: the gateway's id for the charge; status: a Payment.STATUS_CHOICES value
+Charge = namedtuple("Charge", ["reference", "status"])
+
+
+class PaymentGateway:
+    name = None
+
+    def charge(self, amount, currency, idempotency_key, description=""):
+        """
+        Take ``amount`` (a Decimal in major units) and return a ``Charge``.
+        Repeating a call with the same ``idempotency_key`` must not charge twice.
+        """
+        raise NotImplementedError
+
+    def refund(self, reference, amount, idempotency_key):
+        """Return ``amount`` of the charge ``reference``; returns the refund's reference."""
+        raise NotImplementedError
+
+
+class ManualGateway(PaymentGateway):
+    """UPI / QR transfers the customer confirms themselves; nothing to call."""
+    name = "manual"
+
+    def charge(self, amount, currency, idempotency_key, description=""):
+        return Charge(f"manual-{idempotency_key}", "Completed")
+
+    def refund(self, reference, amount, idempotency_key):
+        return f"manual-{idempotency_key}"  # paid back by hand, like the charge
+
+
+class FakeGateway(PaymentGateway):
+    """In-process stand-in for tests and local development: remembers every charge by key."""
+    name = "fake"
+
+    def __init__(self, fail_amounts=()):
+        self.fail_amounts = {Decimal(str(amount)) for amount in fail_amounts}
+        self.charges = {}  # idempotency_key -> (Charge, amount)
+        self.refunds = {}  # idempotency_key -> (refund reference, charge reference, amount)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def charge(self, amount, currency, idempotency_key, description=""):
+        with self._lock:
+            if idempotency_key not in self.charges:
+                status = "Failed" if Decimal(amount) in self.fail_amounts else "Completed"
+                self.charges[idempotency_key] = (Charge(f"fake_{next(self._ids)}", status), Decimal(amount))
+            return self.charges[idempotency_key][0]
+
+    def refund(self, reference, amount, idempotency_key):
+        with self._lock:
+            if idempotency_key not in self.refunds:
+                self.refunds[idempotency_key] = (f"fake_re_{next(self._ids)}", reference, Decimal(amount))
+            return self.refunds[idempotency_key][0]
+
+
+class StripeGateway(PaymentGateway):
+    name = "stripe"
+    STATUSES = {"succeeded": "Completed", "canceled": "Failed", "requires_payment_method": "Failed"}
+
+    def __init__(self):
+        self._stripe = None
+
+    @property
+    def sdk(self):
+        if self._stripe is None:
+            import stripe  # only when a Stripe charge is actually made
+
+            stripe.api_key = settings.STRIPE_SECRET_KEY
+            self._stripe = stripe
+        return self._stripe
+
+    def charge(self, amount, currency, idempotency_key, description=""):
+        intent = self.sdk.PaymentIntent.create(
+            amount=int(Decimal(amount) * 100),
+            currency=currency,
+            description=description,
+            payment_method_types=["card"],
+            idempotency_key=idempotency_key,  # Stripe replays the original response for a repeated key
+        )
+        return Charge(intent.id, self.STATUSES.get(intent.status, "Pending"))
+
+    def refund(self, reference, amount, idempotency_key):
+        refund = self.sdk.Refund.create(
+            payment_intent=reference, amount=int(Decimal(amount) * 100), idempotency_key=idempotency_key
+        )
+        return refund.id
+
+
+GATEWAYS = {gateway.name: gateway for gateway in (ManualGateway, FakeGateway, StripeGateway)}
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_gateway(name=None):
+    """The (shared) gateway instance for ``name`` or ``settings.PAYMENT_GATEWAY``."""
+    name = name or getattr(settings, "PAYMENT_GATEWAY", "manual")
+    with _instances_lock:
+        if name not in _instances:
+            gateway_class = GATEWAYS[name] if name in GATEWAYS else import_string(name)
+            _instances[name] = gateway_class()
+        return _instances[name]
+
+
+def new_idempotency_key():
+    """A fresh key for a payment form; the same key is posted again on a double submit."""
+    return uuid.uuid4().hex
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.refunds import BATCH_SIZE, approve_refunds, reject_refunds
+
+
+class Command(BaseCommand):
+    help = "Approve pending refund requests in batches (one transaction per batch), or reject given ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("ids", nargs="*", type=int, help="Refund request ids (default: every pending request).")
+        parser.add_argument("--reject", action="store_true", help="Reject the given requests instead of approving.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        ids, size = options["ids"], options["batch_size"]
+        if options["reject"]:
+            if not ids:
+                raise CommandError("--reject needs the ids of the requests to reject.")
+            self.stdout.write(self.style.SUCCESS(f"Rejected {reject_refunds(ids)} refund request(s)."))
+            return
+
+        approved = restocked = 0
+        skipped = {}
+        batches = [ids[start:start + size] for start in range(0, len(ids), size)] if ids else None
+        while True:
+            if batches is not None:
+                if not batches:
+                    break
+                batch = approve_refunds(batches.pop(0))
+            else:
+                # Skipped requests stay pending, so later batches must not pick them again
+                batch = approve_refunds(limit=size, exclude=skipped.keys())
+                if not batch.approved and not batch.skipped:
+                    break
+            approved += len(batch.approved)
+            restocked += batch.units_restocked
+            skipped.update(batch.skipped)
+            self.stdout.write(f"Batch: {len(batch.approved)} approved, {len(batch.skipped)} skipped.")
+
+        for request_id, reason in sorted(skipped.items()):
+            self.stdout.write(f"  skipped #{request_id}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Approved {approved} refund(s), restocked {restocked} unit(s), skipped {len(skipped)}."
+        ))
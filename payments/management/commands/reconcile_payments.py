@@ -0,0 +1,87 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from orders.models import Order
+from payments.models import Payment
+from payments.reconciliation import APPLY_FROM, APPLY_TO, Discrepancy, read_settlement, reconcile
+from utils.commands import parse_day
+
+
+class Command(BaseCommand):
+    help = "Reconcile Payment rows against a gateway settlement CSV (reference, amount, status)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("settlement", help="Settlement CSV exported from the gateway.")
+        parser.add_argument("--gateway", help="Only payments taken through this gateway (e.g. stripe).")
+        parser.add_argument("--since", help="First payment day covered by the file (YYYY-MM-DD).")
+        parser.add_argument("--until", help="Last payment day covered by the file (YYYY-MM-DD).")
+        parser.add_argument("--report", help="Write every discrepancy to this CSV file.")
+        parser.add_argument(
+            "--apply", action="store_true",
+            help=(
+                "Adopt the settled status for status mismatches of pending or failed payments "
+                "(matching amounts only); completed payments mark their orders Paid."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        try:
+            settlement = read_settlement(options["settlement"])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        payments = Payment.objects.all()
+        if options["gateway"]:
+            payments = payments.filter(gateway=options["gateway"])
+        if options["since"]:
+            payments = payments.filter(created_at__gte=parse_day(options["since"]))
+        if options["until"]:
+            payments = payments.filter(created_at__lte=parse_day(options["until"], end=True))
+
+        matched, discrepancies = reconcile(settlement, payments)
+
+        kinds = {}
+        for discrepancy in discrepancies:
+            kinds[discrepancy.kind] = kinds.get(discrepancy.kind, 0) + 1
+        self.stdout.write(f"{len(settlement)} settlement line(s), {matched} matched.")
+        for kind, count in sorted(kinds.items()):
+            self.stdout.write(f"  {kind}: {count}")
+
+        if options["report"]:
+            with open(options["report"], "w", newline="", encoding="utf-8") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(Discrepancy._fields)
+                writer.writerows(discrepancies)
+            self.stdout.write(f"Discrepancies written to {options['report']}.")
+
+        if options["apply"]:
+            self._apply([d for d in discrepancies if d.kind == "status"])
+
+    def _apply(self, mismatches):
+        """
+        Lock the open payments among ``mismatches``, one UPDATE per settled status,
+        then one transition of the newly completed orders. Payments that are
+        refunded or already settled in the database, and settlements to any other
+        status, are left for a person to look at.
+        """
+        wanted = {row.payment_id: row.file_status for row in mismatches if row.file_status in APPLY_TO}
+        with transaction.atomic():
+            rows = (
+                Payment.objects.select_for_update().filter(id__in=list(wanted), status__in=APPLY_FROM)
+                .values_list("id", "order_id")
+            )
+            by_status = {}
+            for payment_id, order_id in rows:
+                by_status.setdefault(wanted[payment_id], []).append((payment_id, order_id))
+            for status, payments in by_status.items():
+                Payment.objects.filter(id__in=[payment_id for payment_id, _ in payments]).update(status=status)
+            completed = [order_id for _, order_id in by_status.get("Completed", [])]
+            result = Order.objects.transition(completed, "Paid")
+        updated = sum(len(payments) for payments in by_status.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} payment(s); {len(result.moved)} order(s) moved to Paid."
+        ))
+        if updated < len(mismatches):
+            self.stdout.write(self.style.WARNING(f"Left {len(mismatches) - updated} status mismatch(es) for review."))
@@ -15,7 +15,8 @@ class Payment(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
         ('Completed', 'Completed'),
-        ('Failed', 'Failed')
+        ('Failed', 'Failed'),
+        ('Refunded', 'Refunded')
     ]
 
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name="payment")
@@ -24,6 +25,11 @@ class Payment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # ✅ Set by payments.services.record_payment
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    gateway = models.CharField(max_length=20, blank=True, default="")
+    gateway_reference = models.CharField(max_length=100, blank=True, default="", db_index=True)
+
     def __str__(self):
         return f"Payment {self.id} - {self.status}"
 
@@ -40,6 +46,24 @@ class RefundRequest(models.Model):
     reason = models.TextField()
     status = models.CharField(max_length=20, choices=REFUND_STATUS_CHOICES, default='Pending')
     request_date = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)  # ✅ Set when approved or rejected
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "request_date"], name="refund_status_date_idx"),
+        ]
 
     def __str__(self):
         return f"Refund {self.id} - {self.status}"
+
+
+class PaymentReversal(models.Model):
+    """Money returned for an approved refund (written in bulk by payments.refunds)."""
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name="reversals")
+    refund_request = models.OneToOneField(RefundRequest, on_delete=models.CASCADE, related_name="reversal")
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    gateway_reference = models.CharField(max_length=100, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reversal {self.id} of Payment {self.payment_id} - {self.amount}"
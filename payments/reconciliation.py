@@ -0,0 +1,82 @@
+"""
+Match ``Payment`` rows against a gateway settlement file.
+
+The file is read once into a dict keyed by gateway reference (the build side
+of a hash join); payments are then streamed from the database once and probed
+against it. Cost is one pass over each side, whatever their size, instead of
+one query per settlement line.
+"""
+import csv
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+SettlementRow = namedtuple("SettlementRow", ["reference", "amount", "status"])
+Discrepancy = namedtuple("Discrepancy", [
+    "kind", "reference", "payment_id", "order_id", "db_amount", "file_amount", "db_status", "file_status",
+])
+
+# Gateway settlement statuses -> Payment.status
+SETTLED_STATUSES = {
+    "settled": "Completed", "succeeded": "Completed", "completed": "Completed", "paid": "Completed",
+    "failed": "Failed", "declined": "Failed", "canceled": "Failed", "cancelled": "Failed",
+    "pending": "Pending",
+    "refunded": "Refunded", "reversed": "Refunded",
+}
+# Status mismatches ``--apply`` may settle: only open payments move, and only to a final charge outcome.
+# Refunds are never adopted from a file (they go through ``approve_refunds``).
+APPLY_FROM = ("Pending", "Failed")
+APPLY_TO = ("Completed", "Failed")
+
+
+def read_settlement(path):
+    """``{reference: SettlementRow}`` from a CSV with reference, amount and status columns."""
+    rows = {}
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        reader = csv.DictReader(handle)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+        missing = {"reference", "amount", "status"} - fields.keys()
+        if missing:
+            raise ValueError(f"Settlement file is missing column(s): {', '.join(sorted(missing))}")
+        for line, raw in enumerate(reader, start=2):
+            reference = raw[fields["reference"]].strip()
+            try:
+                amount = Decimal(raw[fields["amount"]].strip())
+            except InvalidOperation:
+                raise ValueError(f"Line {line}: invalid amount {raw[fields['amount']]!r}")
+            status = SETTLED_STATUSES.get(raw[fields["status"]].strip().lower(), "Pending")
+            rows[reference] = SettlementRow(reference, amount, status)
+    return rows
+
+
+def reconcile(settlement, payments, chunk_size=5000):
+    """
+    Compare ``settlement`` (from ``read_settlement``) with ``payments`` (a
+    Payment queryset covering the same period). Returns ``(matched, discrepancies)``.
+    Discrepancy kinds: amount, status, missing_payment (in the file only) and
+    unsettled (in the database only).
+    """
+    matched, discrepancies, seen = 0, [], set()
+    rows = (
+        payments.exclude(gateway_reference="")
+        .values_list("id", "order_id", "gateway_reference", "amount", "status")
+        .iterator(chunk_size=chunk_size)
+    )
+    for payment_id, order_id, reference, amount, status in rows:
+        settled = settlement.get(reference)
+        if settled is None:
+            discrepancies.append(Discrepancy("unsettled", reference, payment_id, order_id, amount, None, status, None))
+            continue
+        seen.add(reference)
+        if settled.amount != amount:
+            kind = "amount"
+        elif settled.status != status:
+            kind = "status"
+        else:
+            matched += 1
+            continue
+        discrepancies.append(Discrepancy(kind, reference, payment_id, order_id, amount, settled.amount, status, settled.status))
+
+    for reference in settlement.keys() - seen:
+        settled = settlement[reference]
+        discrepancies.append(Discrepancy("missing_payment", reference, None, None, None, settled.amount, None, settled.status))
+    return matched, discrepancies
@@ -0,0 +1,91 @@
+"""
+Batched refund approval.
+
+``approve_refunds`` decides a whole batch of pending ``RefundRequest`` rows in
+one transaction with a fixed number of statements, whatever the batch size:
+the requests and their payments are read once, orders that have not shipped
+yet are cancelled with one conditional UPDATE and only their items go back
+on the shelf (one grouped stock UPDATE, ``bulk_apply_stock_deltas``); goods
+already with the carrier or the customer are restocked when the return
+shipment reaches the vendor. The reversals are written with one
+``bulk_create`` and payments and requests are each flipped with one UPDATE.
+Gateway refunds are keyed per request, so a batch retried after a rollback
+never pays out twice.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.services import restock_orders
+from orders.models import Order
+from .gateways import get_gateway
+from .models import Payment, PaymentReversal, RefundRequest
+
+BATCH_SIZE = 1000
+
+RefundBatch = namedtuple("RefundBatch", ["approved", "skipped", "units_restocked"])
+
+
+def approve_refunds(request_ids=None, limit=BATCH_SIZE, exclude=()):
+    """
+    Approve pending refund requests (those among ``request_ids``, or else the
+    oldest ``limit`` not in ``exclude``). A request is skipped, and stays pending, when its order
+    has no completed payment or another request for the same order is
+    approved in the batch.
+    Returns ``RefundBatch(approved=[ids], skipped={id: reason}, units_restocked)``.
+    """
+    with transaction.atomic():
+        pending = RefundRequest.objects.filter(status="Pending").order_by("request_date", "id")
+        if request_ids is not None:
+            pending = pending.filter(id__in=request_ids)
+            limit = None
+        if exclude:
+            pending = pending.exclude(id__in=list(exclude))
+        requests = list(pending.select_for_update().values_list("id", "order_id")[:limit])
+        payments = {
+            payment.order_id: payment
+            for payment in Payment.objects.filter(order_id__in={order_id for _, order_id in requests}).select_for_update()
+        }
+
+        approved, refunded = [], {}
+        skipped = {request_id: "not pending" for request_id in set(request_ids or ()) - {r for r, _ in requests}}
+        for request_id, order_id in requests:
+            payment = payments.get(order_id)
+            if order_id in refunded:
+                skipped[request_id] = "duplicate request for the order"
+            elif payment is None or payment.status != "Completed":
+                skipped[request_id] = "no completed payment"
+            else:
+                approved.append(request_id)
+                refunded[order_id] = (request_id, payment)
+        if not approved:
+            return RefundBatch([], skipped, 0)
+
+        # Orders refunded before they shipped are cancelled (Order.TRANSITIONS decides which) and
+        # only their items go back in stock; shipped goods are restocked by the return flow on arrival
+        cancelled = Order.objects.transition(refunded.keys(), "Cancelled")
+        restocked = restock_orders(cancelled.moved)
+
+        PaymentReversal.objects.bulk_create([
+            PaymentReversal(
+                payment=payment,
+                refund_request_id=request_id,
+                amount=payment.amount,
+                gateway_reference=get_gateway(payment.gateway or "manual").refund(
+                    payment.gateway_reference, payment.amount, f"refund-{request_id}"
+                ),
+            )
+            for request_id, payment in refunded.values()
+        ])
+        Payment.objects.filter(id__in=[payment.id for _, payment in refunded.values()]).update(status="Refunded")
+        RefundRequest.objects.filter(id__in=approved).update(status="Approved", processed_at=timezone.now())
+
+    return RefundBatch(approved, skipped, restocked)
+
+
+def reject_refunds(request_ids):
+    """Reject the pending requests among ``request_ids`` in one UPDATE; returns how many."""
+    return RefundRequest.objects.filter(id__in=request_ids, status="Pending").update(
+        status="Rejected", processed_at=timezone.now()
+    )
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import transaction
+
+from orders.models import Order
+from orders.tasks import enqueue
+from .gateways import get_gateway
+from .models import Payment
+
+
+def record_payment(order, method, idempotency_key, gateway=None):
+    """
+    Charge ``order`` through ``gateway`` (default: ``settings.PAYMENT_GATEWAY``)
+    and record the ``Payment``; a completed payment moves the order to Paid and
+    queues the vendor emails. Returns ``(payment, created)``; ``payment`` is
+    None when the order is no longer Pending (cancelled, or moved on) and
+    has no payment.
+
+    Idempotent: a repeated ``idempotency_key`` (double submit, client retry)
+    returns the payment it created, and an order that is already paid is never
+    charged again. The order row is locked and its status checked again
+    meanwhile, so concurrent attempts for one order run one after the other
+    and an order cancelled since the caller looked is not charged.
+    """
+    gateway = gateway or get_gateway()
+    with transaction.atomic():
+        order = Order.objects.select_for_update().get(id=order.id)
+        existing = Payment.objects.filter(order=order).first()
+        if existing and (existing.idempotency_key == idempotency_key or existing.status == "Completed"):
+            return existing, False
+        if order.status != "Pending":
+            return existing, False
+
+        charge = gateway.charge(
+            order.total_price,
+            getattr(settings, "PAYMENT_CURRENCY", "usd"),
+            idempotency_key,
+            description=f"Order #{order.id}",
+        )
+        payment, created = Payment.objects.update_or_create(order=order, defaults={
+            "payment_method": method,
+            "amount": order.total_price,
+            "status": charge.status,
+            "idempotency_key": idempotency_key,
+            "gateway": gateway.name,
+            "gateway_reference": charge.reference,
+        })
+        if charge.status == "Completed":
+            Order.objects.filter(id=order.id).transition([order.id], "Paid")
+            enqueue("orders.notify_vendors", order_id=order.id, event="paid")
+    return payment, created
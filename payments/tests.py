@@ -1,3 +1,168 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from accounts.models import CustomUser, Role
+from customers.models import Customer
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from .gateways import FakeGateway
+from .models import Payment, PaymentReversal, RefundRequest
+from .refunds import approve_refunds
+from .services import record_payment
+
+
+def make_user(username, role):
+    return CustomUser.objects.create_user(username, password="x", role=Role.objects.get_or_create(name=role)[0])
+
+
+class RecordPaymentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer", Role.CUSTOMER)
+
+    def setUp(self):
+        self.gateway = FakeGateway(fail_amounts=[13])
+        self.order = Order.objects.create(customer=self.customer, total_price=20)
+
+    def test_completed_charge_marks_order_paid(self):
+        payment, created = record_payment(self.order, "UPI", "key-1", self.gateway)
+        self.assertTrue(created)
+        self.assertEqual((payment.status, payment.amount, payment.gateway), ("Completed", 20, "fake"))
+        self.assertEqual(Order.objects.get(id=self.order.id).status, "Paid")
+
+    def test_repeated_key_returns_the_same_payment(self):
+        first, _ = record_payment(self.order, "UPI", "key-1", self.gateway)
+        again, created = record_payment(self.order, "UPI", "key-1", self.gateway)
+        self.assertFalse(created)
+        self.assertEqual(again.id, first.id)
+        self.assertEqual(len(self.gateway.charges), 1)
+
+    def test_paid_order_is_not_charged_again(self):
+        record_payment(self.order, "UPI", "key-1", self.gateway)
+        payment, created = record_payment(self.order, "UPI", "key-2", self.gateway)
+        self.assertFalse(created)
+        self.assertEqual(payment.idempotency_key, "key-1")
+        self.assertNotIn("key-2", self.gateway.charges)
+
+    def test_order_cancelled_meanwhile_is_not_charged(self):
+        stale = Order.objects.get(id=self.order.id)
+        Order.objects.transition([self.order.id], "Cancelled")
+        self.assertEqual(record_payment(stale, "UPI", "key-1", self.gateway), (None, False))
+        self.assertEqual(self.gateway.charges, {})
+        self.assertFalse(Payment.objects.exists())
+
+    def test_failed_charge_leaves_order_pending(self):
+        order = Order.objects.create(customer=self.customer, total_price=13)
+        payment, _ = record_payment(order, "UPI", "key-1", self.gateway)
+        self.assertEqual(payment.status, "Failed")
+        self.assertEqual(Order.objects.get(id=order.id).status, "Pending")
+
+
+class ApproveRefundsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vendor = make_user("vendor", Role.VENDOR)
+        cls.user = make_user("customer", Role.CUSTOMER)
+        cls.customer = Customer.objects.create(user=cls.user)
+        cls.product = Product.objects.create(
+            name="Lamp", category=Category.objects.create(name="Lamps"), vendor=vendor, price=10, current_stock=5,
+            approval_status="Approved",
+        )
+
+    def paid_order(self, status="Paid", quantity=2):
+        order = Order.objects.create(customer=self.user, total_price=10 * quantity, status=status)
+        OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price=10)
+        Payment.objects.create(
+            order=order, payment_method="UPI", amount=order.total_price, status="Completed", gateway="manual",
+            gateway_reference=f"manual-{order.id}",
+        )
+        return order
+
+    def request_refund(self, order):
+        return RefundRequest.objects.create(order=order, customer=self.customer, reason="Broken")
+
+    def stock(self):
+        return Product.objects.get(id=self.product.id).current_stock
+
+    def test_unshipped_order_is_cancelled_and_restocked(self):
+        order = self.paid_order()
+        refund = self.request_refund(order)
+        batch = approve_refunds([refund.id])
+        self.assertEqual((batch.approved, batch.skipped, batch.units_restocked), ([refund.id], {}, 2))
+        self.assertEqual(Order.objects.get(id=order.id).status, "Cancelled")
+        self.assertEqual(Payment.objects.get(order=order).status, "Refunded")
+        self.assertEqual(RefundRequest.objects.get(id=refund.id).status, "Approved")
+        self.assertEqual(PaymentReversal.objects.get(refund_request=refund).amount, 20)
+        self.assertEqual(self.stock(), 7)
+
+    def test_shipped_goods_are_not_restocked(self):
+        order = self.paid_order(status="Delivered")
+        batch = approve_refunds([self.request_refund(order).id])
+        self.assertEqual(batch.units_restocked, 0)
+        self.assertEqual(Order.objects.get(id=order.id).status, "Delivered")
+        self.assertEqual(Payment.objects.get(order=order).status, "Refunded")
+        self.assertEqual(self.stock(), 5)
+
+    def test_skips_unpaid_orders_and_duplicate_requests(self):
+        order = self.paid_order()
+        first, duplicate = self.request_refund(order), self.request_refund(order)
+        unpaid = self.request_refund(Order.objects.create(customer=self.user, total_price=10))
+        batch = approve_refunds([first.id, duplicate.id, unpaid.id])
+        self.assertEqual(batch.approved, [first.id])
+        self.assertEqual(batch.skipped, {
+            duplicate.id: "duplicate request for the order", unpaid.id: "no completed payment",
+        })
+        self.assertEqual(RefundRequest.objects.get(id=unpaid.id).status, "Pending")
+
+    def test_approved_request_is_not_approved_twice(self):
+        refund = self.request_refund(self.paid_order())
+        approve_refunds([refund.id])
+        batch = approve_refunds([refund.id])
+        self.assertEqual((batch.approved, batch.skipped), ([], {refund.id: "not pending"}))
+        self.assertEqual(PaymentReversal.objects.count(), 1)
+        self.assertEqual(self.stock(), 7)
+
+
+class ReconcileApplyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = make_user("customer", Role.CUSTOMER)
+
+    def payment(self, reference, status, order_status="Pending"):
+        order = Order.objects.create(customer=self.customer, total_price=10, status=order_status)
+        return Payment.objects.create(
+            order=order, payment_method="UPI", amount=10, status=status, gateway="manual", gateway_reference=reference,
+        )
+
+    def apply(self, lines):
+        handle, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(handle, "w") as settlement:
+            settlement.write("reference,amount,status\n" + "".join(f"{ref},10,{status}\n" for ref, status in lines))
+        try:
+            call_command("reconcile_payments", path, "--apply", stdout=StringIO())
+        finally:
+            os.remove(path)
+
+    def status(self, payment):
+        return Payment.objects.get(id=payment.id).status
+
+    def test_open_payments_adopt_the_settled_status(self):
+        pending, failed = self.payment("a", "Pending"), self.payment("b", "Failed")
+        self.apply([("a", "settled"), ("b", "settled")])
+        self.assertEqual((self.status(pending), self.status(failed)), ("Completed", "Completed"))
+        self.assertEqual(Order.objects.get(id=pending.order_id).status, "Paid")
+
+    def test_refunded_payments_are_left_alone(self):
+        refunded = self.payment("a", "Refunded", order_status="Cancelled")
+        self.apply([("a", "settled")])
+        self.assertEqual(self.status(refunded), "Refunded")
+        self.assertEqual(Order.objects.get(id=refunded.order_id).status, "Cancelled")
+
+    def test_refunds_in_the_file_are_not_adopted(self):
+        completed, pending = self.payment("a", "Completed", order_status="Paid"), self.payment("b", "Pending")
+        self.apply([("a", "refunded"), ("b", "refunded")])
+        self.assertEqual((self.status(completed), self.status(pending)), ("Completed", "Pending"))
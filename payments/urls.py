@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import order_list, pay_order, mark_order_paid
+from .views import order_list, pay_order, mark_order_paid, request_refund, refund_requests
 # Optional: Import Stripe view if you're using it
 # from .views import process_payment
 
@@ -9,6 +9,8 @@ urlpatterns = [
     path("orders/", order_list, name="order_list"),                    # 🧾 View all orders
     path("pay/<int:order_id>/", pay_order, name="pay_order"),         # 💳 Show manual payment (UPI, etc.)
     path("paid/<int:order_id>/", mark_order_paid, name="mark_order_paid"),  # ✅ Customer confirms payment
+    path("refund/<int:order_id>/", request_refund, name="request_refund"),   # ↩️ Customer asks for a refund
+    path("refunds/", refund_requests, name="refund_requests"),               # ↩️ Staff approve/reject in bulk
 
     # Optional Stripe integration (uncomment when needed)
     # path("stripe/<int:order_id>/", process_payment, name="process_payment"),
@@ -1,12 +1,16 @@
-import stripe
-from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Payment
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_POST
+from .gateways import get_gateway, new_idempotency_key
+from .models import Payment, RefundRequest
+from .refunds import approve_refunds, reject_refunds
+from .services import record_payment
+from customers.models import Customer
 from orders.models import Order
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from orders.services import parse_ids
+from utils.pagination import paginate_by_cursor
 
 
 # -------------------------------
@@ -20,7 +24,11 @@ def pay_order(request, order_id):
         messages.warning(request, "This order is already paid or processed.")
         return redirect("payments:order_list")
 
-    return render(request, "payments/manual_payment.html", {"order": order})
+    # The form posts this key back, so a double submit records one payment
+    return render(request, "payments/manual_payment.html", {
+        "order": order,
+        "idempotency_key": new_idempotency_key(),
+    })
 
 
 # -------------------------------
@@ -31,36 +39,52 @@ def mark_order_paid(request, order_id):
     order = get_object_or_404(Order, id=order_id, customer=request.user)
 
     if order.status == "Pending":
-        order.status = "Paid"
-        order.save()
-        messages.success(request, f"✅ Order #{order.id} marked as Paid. Awaiting confirmation.")
+        payment, _ = record_payment(order, "UPI", _idempotency_key(request, order), get_gateway("manual"))
+        if payment is None:
+            messages.warning(request, "This order can no longer be paid.")
+        elif payment.status == "Completed":
+            messages.success(request, f"✅ Order #{order.id} marked as Paid. Awaiting confirmation.")
+        else:
+            messages.error(request, f"Payment for Order #{order.id} did not go through.")
     else:
         messages.info(request, "Order already marked as paid.")
 
     return redirect("payments:order_list")
 
 
+def _idempotency_key(request, order):
+    """The key posted by the payment form or sent as a header; else one per order (repeats are no-ops)."""
+    key = request.POST.get("idempotency_key") or request.headers.get("Idempotency-Key")
+    return key[:64] if key else f"order-{order.id}-manual"
+
+
 # -------------------------------
 # 📋 List Orders
 # -------------------------------
 @login_required
 def order_list(request):
-    orders = Order.objects.filter(customer=request.user).order_by("-order_date")
-
-    if not orders.exists():
+    cursor = request.GET.get("cursor")
+    page = paginate_by_cursor(
+        Order.objects.filter(customer=request.user),
+        ("-order_date", "-id"),
+        cursor=cursor,
+    )
+
+    if not page.items and not cursor:
         messages.warning(request, "You have no orders yet. Start shopping now!")
 
-    return render(request, "payments/order_list.html", {"orders": orders})
+    return render(request, "payments/order_list.html", {"orders": page.items, "page": page})
 
 
 # -------------------------------
 # 💸 Stripe (Optional)
 # -------------------------------
-# Uncomment only if using Stripe
+# Uncomment only if using Stripe (set PAYMENT_GATEWAY = "stripe"; the SDK is
+# then imported on first use by payments.gateways.StripeGateway)
 # @login_required
 # def process_payment(request, order_id):
 #     order = get_object_or_404(Order, id=order_id, customer=request.user)
-#     intent = stripe.PaymentIntent.create(
+#     intent = get_gateway("stripe").sdk.PaymentIntent.create(
 #         amount=int(order.total_price * 100),
 #         currency="usd",
 #         payment_method_types=["card"],
@@ -79,9 +103,57 @@ def mark_as_paid(request, order_id):
     """Marks an order as paid and notifies the vendor."""
     order = get_object_or_404(Order, id=order_id)
 
-    # Update the order status to "Paid"
-    order.status = "Paid"
-    order.save()
+    # Records the Payment and moves the order to "Paid"; a repeat is a no-op
+    record_payment(order, "UPI", _idempotency_key(request, order), get_gateway("manual"))
 
     messages.success(request, "Payment confirmed. Vendor has been notified!")
     return redirect("orders:order_list")  # Redirect user after payment
+
+
+# -------------------------------
+# ↩️ Refunds
+# -------------------------------
+@login_required
+@require_POST
+def request_refund(request, order_id):
+    order = get_object_or_404(Order, id=order_id, customer=request.user)
+
+    if not Payment.objects.filter(order=order, status="Completed").exists():
+        messages.warning(request, "Only paid orders can be refunded.")
+    elif order.refund_requests.filter(status="Pending").exists():
+        messages.info(request, "A refund for this order is already pending.")
+    else:
+        customer, _ = Customer.objects.get_or_create(user=request.user)
+        RefundRequest.objects.create(order=order, customer=customer, reason=request.POST.get("reason", "").strip())
+        messages.success(request, f"Refund requested for Order #{order.id}.")
+
+    return redirect("payments:order_list")
+
+
+@staff_member_required
+def refund_requests(request):
+    """Pending refund requests with checkboxes; POST ``refund_ids`` + ``action`` decides them in one batch."""
+    if request.method == "POST":
+        ids = parse_ids(request.POST.getlist("refund_ids"))
+        action = request.POST.get("action")
+        if not ids:
+            messages.warning(request, "Select at least one refund request.")
+        elif action == "approve":
+            batch = approve_refunds(ids)
+            messages.success(request, f"Approved {len(batch.approved)} refund(s); {batch.units_restocked} unit(s) restocked.")
+            if batch.skipped:
+                skipped = ", ".join(f"#{pk} ({reason})" for pk, reason in sorted(batch.skipped.items())[:20])
+                messages.warning(request, f"Skipped {len(batch.skipped)}: {skipped}")
+        elif action == "reject":
+            messages.success(request, f"Rejected {reject_refunds(ids)} refund(s).")
+        else:
+            messages.error(request, "Unknown action.")
+        return redirect("payments:refund_requests")
+
+    page = paginate_by_cursor(
+        RefundRequest.objects.filter(status="Pending").select_related("order", "customer__user"),
+        ("request_date", "id"),
+        cursor=request.GET.get("cursor"),
+        per_page=100,
+    )
+    return render(request, "payments/refund_requests.html", {"refunds": page.items, "page": page})
@@ -0,0 +1,150 @@
+"""
+Versioned read-through cache for the public catalog.
+
+Every cached value is keyed on a version counter: one per product, one per
+category and one for the whole catalog. ``products.signals`` bumps the
+counters a Product save/delete touches (after commit), so changed entries are
+never read again and simply expire; nothing is deleted by pattern. Counters
+live in the same cache, so any Django backend (LocMem, file, Redis, ...)
+works, shared by every process when the backend is. They expire like the
+values do, so lookups of ids that don't exist leave nothing behind for good;
+a recreated counter starts from the clock, above any value it had before.
+``None`` is never cached.
+
+Entries carry a soft expiry: past it, one caller refreshes the value under a
+short lock while the others keep serving the stale copy, so a popular page
+never stampedes the database. Hits, misses, stale serves and rebuilds are
+counted per process and flushed to the cache in batches (``cache_stats``).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+PREFIX = "catalog"
+TTL = 60 * 10  # hard expiry of cached values
+FRESH_FOR = 60  # soft expiry: older values are refreshed by one caller while the rest serve them
+VERSION_TTL = TTL  # a counter outlives no value cached under it
+LOCK_TTL = 10  # seconds a rebuild may hold the refresh lock
+LOCK_WAIT = 2.0  # seconds a caller without a value waits for another's rebuild before building itself
+STATS = ("hits", "misses", "stale", "rebuilds")
+STATS_FLUSH_EVERY = 50
+
+
+# 🔹 Version counters
+def _version_key(scope, object_id=None):
+    return f"{PREFIX}:v:{scope}" if object_id is None else f"{PREFIX}:v:{scope}:{object_id}"
+
+
+def _initial_version():
+    # Time-based, so a counter evicted from the cache never restarts at a value already used
+    return time.time_ns() // 1000
+
+
+def versions(*scopes):
+    """Current version of each ``(scope, id)`` pair, e.g. ``("product", 5)`` or ``("catalog", None)``."""
+    keys = [_version_key(scope, object_id) for scope, object_id in scopes]
+    found = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, timeout=VERSION_TTL):
+            missing[key] = cache.get(key, value)  # another process created it first
+    found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*scopes):
+    """Invalidate everything cached under the given ``(scope, id)`` pairs."""
+    for scope, object_id in scopes:
+        key = _version_key(scope, object_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_version(), timeout=VERSION_TTL)
+
+
+def bump_product(product_id, *category_ids):
+    """A product changed: its detail, its categories' lists and the full catalog list are stale."""
+    bump(("product", product_id), ("catalog", None), *(("category", c) for c in set(category_ids) if c is not None))
+
+
+# 🔹 Stats
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event):
+    with _stats_lock:
+        _stats[event] += 1
+        if sum(_stats.values()) < STATS_FLUSH_EVERY:
+            return
+        pending = dict(_stats)
+        _stats.clear()
+    for name, value in pending.items():
+        key = f"{PREFIX}:stats:{name}"
+        if not cache.add(key, value, timeout=None):
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, timeout=None)
+
+
+def cache_stats():
+    """Shared counters plus this process's unflushed ones, with the hit ratio."""
+    shared = cache.get_many([f"{PREFIX}:stats:{name}" for name in STATS])
+    with _stats_lock:
+        stats = {name: shared.get(f"{PREFIX}:stats:{name}", 0) + _stats[name] for name in STATS}
+    lookups = stats["hits"] + stats["stale"] + stats["misses"]
+    stats["hit_ratio"] = round((stats["hits"] + stats["stale"]) / lookups, 4) if lookups else None
+    return stats
+
+
+# 🔹 Read-through
+def _rebuild(key, build):
+    value = build()
+    if value is not None:  # e.g. a missing product: not worth an entry per probed id
+        cache.set(key, (time.time() + FRESH_FOR, value), timeout=TTL)
+    _count("rebuilds")
+    return value
+
+
+def get_or_build(name, version_scopes, build):
+    """
+    The cached value of ``build()`` for ``name`` at the current versions of
+    ``version_scopes``. ``name`` must identify the value (include every
+    parameter ``build`` depends on).
+    """
+    digest = hashlib.md5(name.encode()).hexdigest()  # names may hold long cursors; keep keys short
+    key = f"{PREFIX}:{digest}:" + ".".join(str(v) for v in versions(*version_scopes))
+    lock_key = f"{key}:lock"
+    entry = cache.get(key)
+
+    if entry is not None:
+        fresh_until, value = entry
+        if time.time() < fresh_until:
+            _count("hits")
+            return value
+        _count("stale")
+        if not cache.add(lock_key, 1, timeout=LOCK_TTL):
+            return value  # another caller is refreshing it
+        try:  # we hold the refresh lock: rebuild early while others serve the old copy
+            return _rebuild(key, build)
+        finally:
+            cache.delete(lock_key)
+
+    _count("misses")
+    if not cache.add(lock_key, 1, timeout=LOCK_TTL):
+        # Someone else is building it: wait briefly for their result rather than piling on
+        deadline = time.monotonic() + LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[1]
+        return build()
+    try:
+        return _rebuild(key, build)
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,332 @@
+"""
+Bulk catalog import/export for vendors.
+
+Rows are read lazily (CSV or JSON Lines), validated in chunks and written with
+bulk_create/bulk_update for both Product and Inventory, so a chunk costs a
+handful of statements no matter how many rows it holds. Exports stream rows
+straight from a server-side iterator.
+"""
+import csv
+import json
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import Inventory, StockMovement
+from inventory.services import record_movements
+from utils.db import executemany_update
+from .cache import bump
+from .facets import apply_facet_deltas, facet_deltas_for
+from .models import Category, Product
+from .search import reindex
+
+CATALOG_FIELDS = ["id", "name", "category", "price", "stock", "is_active"]
+FORMATS = ("csv", "jsonl")
+
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f", ""}
+
+
+class CatalogImportReport:
+    """Outcome of an import: counts plus (line number, message) for every rejected row."""
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __str__(self):
+        return f"{self.created} created, {self.updated} updated, {len(self.errors)} rejected"
+
+
+def read_rows(stream, fmt):
+    """Yield ``(line_number, row_dict)`` from a text stream in ``fmt``."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, None
+    else:
+        raise ValueError(f"Unsupported catalog format: {fmt}")
+
+
+def guess_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"invalid boolean {value!r}")
+
+
+def _clean_row(row, categories, create_categories):
+    """Validate one raw row. Returns a dict of typed values or raises ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("row is not an object")
+
+    name = str(row.get("name") or "").strip()
+    if not name:
+        raise ValueError("name is required")
+    if len(name) > 255:
+        raise ValueError("name is longer than 255 characters")
+
+    category_name = str(row.get("category") or "").strip()
+    if not category_name:
+        raise ValueError("category is required")
+    if category_name not in categories and not create_categories:
+        raise ValueError(f"unknown category {category_name!r}")
+
+    try:
+        price = Decimal(str(row.get("price", "")).strip())
+    except InvalidOperation:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if not price.is_finite() or price < 0 or price >= Decimal("100000000") or price.as_tuple().exponent < -2:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+
+    stock = row.get("stock")
+    if stock in (None, ""):
+        stock = None
+    else:
+        try:
+            stock = int(stock)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid stock {row.get('stock')!r}")
+        if stock < 0:
+            raise ValueError("stock cannot be negative")
+
+    is_active = row.get("is_active")
+    is_active = True if is_active is None else _parse_bool(is_active)
+
+    product_id = row.get("id")
+    if product_id in (None, ""):
+        product_id = None
+    else:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid id {row.get('id')!r}")
+
+    return {
+        "id": product_id,
+        "name": name,
+        "category": category_name,
+        "price": price,
+        "stock": stock,
+        "is_active": is_active,
+    }
+
+
+def _ensure_categories(names, categories):
+    """Create any missing categories in one bulk insert and refresh the lookup."""
+    missing = [name for name in names if name not in categories]
+    if missing:
+        Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+        categories.update(Category.objects.filter(name__in=missing).values_list("name", "id"))
+
+
+def _created_products(vendor, products, since):
+    """
+    The rows ``products`` were inserted as, for backends whose ``bulk_create``
+    does not set primary keys (MySQL). Matched on the vendor and every imported
+    value among the rows created since ``since``; rows with equal values are
+    interchangeable.
+    """
+    def key(product):
+        return product.name, product.category_id, product.price, product.current_stock, product.is_active
+
+    wanted = Counter(key(product) for product in products)
+    found = []
+    rows = Product.objects.filter(
+        vendor=vendor, created_at__gte=since, name__in={product.name for product in products}
+    ).order_by("-id")
+    for product in rows:
+        if wanted[key(product)] > 0:
+            wanted[key(product)] -= 1
+            found.append(product)
+    return found
+
+
+def _write_chunk(vendor, cleaned, categories, create_categories, report):
+    if create_categories:
+        _ensure_categories({row["category"] for _, row in cleaned}, categories)
+
+    now = timezone.now()
+    new_rows = [row for _, row in cleaned if row["id"] is None]
+    update_rows = {row["id"]: row for _, row in cleaned if row["id"] is not None}
+
+    with transaction.atomic():
+        if new_rows:
+            products = [
+                Product(
+                    vendor=vendor,
+                    name=row["name"],
+                    category_id=categories[row["category"]],
+                    price=row["price"],
+                    current_stock=row["stock"] or 0,
+                    total_stock_added=row["stock"] or 0,
+                    is_active=row["is_active"],
+                )
+                for row in new_rows
+            ]
+            Product.objects.bulk_create(products)
+            if any(product.pk is None for product in products):
+                products = _created_products(vendor, products, now)
+            Inventory.objects.bulk_create([
+                Inventory(product=product, quantity=product.current_stock, total_stock_added=product.current_stock)
+                for product in products
+            ])
+            record_movements({product.id: product.current_stock for product in products}, StockMovement.IMPORT)
+            apply_facet_deltas(facet_deltas_for(products))
+            report.created += len(products)
+
+        if update_rows:
+            # Locked, so the stock difference recorded in the ledger is against the committed value
+            products = Product.objects.select_for_update().order_by("id").in_bulk(update_rows.keys())
+            old_facet_keys = {product_id: product.facet_key() for product_id, product in products.items()}
+            inventories = {inv.product_id: inv for inv in Inventory.objects.filter(product_id__in=update_rows.keys())}
+            changed_inventories = []
+            movements = {}
+            for product_id, product in products.items():
+                row = update_rows[product_id]
+                product.name = row["name"]
+                product.category_id = categories[row["category"]]
+                product.price = row["price"]
+                product.is_active = row["is_active"]
+                product.updated_at = now
+                if row["stock"] is not None:
+                    movements[product_id] = row["stock"] - product.current_stock
+                    added = max(movements[product_id], 0)
+                    product.current_stock = row["stock"]
+                    product.total_stock_added += added
+                    inventory = inventories.get(product_id)
+                    if inventory is not None:
+                        inventory.total_stock_added += max(row["stock"] - inventory.quantity, 0)
+                        inventory.quantity = row["stock"]
+                        inventory.last_updated = now
+                        changed_inventories.append(inventory)
+            executemany_update(
+                Product,
+                products.values(),
+                ["name", "category", "price", "is_active", "current_stock", "total_stock_added", "updated_at"],
+            )
+            executemany_update(Inventory, changed_inventories, ["quantity", "total_stock_added", "last_updated"])
+            record_movements(movements, StockMovement.IMPORT)
+            apply_facet_deltas(facet_deltas_for(products.values(), old_facet_keys))
+            updated_ids = list(products)
+            stale = [("product", pid) for pid in updated_ids] + [("catalog", None)] + [
+                ("category", category_id) for category_id in {key[0] for key in old_facet_keys.values()}
+                | {product.category_id for product in products.values()}
+            ]
+            # bulk UPDATEs send no post_save: refresh search and the catalog cache here
+            transaction.on_commit(lambda: reindex(updated_ids))
+            transaction.on_commit(lambda: bump(*stale))
+            report.updated += len(products)
+
+
+def import_catalog(vendor, rows, chunk_size=2000, create_categories=False):
+    """
+    Import ``(line_number, row)`` pairs (see ``read_rows``) into ``vendor``'s catalog.
+
+    Rows with an ``id`` update that product if the vendor owns it; rows without
+    one create a new product (pending approval) and its Inventory row. Categories
+    are resolved by name through a dict loaded once. Invalid rows, and any row
+    repeating an id already seen, are skipped and reported; a file that stops decoding (bad encoding, broken CSV) ends the
+    import with an error after the rows read so far. Each chunk is written in
+    its own transaction.
+    """
+    report = CatalogImportReport()
+    categories = dict(Category.objects.values_list("name", "id"))
+    owned_ids = set(Product.objects.filter(vendor=vendor).values_list("id", flat=True))
+    seen_ids = {}  # product id -> line that updates it
+
+    cleaned = []
+    rows = iter(rows)
+    index = line_number = 0
+    while True:
+        try:
+            line_number, row = next(rows)
+        except StopIteration:
+            break
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The file itself is unreadable from here on: keep what was read, report where it broke
+            report.errors.append((line_number + 1, f"unreadable file, import stopped: {e}"))
+            break
+        index += 1
+        line_number = line_number or index
+        try:
+            if row is None:
+                raise ValueError("malformed row")
+            value = _clean_row(row, categories, create_categories)
+            if value["id"] is not None and value["id"] not in owned_ids:
+                raise ValueError(f"product {value['id']} does not belong to this vendor")
+            if value["id"] in seen_ids:
+                raise ValueError(f"product {value['id']} is already updated on line {seen_ids[value['id']]}")
+        except ValueError as e:
+            report.errors.append((line_number, str(e)))
+            continue
+        if value["id"] is not None:
+            seen_ids[value["id"]] = line_number
+        cleaned.append((line_number, value))
+        if len(cleaned) >= chunk_size:
+            _write_chunk(vendor, cleaned, categories, create_categories, report)
+            cleaned = []
+
+    if cleaned:
+        _write_chunk(vendor, cleaned, categories, create_categories, report)
+    return report
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer streaming."""
+
+    def write(self, value):
+        return value
+
+
+def export_catalog(vendor, fmt="csv", chunk_size=2000):
+    """Yield ``vendor``'s catalog as CSV or JSON Lines text, one row at a time."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported catalog format: {fmt}")
+
+    rows = (
+        Product.objects.filter(vendor=vendor)
+        .order_by("id")
+        .values_list("id", "name", "category__name", "price", "current_stock", "is_active")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(CATALOG_FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for product_id, name, category, price, stock, is_active in rows:
+            yield json.dumps({
+                "id": product_id,
+                "name": name,
+                "category": category,
+                "price": str(price),
+                "stock": stock,
+                "is_active": is_active,
+            }) + "\n"
@@ -0,0 +1,178 @@
+"""
+Precomputed facet counts for catalog browsing.
+
+``ProductFacetCount`` holds one row per (category, vendor, price band,
+approval status, active) combination with the number of products in it.
+Product saves and deletes move a product between rows (``products.signals``),
+bulk writes pass their deltas to ``apply_facet_deltas``, and ``rebuild_facets``
+recomputes the table from scratch. A facet panel then groups the public rows,
+so its cost follows the number of combinations, not the number of products.
+"""
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from accounts.models import VendorType
+from .models import PRICE_BANDS, Category, Product, ProductFacetCount, price_band_label
+
+FACET_KEY_FIELDS = ("category_id", "vendor_id", "price_band", "approval_status", "is_active")
+
+# Facet name -> (ProductFacetCount field grouped on, Product lookup it filters)
+FACETS = {
+    "category": ("category_id", "category_id"),
+    "vendor": ("vendor_id", "vendor_id"),
+    "vendor_type": ("vendor__vendor_type_id", "vendor__vendor_type_id"),
+    "price_band": ("price_band", None),  # a range on Product.price, see product_filters()
+}
+
+
+def _key_q(key):
+    return Q(**dict(zip(FACET_KEY_FIELDS, key)))
+
+
+def apply_facet_deltas(deltas):
+    """
+    Add ``{facet_key: delta}`` to the counts in three statements: an INSERT of
+    any missing rows (increments only), one SELECT of their ids and one UPDATE
+    with a per-row CASE.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        # Decrements never create rows: a missing row means the product's own
+        # category or vendor is being deleted along with it.
+        ProductFacetCount.objects.bulk_create(
+            [ProductFacetCount(**dict(zip(FACET_KEY_FIELDS, key))) for key, delta in deltas.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        match = Q()
+        for key in deltas:
+            match |= _key_q(key)
+        rows = ProductFacetCount.objects.filter(match).values_list("id", *FACET_KEY_FIELDS)
+        by_id = {row[0]: deltas[row[1:]] for row in rows}
+        if by_id:
+            ProductFacetCount.objects.filter(id__in=by_id).update(count=F("count") + Case(
+                *[When(id=row_id, then=Value(delta)) for row_id, delta in by_id.items()],
+                output_field=IntegerField(),
+            ))
+
+
+def move_facet(old_key, new_key):
+    """Move one product between facet rows (either key may be None)."""
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_facet_deltas(deltas)
+
+
+def rebuild_facets():
+    """Recompute every count from Product in one GROUP BY. Returns the number of rows written."""
+    bands = Case(
+        *[When(price__gte=low, then=Value(band)) for band, low in reversed(list(enumerate(PRICE_BANDS)))],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    rows = (
+        Product.objects.order_by()
+        .annotate(band=bands)
+        .values("category_id", "vendor_id", "band", "approval_status", "is_active")
+        .annotate(total=Count("id"))
+    )
+    with transaction.atomic():
+        ProductFacetCount.objects.all().delete()
+        created = ProductFacetCount.objects.bulk_create([
+            ProductFacetCount(
+                category_id=row["category_id"],
+                vendor_id=row["vendor_id"],
+                price_band=row["band"],
+                approval_status=row["approval_status"],
+                is_active=row["is_active"],
+                count=row["total"],
+            )
+            for row in rows
+        ], batch_size=1000)
+    return len(created)
+
+
+def product_filters(filters):
+    """Product lookups for ``{facet: value}`` (as returned by ``parse_facet_filters``)."""
+    lookups = {}
+    for facet, value in filters.items():
+        if facet == "price_band":
+            lookups["price__gte"] = PRICE_BANDS[value]
+            if value + 1 < len(PRICE_BANDS):
+                lookups["price__lt"] = PRICE_BANDS[value + 1]
+        else:
+            lookups[FACETS[facet][1]] = value
+    return lookups
+
+
+def parse_facet_filters(params):
+    """``{facet: int}`` for every facet in a QueryDict/dict with a valid value; the rest are ignored."""
+    filters = {}
+    for facet in FACETS:
+        value = params.get(facet)
+        if value and str(value).isdigit():
+            filters[facet] = int(value)
+    if filters.get("price_band", 0) >= len(PRICE_BANDS):
+        del filters["price_band"]
+    return filters
+
+
+def facet_counts(filters=None):
+    """
+    ``{facet: [{"value", "label", "count", "selected"}]}`` for the public catalog.
+
+    Each facet is counted with every *other* selected filter applied, so picking
+    a category still shows the alternatives. One GROUP BY over ProductFacetCount
+    per facet, plus one lookup per facet for labels.
+    """
+    filters = filters or {}
+    public = ProductFacetCount.objects.public()
+    panel = {}
+    for facet, (group_by, _) in FACETS.items():
+        rows = public.filter(**{
+            FACETS[other][0]: value for other, value in filters.items() if other != facet
+        })
+        counts = {
+            value: total
+            for value, total in rows.order_by().values_list(group_by).annotate(total=Sum("count"))
+            if total
+        }
+        labels = _labels(facet, counts.keys())
+        panel[facet] = [
+            {"value": value, "label": labels.get(value, "—"), "count": counts[value], "selected": facet in filters and filters[facet] == value}
+            for value in sorted(counts, key=lambda v: (labels.get(v, "") if facet != "price_band" else v))
+        ]
+    return panel
+
+
+def _labels(facet, values):
+    values = [value for value in values if value is not None]
+    if facet == "category":
+        return dict(Category.objects.filter(id__in=values).values_list("id", "name"))
+    if facet == "vendor":
+        return dict(get_user_model().objects.filter(id__in=values).values_list("id", "username"))
+    if facet == "vendor_type":
+        return dict(VendorType.objects.filter(id__in=values).values_list("id", "name"))
+    return {band: price_band_label(band) for band in values}
+
+
+def facet_deltas_for(products, old_keys=None):
+    """``{facet_key: delta}`` for ``products`` whose keys moved from ``old_keys`` (``{id: key}``, None for new rows)."""
+    deltas = Counter()
+    for product in products:
+        new_key = product.facet_key()
+        old_key = old_keys.get(product.id) if old_keys is not None else None
+        if old_key == new_key:
+            continue
+        if old_key is not None:
+            deltas[old_key] -= 1
+        deltas[new_key] += 1
+    return deltas
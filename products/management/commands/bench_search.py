@@ -0,0 +1,125 @@
+import random
+import time
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import Role
+from products.models import Category, Product
+from products.search import ProductSearchIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ver", "tan", "zu", "ro", "pel", "dri", "sun", "ox", "bel", "nor", "qui", "fa", "tes"]
+KINDS = ["shirt", "lamp", "phone", "kettle", "chair", "bottle", "cable", "watch", "shoe", "desk", "mug", "bag"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def synthetic_rows(count, categories, seed=1):
+    """``(id, name, category_id)`` rows with Zipf-distributed words, like a real catalog."""
+    rng = random.Random(seed)
+    words = _vocabulary(rng, 20000)
+    rng.shuffle(words)  # popularity must not follow alphabetical order
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(words) + 1)))
+    for product_id in range(1, count + 1):
+        name = rng.choices(words, cum_weights=cum_weights, k=rng.randint(1, 3))
+        name.append(rng.choice(KINDS))
+        name.append(f"{rng.choice('ABCDEFGH')}{rng.randint(100, 999)}")
+        yield product_id, " ".join(name), rng.choice(categories)
+
+
+def synthetic_queries(rows, count, categories, seed=2):
+    """Mix of one/two-word queries, half ending in a prefix, a quarter with a category filter."""
+    rng = random.Random(seed)
+    queries = []
+    for _, name, _ in rng.sample(rows, count):
+        words = name.split()[:-1]
+        words = rng.sample(words, min(len(words), rng.randint(1, 2)))
+        if rng.random() < 0.5:
+            words[-1] = words[-1][: max(2, len(words[-1]) - 2)]
+        category_id = rng.choice(categories) if rng.random() < 0.25 else None
+        queries.append((" ".join(words), category_id))
+    return queries
+
+
+class Command(BaseCommand):
+    help = "Build the product search index over synthetic catalogs and report query latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+        parser.add_argument("--queries", type=int, default=1000)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument(
+            "--db", action="store_true",
+            help="Seed the catalog as Product rows (rolled back afterwards) and build the index from the database.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'products':>9} {'build s':>8} {'terms':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'avg page':>9}"
+        )
+        for size in options["sizes"]:
+            if options["db"]:
+                try:
+                    with transaction.atomic():
+                        self._run_from_db(size, options)
+                        raise _Rollback
+                except _Rollback:
+                    pass  # benchmark data is never committed
+            else:
+                categories = list(range(1, options["categories"] + 1))
+                rows = list(synthetic_rows(size, categories))
+                self._run(size, rows, categories, lambda index: index.build(rows), options)
+
+    def _run_from_db(self, size, options):
+        User = get_user_model()
+        vendor = User.objects.create(
+            username=f"bench-search-vendor-{size}", role=Role.objects.filter(name=Role.VENDOR).first()
+        )
+        categories = Category.objects.bulk_create([
+            Category(name=f"bench-search-{size}-{i}") for i in range(options["categories"])
+        ])
+        category_ids = [category.id for category in categories]
+        rows = list(synthetic_rows(size, category_ids))
+        for start in range(0, size, 5000):
+            Product.objects.bulk_create([
+                Product(
+                    name=name, category_id=category_id, vendor=vendor, price=1,
+                    is_active=True, approval_status="Approved",
+                )
+                for _, name, category_id in rows[start:start + 5000]
+            ])
+        rows = list(Product.objects.filter(vendor=vendor).values_list("id", "name", "category_id"))
+        self._run(size, rows, category_ids, lambda index: index.build(), options)
+
+    def _run(self, size, rows, categories, build, options):
+        index = ProductSearchIndex()
+        started = time.perf_counter()
+        build(index)
+        build_seconds = time.perf_counter() - started
+
+        timings, hits = [], 0
+        for query, category_id in synthetic_queries(rows, min(options["queries"], len(rows)), categories):
+            started = time.perf_counter()
+            result = index.search(query, category_id=category_id)
+            timings.append((time.perf_counter() - started) * 1000)
+            hits += len(result)
+        timings.sort()
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+        self.stdout.write(
+            f"{size:>9} {build_seconds:>8.2f} {index.term_count:>7} {percentile(0.5):>7.3f} "
+            f"{percentile(0.95):>7.3f} {percentile(0.99):>7.3f} {timings[-1]:>7.3f} {hits / len(timings):>9.0f}"
+        )
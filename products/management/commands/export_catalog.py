@@ -0,0 +1,30 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import FORMATS, export_catalog
+
+
+class Command(BaseCommand):
+    help = "Stream a vendor's catalog as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendor", required=True, help="Username of the vendor.")
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="File to write; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            vendor = User.objects.get(username=options["vendor"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['vendor']!r}.")
+
+        stream = open(options["output"], "w", encoding="utf-8", newline="") if options["output"] else sys.stdout
+        try:
+            for chunk in export_catalog(vendor, options["format"]):
+                stream.write(chunk)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
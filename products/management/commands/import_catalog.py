@@ -0,0 +1,42 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog import FORMATS, guess_format, import_catalog, read_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-import a vendor's products from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--vendor", required=True, help="Username of the vendor that owns the products.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--create-categories", action="store_true", help="Create unknown categories instead of rejecting rows.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            vendor = User.objects.get(username=options["vendor"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['vendor']!r}.")
+        if not vendor.is_vendor():
+            raise CommandError(f"{vendor.username} is not a vendor.")
+
+        fmt = options["format"] or guess_format(options["path"])
+        started = time.perf_counter()
+        with open(options["path"], encoding="utf-8", newline="") as stream:
+            report = import_catalog(
+                vendor,
+                read_rows(stream, fmt),
+                chunk_size=options["chunk_size"],
+                create_categories=options["create_categories"],
+            )
+        elapsed = time.perf_counter() - started
+
+        for line_number, message in report.errors:
+            self.stderr.write(f"line {line_number}: {message}")
+        rate = (report.created + report.updated) / elapsed * 60 if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"{report} in {elapsed:.1f}s ({rate:,.0f} products/min)."))
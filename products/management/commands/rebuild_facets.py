@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from products.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the ProductFacetCount table from the Product rows."
+
+    def handle(self, *args, **options):
+        rows = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} facet count rows."))
@@ -1,5 +1,24 @@
+from bisect import bisect_right
+
 from django.db import models
+from django.db.models import Q
 from accounts.models import CustomUser  # ✅ Vendor reference
+from inventory.models import StockMovement
+from inventory.services import apply_stock_delta
+
+
+# Lower edges of the price bands used for faceted browsing
+PRICE_BANDS = [0, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+def price_band(price):
+    """Index into PRICE_BANDS of the band holding ``price``."""
+    return max(bisect_right(PRICE_BANDS, price) - 1, 0)
+
+
+def price_band_label(band):
+    low = PRICE_BANDS[band]
+    return f"{low}+" if band == len(PRICE_BANDS) - 1 else f"{low}–{PRICE_BANDS[band + 1]}"
 
 
 class Category(models.Model):
@@ -10,6 +29,12 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def searchable(self):
+        """The public catalog: active products approved by an admin."""
+        return self.filter(is_active=True, approval_status="Approved")
+
+
 class Product(models.Model):
     """Product Model for Vendors"""
     name = models.CharField(max_length=255)
@@ -37,25 +62,85 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["approval_status", "is_active"], name="product_active_approval_idx"),
+            models.Index(fields=["vendor", "approval_status"], name="product_vendor_approval_idx"),
+            # Partial index covering only the public catalog (approved & active)
+            models.Index(
+                fields=["category", "-created_at"],
+                name="product_catalog_idx",
+                condition=Q(is_active=True, approval_status="Approved"),
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+    # 🔹 Facets
+    FACET_FIELDS = ("category_id", "vendor_id", "price", "approval_status", "is_active")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded facet key so products.signals can move the facet counts on save
+        loaded = all(field in instance.__dict__ for field in cls.FACET_FIELDS)
+        instance._loaded_facet_key = instance.facet_key() if loaded else None
+        return instance
+
+    def facet_key(self):
+        """(category, vendor, price band, approval status, active) — one ProductFacetCount row."""
+        return (self.category_id, self.vendor_id, price_band(self.price), self.approval_status, self.is_active)
+
     # 🔹 Stock Management Methods
+    # Counters move through inventory.services (F() updates, Inventory kept in sync);
+    # the in-memory fields are adjusted to match.
     def add_stock(self, quantity):
         """Add new stock to the product"""
+        apply_stock_delta(self.id, quantity, StockMovement.RESTOCK)
         self.total_stock_added += quantity
         self.current_stock += quantity
-        self.save(update_fields=["total_stock_added", "current_stock", "updated_at"])
 
     def reduce_stock(self, quantity):
         """Reduce stock when product is purchased"""
-        if self.current_stock >= quantity:
-            self.current_stock -= quantity
-            self.save(update_fields=["current_stock", "updated_at"])
-        else:
-            raise ValueError("Not enough stock available.")
+        apply_stock_delta(self.id, -quantity, StockMovement.SALE)  # Raises InsufficientStock (a ValueError)
+        self.current_stock -= quantity
 
     def return_stock(self, quantity):
         """Restock the product on return"""
+        apply_stock_delta(self.id, quantity, StockMovement.RETURN)
         self.current_stock += quantity
-        self.save(update_fields=["current_stock", "updated_at"])
+
+
+class ProductFacetCountQuerySet(models.QuerySet):
+    def public(self):
+        """Counts for the public catalog only (active & approved)."""
+        return self.filter(is_active=True, approval_status="Approved")
+
+
+class ProductFacetCount(models.Model):
+    """
+    Number of products per (category, vendor, price band, approval status, active)
+    combination, kept current by products.facets so facet panels never count Products.
+    """
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="facet_counts")
+    vendor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="product_facet_counts")
+    price_band = models.PositiveSmallIntegerField()
+    approval_status = models.CharField(max_length=20, choices=Product.APPROVAL_CHOICES)
+    is_active = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    objects = ProductFacetCountQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["category", "vendor", "price_band", "approval_status", "is_active"],
+                name="unique_product_facet",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id}/{self.vendor_id}/{price_band_label(self.price_band)}: {self.count}"
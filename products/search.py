@@ -0,0 +1,373 @@
+"""
+Product search over an in-process inverted index.
+
+Only the public catalog (active & approved products) is indexed. Each product
+name is split into lower-case word tokens; every token maps to the set of
+product ids containing it, and a sorted vocabulary answers prefix lookups with
+two bisects. Queries intersect the smallest posting sets first, filter by
+category through a per-category id set and rank the survivors without touching
+the database; when the words are common enough that matches are dense, the
+newest products are walked instead. Both give the same order (whole-word
+matches first, then newest first), so every page agrees with the others. The
+view then loads only the page of products it shows.
+
+The index is built on first use and kept current by the Product signals in
+``products.signals``. It lives in each process's memory: bulk writes that
+bypass ``save()`` call ``reindex`` themselves, and other worker processes pick
+up changes when their copy is rebuilt in the background every
+``REBUILD_INTERVAL`` seconds. Changes made while a copy is being built are
+recorded and replayed onto it when it is swapped in, and the build pauses
+every ``BUILD_YIELD_EVERY`` products so request threads are not held up.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.apps import apps
+from django.db import connection
+
+TOKEN_RE = re.compile(r"\w+")
+
+MIN_PREFIX = 2  # shorter query tokens only match whole words
+FILTER_RATIO = 32  # a per-candidate term check in Python costs roughly this many set operations
+REBUILD_INTERVAL = 300  # seconds before a process reloads the index from the database
+BUILD_YIELD_EVERY = 2000  # products tokenized between pauses that let other threads run
+
+
+def tokenize(text):
+    """Lower-case word tokens of ``text``, in order, without duplicates."""
+    return list(dict.fromkeys(TOKEN_RE.findall((text or "").lower())))
+
+
+def _doc_matches(terms, token):
+    if len(token) < MIN_PREFIX:
+        return token in terms
+    return any(term.startswith(token) for term in terms)
+
+
+class SearchResult:
+    """Ranked product ids for one page of a search."""
+
+    def __init__(self, ids, has_more):
+        self.ids = ids
+        self.has_more = has_more
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class ProductSearchIndex:
+    """Inverted index of product names: ``term -> {product_id}``."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}  # term -> set of product ids
+        self._vocabulary = []  # sorted terms, for prefix ranges
+        self._categories = {}  # category_id -> set of product ids
+        self._docs = {}  # product_id -> (terms, category_id), in id order: the walk order
+        self._pending = None  # (add or remove, args) made during a build, replayed after it
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    @property
+    def term_count(self):
+        return len(self._vocabulary)
+
+    @property
+    def live(self):
+        """Built or being built, so changes must be applied to it (a build replays them)."""
+        return self.built_at is not None or self._pending is not None
+
+    # 🔹 Maintenance
+    def build(self, rows=None):
+        """
+        (Re)build from ``(id, name, category_id)`` rows; by default every
+        searchable product, streamed from the database.
+        """
+        if rows is None:
+            Product = apps.get_model("products", "Product")
+            rows = (
+                Product.objects.searchable()
+                .order_by("id")  # insertion order is the newest-first walk order
+                .values_list("id", "name", "category_id")
+                .iterator(chunk_size=10000)
+            )
+        with self._lock:
+            self._pending = []
+        postings, categories, docs = {}, {}, {}
+        intern = {}
+        for count, (product_id, name, category_id) in enumerate(rows, 1):
+            if count % BUILD_YIELD_EVERY == 0:
+                time.sleep(0)  # release the GIL so requests keep being served
+            terms = tuple(intern.setdefault(term, term) for term in tokenize(name))
+            docs[product_id] = (terms, category_id)
+            for term in terms:
+                postings.setdefault(term, set()).add(product_id)
+            categories.setdefault(category_id, set()).add(product_id)
+
+        with self._lock:
+            self._postings, self._categories, self._docs = postings, categories, docs
+            self._vocabulary = sorted(postings)
+            self.built_at = time.monotonic()
+            pending, self._pending = self._pending, None
+            for change, args in pending:  # rows read before these changes would undo them
+                change(*args)
+
+    def add(self, product_id, name, category_id):
+        """Index (or re-index) one product."""
+        terms = tuple(tokenize(name))
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self.add, (product_id, name, category_id)))
+            out_of_order = product_id not in self._docs and self._docs and product_id < next(reversed(self._docs))
+            self._discard(product_id, keep_position=True)
+            self._docs[product_id] = (terms, category_id)
+            if out_of_order:  # an older product came back: keep the walk in id order
+                self._docs = dict(sorted(self._docs.items()))
+            for term in terms:
+                ids = self._postings.get(term)
+                if ids is None:
+                    ids = self._postings[term] = set()
+                    self._vocabulary.insert(bisect_left(self._vocabulary, term), term)
+                ids.add(product_id)
+            self._categories.setdefault(category_id, set()).add(product_id)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self.remove, (product_id,)))
+            self._discard(product_id)
+
+    def _discard(self, product_id, keep_position=False):
+        doc = self._docs.get(product_id) if keep_position else self._docs.pop(product_id, None)
+        if doc is None:
+            return
+        terms, category_id = doc
+        for term in terms:
+            ids = self._postings[term]
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        ids = self._categories.get(category_id)
+        if ids is not None:
+            ids.discard(product_id)
+            if not ids:
+                del self._categories[category_id]
+
+    # 🔹 Querying
+    def _expand(self, token):
+        """Vocabulary terms ``token`` matches: itself, plus every term it prefixes."""
+        if len(token) < MIN_PREFIX:
+            return [token] if token in self._postings else []
+        start = bisect_left(self._vocabulary, token)
+        end = bisect_left(self._vocabulary, token[:-1] + chr(ord(token[-1]) + 1), start)
+        return self._vocabulary[start:end]
+
+    def _plans(self, tokens):
+        """``[(posting_count, token, terms)]`` cheapest first, or None if a token matches nothing."""
+        plans = []
+        for token in tokens:
+            terms = self._expand(token)
+            if not terms:
+                return None
+            plans.append((sum(len(self._postings[t]) for t in terms), token, terms))
+        plans.sort(key=lambda plan: plan[0])
+        return plans
+
+    def _matches(self, plans, category_id):
+        """Every product id matching all ``plans`` (and the category), as a set."""
+        # The category set joins the plan like a term: it seeds the candidates when
+        # it is the most selective, otherwise it is intersected after the first term.
+        in_category = None if category_id is None else self._categories.get(category_id, set())
+        candidates = None
+        if in_category is not None and len(in_category) <= plans[0][0]:
+            candidates, in_category = set(in_category), None
+        for cost, token, terms in plans:
+            if candidates is None:
+                candidates = set().union(*(self._postings[t] for t in terms))
+            else:
+                # Cheapest of: union the postings then intersect; intersect each posting
+                # with the candidates; or check each candidate's own terms in Python.
+                postings = [self._postings[t] for t in terms]
+                probe_cost = sum(min(len(candidates), len(ids)) for ids in postings)
+                filter_cost = len(candidates) * FILTER_RATIO
+                if filter_cost < min(cost, probe_cost):
+                    candidates = {pid for pid in candidates if _doc_matches(self._docs[pid][0], token)}
+                elif probe_cost < cost:
+                    candidates = set().union(*(candidates & ids for ids in postings))
+                else:
+                    candidates = candidates & set().union(*postings)
+            if in_category is not None:
+                candidates, in_category = candidates & in_category, None
+            if not candidates:
+                break
+        return candidates
+
+    def _matcher(self, plans, category_id):
+        """``accept(product_id, doc)`` for a walk, testing the most selective words first."""
+        tests = []
+        for _, token, terms in plans:
+            if len(terms) <= 4:  # a few set lookups beat scanning the product's words
+                postings = [self._postings[t] for t in terms]
+                tests.append(lambda product_id, terms, postings=postings: any(product_id in ids for ids in postings))
+            else:
+                tests.append(lambda product_id, terms, token=token: _doc_matches(terms, token))
+
+        def accept(product_id, doc):
+            if category_id is not None and doc[1] != category_id:
+                return False
+            return all(test(product_id, doc[0]) for test in tests)
+        return accept
+
+    def _newest(self, accept, wanted, limit, first=None):
+        """
+        Walk products from the newest back, keeping those ``accept`` allows, until
+        ``wanted`` are found. Returns None once ``limit`` products were checked
+        first (the matches are too sparse for a walk to pay off).
+
+        Products ``first`` also allows come before the rest, so the walk can only
+        stop early once ``wanted`` of those are found.
+        """
+        found, rest = [], []
+        for checked, (product_id, doc) in enumerate(reversed(self._docs.items())):
+            if checked == limit:
+                return None
+            if accept(product_id, doc):
+                if first is None or first(product_id, doc):
+                    found.append(product_id)
+                    if len(found) == wanted:
+                        break
+                elif len(rest) < wanted:
+                    rest.append(product_id)
+        return found + rest[:wanted - len(found)]
+
+    def _top(self, ids, wanted):
+        """The ``wanted`` newest of ``ids``: a short walk when they are dense, else a heap over them."""
+        if not ids:
+            return []
+        if wanted * len(self._docs) < len(ids) * len(ids):  # expected walk length < len(ids)
+            ranked = self._newest(lambda product_id, doc: product_id in ids, wanted, len(ids))
+            if ranked is not None:
+                return ranked
+        return heapq.nlargest(wanted, ids)
+
+    def _rank(self, tokens, category_id, wanted):
+        plans = self._plans(tokens)
+        if plans is None:
+            return []
+
+        # Estimate (assuming independent words) how many of the newest products a
+        # walk must check to find ``wanted`` whole-word matches, against what the
+        # set operations cost. Common words make matches dense and the walk short.
+        sizes = [cost for cost, _, _ in plans]
+        whole_sizes = [len(self._postings.get(token, ())) for _, token, _ in plans]
+        if category_id is not None:
+            in_category = len(self._categories.get(category_id, ()))
+            sizes.append(in_category)
+            whole_sizes.append(in_category)
+        selectivity = 1.0
+        for size in whole_sizes:
+            selectivity *= size / len(self._docs)
+        check_cost = FILTER_RATIO * len(sizes)
+        if selectivity and wanted / selectivity * check_cost < sum(sizes):
+            ranked = self._newest(
+                self._matcher(plans, category_id), wanted, sum(sizes) // check_cost,
+                first=lambda product_id, doc: all(token in doc[0] for token in tokens),
+            )
+            if ranked is not None:
+                return ranked
+
+        # Products containing every query word whole come first, then prefix matches.
+        matches = self._matches(plans, category_id)
+        whole = matches.intersection(*(self._postings.get(token, ()) for token in tokens))
+        ranked = self._top(whole, wanted)
+        if len(ranked) < wanted:
+            ranked += self._top(matches - whole, wanted - len(ranked))
+        return ranked
+
+    def search(self, query, category_id=None, limit=20, offset=0):
+        """
+        Ranked ids of searchable products matching every word of ``query`` (a
+        query word of at least ``MIN_PREFIX`` characters also matches longer
+        words it prefixes). ``category_id`` restricts the results to one Category.
+
+        Products containing every query word whole rank above prefix-only
+        matches, newest first within each group, whichever way the page is
+        found, so consecutive pages never repeat or skip a product.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return SearchResult([], False)
+
+        with self._lock:
+            ranked = self._rank(tokens, category_id, offset + limit + 1)  # one extra shows another page exists
+        return SearchResult(ranked[offset:offset + limit], len(ranked) > offset + limit)
+
+
+# 🔹 Process-wide index
+_index = ProductSearchIndex()
+_build_lock = threading.Lock()
+
+
+def _rebuild():
+    try:
+        _index.build()
+    finally:
+        connection.close()  # the thread's own connection
+        _build_lock.release()
+
+
+def get_index():
+    """
+    The process-wide index. The first call builds it; once it is older than
+    ``REBUILD_INTERVAL`` a background thread rebuilds it while the current
+    copy keeps serving.
+    """
+    if _index.built_at is None:
+        with _build_lock:
+            if _index.built_at is None:
+                _index.build()
+    elif time.monotonic() - _index.built_at > REBUILD_INTERVAL and _build_lock.acquire(blocking=False):
+        threading.Thread(target=_rebuild, name="product-search-rebuild", daemon=True).start()
+    return _index
+
+
+def search_products(query, category_id=None, limit=20, offset=0):
+    return get_index().search(query, category_id=category_id, limit=limit, offset=offset)
+
+
+def reindex(product_ids):
+    """Refresh the given products after writes that bypass ``save()`` (bulk updates, imports)."""
+    if not _index.live:
+        return  # nothing loaded yet; the first search reads the database
+    Product = apps.get_model("products", "Product")
+    product_ids = set(product_ids)
+    visible = Product.objects.searchable().filter(id__in=product_ids).values_list("id", "name", "category_id")
+    for product_id, name, category_id in visible:
+        _index.add(product_id, name, category_id)
+        product_ids.discard(product_id)
+    for product_id in product_ids:
+        _index.remove(product_id)
+
+
+def index_product(product):
+    """Add, refresh or drop one saved product, depending on whether it is searchable."""
+    if not _index.live:
+        return
+    if product.is_active and product.approval_status == "Approved":
+        _index.add(product.id, product.name, product.category_id)
+    else:
+        _index.remove(product.id)
+
+
+def unindex_product(product_id):
+    if _index.live:
+        _index.remove(product_id)
@@ -0,0 +1,59 @@
+# products/signals.py
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .cache import bump_product
+from .facets import move_facet
+from .models import Product
+from .search import index_product, unindex_product
+
+FACET_UPDATE_FIELDS = {"category", "category_id", "vendor", "vendor_id", "price", "approval_status", "is_active"}
+
+
+# 🔹 Keep the search index in step with the catalog (after commit, so rollbacks never leak in)
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    transaction.on_commit(lambda: index_product(instance))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    product_id = instance.id
+    transaction.on_commit(lambda: unindex_product(product_id))
+
+
+# 🔹 Invalidate cached catalog pages. Registered before the facet receiver, which
+# replaces _loaded_facet_key (holding the old category) with the new key.
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_versions(sender, instance, **kwargs):
+    old_key = getattr(instance, "_loaded_facet_key", None)
+    category_ids = (instance.category_id, old_key[0] if old_key else None)
+    product_id = instance.id
+    transaction.on_commit(lambda: bump_product(product_id, *category_ids))
+
+
+# 🔹 Move the product between ProductFacetCount rows (same transaction as the save)
+@receiver(pre_save, sender=Product)
+def load_facet_key(sender, instance, **kwargs):
+    """Only for instances not loaded with their facet fields (e.g. built by hand or with .only())."""
+    if instance._state.adding or getattr(instance, "_loaded_facet_key", None) is not None:
+        return
+    old = Product.objects.only("category", "vendor", "price", "approval_status", "is_active").filter(pk=instance.pk).first()
+    instance._loaded_facet_key = old.facet_key() if old else None
+
+
+@receiver(post_save, sender=Product)
+def update_facet_counts(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not FACET_UPDATE_FIELDS & set(update_fields):
+        return
+    new_key = instance.facet_key()
+    old_key = None if created else instance._loaded_facet_key
+    if old_key != new_key:
+        move_facet(old_key, new_key)
+    instance._loaded_facet_key = new_key
+
+
+@receiver(post_delete, sender=Product)
+def remove_facet_count(sender, instance, **kwargs):
+    move_facet(getattr(instance, "_loaded_facet_key", None) or instance.facet_key(), None)
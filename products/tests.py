@@ -1,3 +1,102 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from accounts.models import CustomUser, Role
+from inventory.ledger import rebuild_counters
+from inventory.models import Inventory
+from .catalog import import_catalog
+from .models import Category, Product
+from .search import ProductSearchIndex
+
+
+class SearchPagingTests(SimpleTestCase):
+    def setUp(self):
+        self.index = ProductSearchIndex()
+        self.index.build([(n, "Lamp" if n % 3 else "Lampshade", n % 4) for n in range(1, 4001)])
+
+    def page_through(self, query, category_id=None, limit=20):
+        ids, offset = [], 0
+        while True:
+            result = self.index.search(query, category_id=category_id, limit=limit, offset=offset)
+            ids += result.ids
+            if not result.has_more:
+                return ids
+            offset += limit
+
+    def test_every_page_uses_the_same_order(self):
+        ids = self.page_through("lamp")
+        whole = sorted((n for n in range(1, 4001) if n % 3), reverse=True)
+        prefix = sorted((n for n in range(1, 4001) if not n % 3), reverse=True)
+        self.assertEqual(ids, whole + prefix)
+
+    def test_paging_within_a_category(self):
+        ids = self.page_through("lamp", category_id=1, limit=7)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(ids), {n for n in range(1, 4001) if n % 4 == 1})
+
+    def test_readded_product_keeps_its_place(self):
+        self.index.remove(10)
+        self.index.add(10, "Lamp", 2)
+        ids = self.page_through("lamp")
+        self.assertEqual(len(ids), 4000)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertLess(ids.index(11), ids.index(10))
+
+
+class CatalogImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("vendor", password="x", role=Role.objects.get_or_create(name=Role.VENDOR)[0])
+        Category.objects.create(name="Lamps")
+
+    def run_import(self, rows):
+        return import_catalog(self.vendor, enumerate(rows, start=2))
+
+    def test_created_products_are_found_without_returned_ids(self):
+        rows = [{"name": "Lamp", "category": "Lamps", "price": "10", "stock": str(n % 3)} for n in range(6)]
+        with mock.patch.object(type(connection.features), "can_return_rows_from_bulk_insert", False):
+            report = self.run_import(rows)
+        self.assertEqual(report.created, 6)
+        stock = dict(Inventory.objects.values_list("product_id", "quantity"))
+        self.assertEqual(stock, dict(Product.objects.values_list("id", "current_stock")))
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_update_moves_stock_through_the_ledger(self):
+        self.run_import([{"name": "Lamp", "category": "Lamps", "price": "10", "stock": "5"}])
+        product = Product.objects.get()
+        self.run_import([{"id": product.id, "name": "Lamp", "category": "Lamps", "price": "10", "stock": "2"}])
+        self.assertEqual(Product.objects.get().current_stock, 2)
+        self.assertEqual(rebuild_counters(), [])
+
+    def test_repeated_id_is_reported(self):
+        self.run_import([{"name": "Lamp", "category": "Lamps", "price": "10", "stock": "5"}])
+        product = Product.objects.get()
+        report = self.run_import([
+            {"id": product.id, "name": "Lamp", "category": "Lamps", "price": "10", "stock": "7"},
+            {"id": product.id, "name": "Lamp", "category": "Lamps", "price": "10", "stock": "1"},
+        ])
+        self.assertEqual(report.updated, 1)
+        self.assertEqual(report.errors, [(3, f"product {product.id} is already updated on line 2")])
+        self.assertEqual(Product.objects.get().current_stock, 7)
+
+
+@skipUnless(connection.vendor == "sqlite", "the query plans checked are SQLite's")
+class IndexUsageTests(TestCase):
+    """EXPLAIN QUERY PLAN shows each hot lookup searching through its index."""
+
+    def assertUsesIndex(self, queryset, index):
+        self.assertRegex(queryset.explain(), rf"SEARCH \S+ USING (COVERING )?INDEX {index}\b")
+
+    def test_approval_queue(self):
+        queryset = Product.objects.filter(is_active=True, approval_status="Pending")
+        self.assertUsesIndex(queryset, "product_active_approval_idx")
+
+    def test_vendor_products_by_approval(self):
+        queryset = Product.objects.filter(vendor_id=1, approval_status="Approved")
+        self.assertUsesIndex(queryset, "product_vendor_approval_idx")
+
+    def test_public_catalog_by_category(self):
+        queryset = Product.objects.searchable().filter(category_id=1).order_by("-created_at")
+        self.assertUsesIndex(queryset, "product_catalog_idx")
@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import product_list, product_detail
+from .views import product_list, product_detail, product_facets, catalog_cache_stats
 
 urlpatterns = [
     path("", product_list, name="product_list"),
+    path("facets/", product_facets, name="product_facets"),
+    path("cache-stats/", catalog_cache_stats, name="catalog_cache_stats"),
     path("<int:product_id>/", product_detail, name="product_detail"),
 ]
 
@@ -1,9 +1,15 @@
-from django.shortcuts import render, get_object_or_404
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 
+from .cache import cache_stats, get_or_build, versions
+from .facets import facet_counts, parse_facet_filters, product_filters
 from .models import Product
+from .search import search_products
 from inventory.models import Inventory
+from utils.pagination import CursorPage, decode_cursor, encode_cursor, paginate_by_cursor
 
 User = get_user_model()
 
@@ -11,8 +17,23 @@ User = get_user_model()
 # 🔹 Product List View
 @login_required
 def product_list(request):
-    """Display the list of available products for customers & vendors."""
-    products = Product.objects.filter(is_active=True, approval_status="Approved")  # Only show approved & active
+    """Display the list of available products for customers & vendors (searched by `q`, narrowed by facets)."""
+    query = request.GET.get("q", "").strip()
+    filters = parse_facet_filters(request.GET)
+    filter_key = "&".join(f"{facet}={value}" for facet, value in sorted(filters.items()))
+    products = Product.objects.searchable().filter(**product_filters(filters))  # Only show approved & active
+    cursor = request.GET.get("cursor") or ""
+
+    # A category-only listing is invalidated by its category's version; anything else by the catalog's
+    scopes = [("category", filters["category"])] if set(filters) == {"category"} else [("catalog", None)]
+    if query:
+        page = _search_page(query, products, filters.get("category"), cursor)
+    else:
+        page = get_or_build(
+            f"list:{filter_key}:{cursor}", scopes,
+            lambda: paginate_by_cursor(products, ("-created_at", "-id"), cursor=cursor),
+        )
+    facets = get_or_build(f"facets:{filter_key}", [("catalog", None)], lambda: facet_counts(filters))
 
     # Determine dashboard redirect based on user role
     dashboard_url = "customer_dashboard"
@@ -20,17 +41,58 @@ def product_list(request):
         dashboard_url = "vendor_dashboard"
 
     return render(request, "products/product_list.html", {
-        "products": products,
+        "products": page.items,
+        "page": page,
+        "query": query,
+        "filters": filters,
+        "facets": facets,
+        "catalog_version": versions(*scopes)[0],  # for {% cache %} fragments in the template
         "dashboard_url": dashboard_url,
     })
 
 
+def _search_page(query, products, category_id, cursor, per_page=25):
+    """
+    One page of ranked search results; the cursor carries the offset into the ranking.
+    Facets other than category are applied to the page, so a narrowed page may be short.
+    """
+    values = decode_cursor(cursor)
+    offset = values[0] if values and isinstance(values[0], int) else 0
+    result = search_products(query, category_id=category_id, limit=per_page, offset=offset)
+
+    found = products.in_bulk(result.ids)  # The index may trail the database
+    items = [found[pid] for pid in result.ids if pid in found]
+    return CursorPage(items, encode_cursor([offset + per_page]) if result.has_more else None)
+
+
+# 🔹 Facet Counts API
+@login_required
+def product_facets(request):
+    """Facet panel for the public catalog as JSON, narrowed by the same filters as product_list."""
+    return JsonResponse({"facets": facet_counts(parse_facet_filters(request.GET))})
+
+
 # 🔹 Product Detail View
 @login_required
 def product_detail(request, product_id):
     """Display details of a single product (Only Approved & Active)."""
-    product = get_object_or_404(Product, id=product_id, is_active=True, approval_status="Approved")
-    return render(request, "products/product_detail.html", {"product": product})
+    product = get_or_build(
+        f"product:{product_id}", [("product", product_id)],
+        lambda: Product.objects.searchable().select_related("category").filter(id=product_id).first(),
+    )
+    if product is None:
+        raise Http404("No such product.")
+    return render(request, "products/product_detail.html", {
+        "product": product,
+        "catalog_version": versions(("product", product_id))[0],  # for {% cache %} fragments in the template
+    })
+
+
+# 🔹 Catalog Cache Stats (Admin Only)
+@staff_member_required
+def catalog_cache_stats(request):
+    """Hit/miss counters of the catalog cache as JSON."""
+    return JsonResponse(cache_stats())
 
 
 # 🔹 Inventory View (Optional: This is better suited to `vendors/views.py`)
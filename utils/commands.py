@@ -0,0 +1,13 @@
+from datetime import datetime, time
+
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+
+def parse_day(value, end=False):
+    """Start (or with ``end``, last instant) of a YYYY-MM-DD day given on the command line, timezone-aware."""
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"Expected a YYYY-MM-DD date, got {value!r}.")
+    return timezone.make_aware(datetime.combine(day, time.max if end else time.min))
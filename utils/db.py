@@ -0,0 +1,51 @@
+from collections import namedtuple
+
+from django.db import connection, transaction
+
+TransitionResult = namedtuple("TransitionResult", ["moved", "rejected"])
+
+
+def executemany_update(model, objs, field_names):
+    """
+    ``UPDATE ... SET f = %s, ... WHERE pk = %s`` run once through ``executemany``.
+
+    Same effect as ``QuerySet.bulk_update`` but without building a CASE
+    expression per field and row, which dominates the cost for large batches.
+    Field values are taken from the objects as-is (``auto_now`` is not applied).
+    """
+    objs = list(objs)
+    if not objs:
+        return
+    fields = [model._meta.get_field(name) for name in field_names]
+    quote = connection.ops.quote_name
+    assignments = ", ".join(f"{quote(field.column)} = %s" for field in fields)
+    sql = f"UPDATE {quote(model._meta.db_table)} SET {assignments} WHERE {quote(model._meta.pk.column)} = %s"
+    params = [
+        [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def bulk_transition(queryset, ids, to_status, transitions, field="status"):
+    """
+    Move the rows of ``queryset`` among ``ids`` to ``to_status`` wherever
+    ``transitions`` (``{from_status: {to_status, ...}}``) allows it.
+
+    One locking SELECT of the requested rows, then a single conditional
+    ``UPDATE ... SET status = <to> WHERE id IN (...) AND status IN (<from>...)``.
+    Returns ``TransitionResult(moved=[ids], rejected={id: reason})``; ids outside
+    ``queryset`` are rejected as "not found".
+    """
+    ids = {int(pk) for pk in ids}
+    sources = [status for status, targets in transitions.items() if to_status in targets]
+    with transaction.atomic():
+        current = dict(queryset.filter(pk__in=ids).select_for_update().values_list("pk", field))
+        moved = sorted(pk for pk, status in current.items() if status in sources)
+        if moved:
+            queryset.model._default_manager.filter(pk__in=moved, **{f"{field}__in": sources}).update(**{field: to_status})
+
+    rejected = {pk: "not found" for pk in ids - current.keys()}
+    rejected.update({pk: f"is {status}" for pk, status in current.items() if status not in sources})
+    return TransitionResult(moved, rejected)
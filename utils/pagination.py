@@ -0,0 +1,82 @@
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = "utils.pagination.cursor"
+
+
+class CursorPage:
+    """One page of a keyset-paginated queryset."""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def encode_cursor(values):
+    """Turn the sort-key values of the last row into an opaque, signed token."""
+    return signing.dumps(
+        [v.isoformat() if hasattr(v, "isoformat") else v for v in values],
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(token):
+    """Return the key values stored in ``token``, or None for a missing/tampered cursor."""
+    if not token:
+        return None
+    try:
+        return signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+
+def _after(ordering, values):
+    """
+    Keyset predicate for rows strictly after ``values`` in ``ordering``:
+    (k1 > v1) OR (k1 = v1 AND k2 > v2) OR ... with < for descending keys.
+    """
+    condition = Q()
+    equal = {}
+    for key, value in zip(ordering, values):
+        field = key.lstrip("-")
+        lookup = "lt" if key.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{field}__{lookup}": value})
+        equal[field] = value
+    return condition
+
+
+def _attr(obj, path):
+    for part in path.split("__"):
+        obj = getattr(obj, part)
+    return obj
+
+
+def paginate_by_cursor(queryset, ordering, cursor=None, per_page=25):
+    """
+    Keyset-paginate ``queryset`` on ``ordering`` (e.g. ``("-order_date", "-id")``,
+    the last key must be unique). Every page is a single indexed range scan, so
+    page N costs the same as page 1, unlike OFFSET pagination.
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(ordering):
+        queryset = queryset.filter(_after(ordering, values))
+
+    rows = list(queryset[: per_page + 1])
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([_attr(last, key.lstrip("-")) for key in ordering])
+    return CursorPage(rows, next_cursor)
@@ -25,11 +25,9 @@ class InventoryUpdateForm(forms.ModelForm):
         fields = ["quantity"]  # Only editable quantity, stock tracking is via Product model
 
 
-# 🔹 Product Inventory Form (For updating current stock in Product model)
-class ProductInventoryForm(forms.ModelForm):
-    class Meta:
-        model = Product
-        fields = ["current_stock"]
+# 🔹 Product Inventory Form (New stock level; the view applies the difference through the ledger)
+class ProductInventoryForm(forms.Form):
+    current_stock = forms.IntegerField(min_value=0)
 
 
 # 🔹 Supplier Form (Vendor's Suppliers)
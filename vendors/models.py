@@ -1,6 +1,6 @@
 from django.db import models
-from django.apps import apps
 from django.contrib.auth import get_user_model
+from inventory.models import InventoryBase
 
 User = get_user_model()
 
@@ -42,36 +42,13 @@ class Compliance(models.Model):
         return f"{vendor_name} - {self.compliance_type}"
 
 
-class Inventory(models.Model):
-    """Product inventory (OneToOne with Product)"""
+class Inventory(InventoryBase):
+    """Product inventory (OneToOne with Product); a record only, stock moves through inventory.Inventory"""
     product = models.OneToOneField(
         "products.Product",
         on_delete=models.CASCADE,
         related_name="vendor_inventory"
     )
-    quantity = models.PositiveIntegerField(default=0)
-    total_stock_added = models.PositiveIntegerField(default=0)
-    last_updated = models.DateTimeField(auto_now=True)
-
-    def save(self, *args, **kwargs):
-        if self.pk:
-            old = Inventory.objects.get(pk=self.pk)
-            added = self.quantity - old.quantity
-            if added > 0:
-                self.total_stock_added += added
-        else:
-            self.total_stock_added = self.quantity
-
-        super().save(*args, **kwargs)
-
-        # ✅ Sync stock to Product model
-        product_model = apps.get_model("products", "Product")
-        product = product_model.objects.get(id=self.product.id)
-        product.stock = self.quantity
-        product.save()
-
-    def __str__(self):
-        return f"{self.product.name} - {self.quantity} in stock"
 
 
 class Warehouse(models.Model):
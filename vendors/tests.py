@@ -1,3 +1,46 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import CustomUser, Role
+from inventory.ledger import rebuild_counters
+from inventory.models import Inventory, StockMovement
+from inventory.services import apply_stock_delta
+from products.models import Category, Product
+
+
+class UpdateInventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user("vendor", password="x", role=Role.objects.get_or_create(name=Role.VENDOR)[0])
+        cls.product = Product.objects.create(
+            name="Lamp", category=Category.objects.create(name="Lamps"), vendor=cls.vendor, price=10, approval_status="Approved"
+        )
+        Inventory.objects.create(product=cls.product)
+
+    def setUp(self):
+        self.client.force_login(self.vendor)
+        apply_stock_delta(self.product.id, 10, StockMovement.RESTOCK)
+
+    def update(self, stock):
+        return self.client.post(reverse("vendors:update_inventory", args=[self.product.id]), {"current_stock": stock})
+
+    def test_edit_goes_through_the_ledger(self):
+        self.update(50)
+        self.assertEqual(Product.objects.get(id=self.product.id).current_stock, 50)
+        self.assertEqual(Inventory.objects.get(product=self.product).quantity, 50)
+        self.assertEqual(StockMovement.objects.filter(reason=StockMovement.ADJUSTMENT).get().delta, 40)
+        self.assertEqual(rebuild_counters(), [])
+        self.assertEqual(Product.objects.get(id=self.product.id).current_stock, 50)
+
+    def test_lowering_stock(self):
+        self.update(4)
+        self.assertEqual(Product.objects.get(id=self.product.id).current_stock, 4)
+        self.assertEqual(rebuild_counters(), [])
+
+    @override_settings(TEMPLATES=[{
+        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "OPTIONS": {"loaders": [("django.template.loaders.locmem.Loader", {"vendors/update_inventory.html": "{{ form }}"})]},
+    }])
+    def test_negative_stock_is_rejected(self):
+        self.assertEqual(self.update(-1).status_code, 200)
+        self.assertEqual(Product.objects.get(id=self.product.id).current_stock, 10)
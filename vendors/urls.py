@@ -7,6 +7,8 @@ from .views import (
     reject_product,
     vendor_product_list,
     vendor_add_product,
+    vendor_import_products,
+    vendor_export_products,
     vendor_edit_product,
     vendor_delete_product,
     vendor_order_list,
@@ -33,6 +35,8 @@ urlpatterns = [
     # 🔹 Product Management
     path("products/", vendor_product_list, name="vendor_product_list"),
     path("products/add/", vendor_add_product, name="vendor_add_product"),
+    path("products/import/", vendor_import_products, name="vendor_import_products"),
+    path("products/export/", vendor_export_products, name="vendor_export_products"),
     path("products/edit/<int:product_id>/", vendor_edit_product, name="vendor_edit_product"),
     path("products/delete/<int:product_id>/", vendor_delete_product, name="vendor_delete_product"),
 
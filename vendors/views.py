@@ -1,13 +1,18 @@
+import io
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.apps import apps
+from django.http import StreamingHttpResponse
 from django.contrib.auth import get_user_model
 
 from accounts.decorators import role_required
-from orders.models import Order, OrderItem
-from logistics.models import Shipment
+from orders.models import Order, OrderItem, VendorOrder
+from orders.services import VENDOR_STATUSES, transition_vendor_orders
+from utils.pagination import paginate_by_cursor
 from inventory.models import Inventory
+from products.catalog import FORMATS as CATALOG_FORMATS, export_catalog, guess_format, import_catalog, read_rows
 from .forms import ProductForm, InventoryUpdateForm
 from .models import Supplier
 
@@ -19,9 +24,7 @@ User = get_user_model()
 @role_required("Vendor")
 def vendor_dashboard(request):
     products = Product.objects.filter(vendor=request.user)
-    product_ids = products.values_list("id", flat=True)
-    order_items = OrderItem.objects.filter(product_id__in=product_ids)
-    orders = Order.objects.filter(id__in=order_items.values_list("order_id", flat=True)).distinct()
+    orders = Order.objects.filter(vendor_links__vendor=request.user).order_by("-order_date")
     return render(request, "vendors/vendor_dashboard.html", {"products": products, "orders": orders})
 
 
@@ -52,6 +55,35 @@ def vendor_add_product(request):
     return render(request, "vendors/vendor_add_product.html", {"form": form})
 
 
+@login_required
+@role_required("Vendor")
+def vendor_import_products(request):
+    """Bulk-import products from an uploaded CSV / JSON Lines file."""
+    report = None
+    if request.method == "POST" and request.FILES.get("catalog_file"):
+        upload = request.FILES["catalog_file"]
+        stream = io.TextIOWrapper(upload.file, encoding="utf-8", newline="")
+        report = import_catalog(request.user, read_rows(stream, guess_format(upload.name)))
+        if report.ok:
+            messages.success(request, f"Catalog imported: {report}.")
+        else:
+            messages.warning(request, f"Catalog imported with errors: {report}.")
+    return render(request, "vendors/vendor_import_products.html", {"report": report})
+
+
+@login_required
+@role_required("Vendor")
+def vendor_export_products(request):
+    """Stream the vendor's catalog as CSV (default) or JSON Lines."""
+    fmt = request.GET.get("format", "csv")
+    if fmt not in CATALOG_FORMATS:
+        fmt = "csv"
+    content_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = StreamingHttpResponse(export_catalog(request.user, fmt), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="catalog_{request.user.username}.{fmt}"'
+    return response
+
+
 @login_required
 @role_required("Vendor")
 def vendor_edit_product(request, product_id):
@@ -81,22 +113,19 @@ def vendor_delete_product(request, product_id):
 @login_required
 @role_required("Vendor")
 def vendor_update_order_status(request, order_id, status):
-    order = get_object_or_404(Order, id=order_id)
-    products = Product.objects.filter(vendor=request.user)
-
-    if not OrderItem.objects.filter(order=order, product__in=products).exists():
-        messages.error(request, "You do not have permission to update this order.")
+    if status not in VENDOR_STATUSES:
+        messages.error(request, f"Vendors cannot move orders to {status}.")
         return redirect("vendors:vendor_order_list")
 
-    order.status = status
-    order.save()
-
-    if status == "Shipped":
-        shipment, created = Shipment.objects.get_or_create(order=order)
-        if created:
-            messages.success(request, f"Order {order.id} is now shipped! Shipment created.")
-        else:
-            messages.warning(request, f"Shipment for Order {order.id} already exists.")
+    # Only this vendor's part moves; the order follows once every vendor on it has
+    result = transition_vendor_orders(request.user, [order_id], status)
+    reason = result.rejected.get(order_id)
+    if reason == "not found":
+        messages.error(request, "You do not have permission to update this order.")
+    elif reason:
+        messages.warning(request, f"Your part of order {order_id} cannot move to {status}: it {reason}.")
+    else:
+        messages.success(request, f"Your part of order {order_id} is now {status}.")
 
     return redirect("vendors:vendor_order_list")
 
@@ -166,7 +195,10 @@ def inventory_view(request):
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from products.models import Product
+from inventory.models import StockMovement
+from inventory.services import apply_stock_delta
 from .forms import ProductInventoryForm
 
 @login_required
@@ -174,12 +206,15 @@ def update_inventory(request, product_id):
     product = get_object_or_404(Product, id=product_id, vendor=request.user)
 
     if request.method == 'POST':
-        form = ProductInventoryForm(request.POST, instance=product)
+        form = ProductInventoryForm(request.POST)
         if form.is_valid():
-            form.save()
+            # ✅ Apply the difference as a ledger movement so Product, Inventory and the ledger move together
+            with transaction.atomic():
+                stock = Product.objects.select_for_update().values_list("current_stock", flat=True).get(id=product.id)
+                apply_stock_delta(product.id, form.cleaned_data["current_stock"] - stock, StockMovement.ADJUSTMENT)
             return redirect('vendors:inventory')
     else:
-        form = ProductInventoryForm(instance=product)
+        form = ProductInventoryForm(initial={"current_stock": product.current_stock})
 
     return render(request, 'vendors/update_inventory.html', {
         'form': form,
@@ -204,7 +239,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 def approve_product(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     product.approval_status = "Approved"
-    product.save()
+    product.save(update_fields=["approval_status", "updated_at"])  # signals bump the catalog cache versions
     messages.success(request, f"{product.name} approved successfully.")
     return redirect("vendors:pending_products")
 
@@ -213,7 +248,7 @@ def approve_product(request, product_id):
 def reject_product(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     product.approval_status = "Rejected"
-    product.save()
+    product.save(update_fields=["approval_status", "updated_at"])  # signals bump the catalog cache versions
     messages.error(request, f"{product.name} rejected.")
     return redirect("vendors:pending_products")
 
@@ -272,17 +307,20 @@ from orders.models import OrderItem, Order
 @role_required("Vendor")
 def vendor_order_list(request):
     user = request.user
-    products = Product.objects.filter(vendor=user)
-    product_ids = products.values_list("id", flat=True)
-    order_items = OrderItem.objects.filter(product_id__in=product_ids)
-
-    # We group by orders that include vendor's products
-    orders = Order.objects.filter(id__in=order_items.values_list("order_id", flat=True)).distinct().order_by('-order_date')
 
+    # One range scan over the vendor order index, keyset-paginated
+    page = paginate_by_cursor(
+        VendorOrder.objects.for_vendor(user),
+        ("-order_date", "-order_id"),
+        cursor=request.GET.get("cursor"),
+    )
+    orders = [link.order for link in page]
+    order_items = OrderItem.objects.filter(order__in=orders, product__vendor=user).with_orders()
 
     return render(request, "vendors/vendor_order_list.html", {
         "orders": orders,
         "order_items": order_items,
+        "page": page,
     })
 
 